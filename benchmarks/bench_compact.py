@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the Memory of Compact Data Sets against Parsed HTAN JSON Files.
+
+Loads the file as a parsed doc, and as a compact data set, and reports the
+memory traced while each is held, the time to build each, and the time to
+materialize all atlases of the compact data set again.  The materialized
+atlases are checked to be identical to the parsed ones.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_compact.py
+    python benchmarks/bench_compact.py example_output/sim.json --json out.json
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from hsim import cli  # noqa: E402
+from hsim import json_backend  # noqa: E402
+from hsim import json_reader  # noqa: E402
+
+EXAMPLE_PATH = REPO_DIR / "example_output" / "sim.json"
+
+
+def measure(fn):
+    """
+    Get the Result of a Function, the Memory Traced while it is Held, and
+    the Wall Time, Measured in a Separate Run without Tracing.
+    """
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    value = fn()
+    gc.collect()
+    num_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, num_bytes, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("json_file", nargs="?", default=str(EXAMPLE_PATH))
+    parser.add_argument("--json", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    def load_doc():
+        with open(args.json_file, "rb") as fd:
+            return json_backend.load(fd)
+
+    def load_data_set():
+        reader = json_reader.HtanJsonReader(
+            args.json_file, cli.get_template_list(), compact=True
+        )
+        return reader.get_data_set()
+
+    doc, doc_bytes, doc_seconds = measure(load_doc)
+    data_set, data_set_bytes, data_set_seconds = measure(load_data_set)
+    start = time.perf_counter()
+    atlas_list = list(data_set.iter_atlases())
+    materialize_seconds = time.perf_counter() - start
+    if atlas_list != doc["atlases"]:
+        print("Materialized atlases differ from the parsed atlases.")
+        sys.exit(1)
+
+    result = {}
+    result["file"] = args.json_file
+    result["doc_bytes"] = doc_bytes
+    result["doc_seconds"] = doc_seconds
+    result["compact_bytes"] = data_set_bytes
+    result["compact_seconds"] = data_set_seconds
+    result["materialize_seconds"] = materialize_seconds
+    result["num_pooled_strings"] = data_set.pool.get_num_values()
+    result["ratio"] = doc_bytes / data_set_bytes
+    print("%s:  %d atlases" % (args.json_file, data_set.get_num_atlases()))
+    print("%-12s %10s %10s" % ("", "MB", "seconds"))
+    print("%-12s %10.1f %10.3f" % ("parsed doc", doc_bytes / 1e6, doc_seconds))
+    print("%-12s %10.1f %10.3f" % ("compact", data_set_bytes / 1e6, data_set_seconds))
+    print("Compact data set is %.1fx smaller;  materialized in %.3f seconds."
+          % (result["ratio"], materialize_seconds))
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(result, out, indent=4)
+
+
+if __name__ == "__main__":
+    main()
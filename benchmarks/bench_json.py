@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the JSON Backends on an HTAN JSON File.
+
+Parses and serializes the file with each installed backend, and reports the
+best wall time of several runs, and the throughput in MB per second.  The
+serialized output of each backend is checked to be byte-identical to that of
+the standard library.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py example_output/sim.json --repeat 10 --json out.json
+"""
+import argparse
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from hsim import json_backend  # noqa: E402
+from hsim import json_writer  # noqa: E402
+
+EXAMPLE_PATH = REPO_DIR / "example_output" / "sim.json"
+
+
+def write_doc(doc, indent):
+    """Serialize a Doc with HtanJsonWriter, as 'hsim generate' does."""
+    out = io.BytesIO()
+    writer = json_writer.HtanJsonWriter(out, indent)
+    for atlas in doc["atlases"]:
+        writer.write_atlas(atlas)
+    writer.write_schemas(doc["schemas"])
+    return out.getvalue()
+
+
+def time_best(fn, repeat):
+    """Get the Best Wall Time of Several Runs, and the Result of the Last."""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best, value
+
+
+def run_backend(name, raw, repeat):
+    """Measure a Single Backend;  returns the results, and the outputs."""
+    backend = json_backend.set_backend(name)
+    doc = backend.loads(raw)
+    case_list = []
+    case_list.append(("loads", lambda: backend.loads(raw)))
+    case_list.append(("write indent=4", lambda: write_doc(doc, 4)))
+    case_list.append(("write compact", lambda: write_doc(doc, None)))
+    result_list = []
+    output_dict = {}
+    for case_name, fn in case_list:
+        seconds, value = time_best(fn, repeat)
+        if isinstance(value, bytes):
+            output_dict[case_name] = value
+        result = {}
+        result["backend"] = name
+        result["case"] = case_name
+        result["seconds"] = seconds
+        result["mb_per_second"] = len(raw) / seconds / 1e6 if seconds > 0 else None
+        result_list.append(result)
+    return result_list, output_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("json_file", nargs="?", default=str(EXAMPLE_PATH))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    with open(args.json_file, "rb") as fd:
+        raw = fd.read()
+    print("%s:  %.1f MB" % (args.json_file, len(raw) / 1e6))
+    print("%-8s %-16s %10s %10s %8s" % ("backend", "case", "seconds", "MB/s", "speedup"))
+
+    result_list = []
+    stdlib_seconds_dict = {}
+    stdlib_output_dict = None
+    for name in json_backend.BACKEND_LIST:
+        try:
+            backend_result_list, output_dict = run_backend(name, raw, args.repeat)
+        except ImportError:
+            print("%-8s not installed" % name)
+            continue
+        if stdlib_output_dict is None:
+            stdlib_output_dict = output_dict
+        for case_name, output in output_dict.items():
+            if output != stdlib_output_dict[case_name]:
+                print("%-8s %-16s output differs from %s" % (name, case_name, json_backend.STDLIB))
+                sys.exit(1)
+        for result in backend_result_list:
+            stdlib_seconds = stdlib_seconds_dict.setdefault(result["case"], result["seconds"])
+            result["speedup"] = stdlib_seconds / result["seconds"]
+            print(
+                "%-8s %-16s %10.4f %10.1f %7.2fx"
+                % (
+                    result["backend"],
+                    result["case"],
+                    result["seconds"],
+                    result["mb_per_second"],
+                    result["speedup"],
+                )
+            )
+        result_list.extend(backend_result_list)
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(result_list, out, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark Atlas Generation across Scale Parameters.
+
+Sweeps participants, samples per participant, lineage depth and template
+multipliers, and reports records per second and peak RSS.  Each point of the
+sweep runs in a fresh process, so peak RSS is not inherited between points.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_scale.py
+    python benchmarks/bench_scale.py --participants 10,1000,100000 --json out.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from hsim import cli  # noqa: E402
+from hsim import scale  # noqa: E402
+from hsim import schema_util  # noqa: E402
+
+
+def run_point(num_atlases, params):
+    """Generate Atlases at a Single Scale, and Measure the Run."""
+    scale_params = scale.ScaleParams.from_dict(params)
+    template_list = cli.get_template_list()
+    schema_dict = schema_util.load_htan_schema()
+    target_atlas_list = cli.get_atlas_list(num_atlases)
+
+    start = time.perf_counter()
+    num_records = 0
+    for atlas in cli.generate_simulated_atlases(
+        target_atlas_list, schema_dict, template_list, 0, 1, scale_params
+    ):
+        for value in atlas.values():
+            if isinstance(value, dict):
+                num_records += len(value["record_list"])
+    seconds = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    result = {}
+    result["params"] = params
+    result["num_atlases"] = num_atlases
+    result["num_records"] = num_records
+    result["seconds"] = seconds
+    result["records_per_second"] = num_records / seconds if seconds > 0 else None
+    result["peak_rss_mb"] = peak_rss_mb
+    return result
+
+
+def parse_int_list(txt):
+    """Parse a Comma Separated List of Integers."""
+    return [int(x) for x in txt.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--num-atlases", type=int, default=1)
+    parser.add_argument("--participants", type=parse_int_list, default=[10, 1000, 10000])
+    parser.add_argument("--samples-per-participant", default="6;1-12")
+    parser.add_argument("--max-lineage-depth", type=parse_int_list, default=[0, 2])
+    parser.add_argument("--multiplier", type=parse_int_list, default=[1, 4])
+    parser.add_argument("--json", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    result_list = []
+    print(
+        "%12s %10s %6s %6s %12s %12s %10s"
+        % ("participants", "samples", "depth", "mult", "records", "records/s", "rss (MB)")
+    )
+    for participants, samples, depth, multiplier in itertools.product(
+        args.participants,
+        args.samples_per_participant.split(";"),
+        args.max_lineage_depth,
+        args.multiplier,
+    ):
+        params = {}
+        params["num_participants"] = participants
+        params["samples_per_participant"] = samples
+        params["max_lineage_depth"] = depth if depth > 0 else None
+        params["template_multipliers"] = {
+            template[0]: multiplier
+            for template in cli.get_template_list()
+            if template[1] == cli.ASSAY_TYPE
+        }
+        with ctx.Pool(1) as pool:
+            result = pool.apply(run_point, (args.num_atlases, params))
+        result_list.append(result)
+        print(
+            "%12d %10s %6s %6d %12d %12.0f %10.1f"
+            % (
+                participants,
+                samples,
+                depth if depth > 0 else "-",
+                multiplier,
+                result["num_records"],
+                result["records_per_second"] or 0,
+                result["peak_rss_mb"],
+            )
+        )
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(result_list, out, indent=4)
+
+
+if __name__ == "__main__":
+    main()
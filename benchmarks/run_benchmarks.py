@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark Suite for hsim, with Regression Tracking.
+
+Measures start-up, schema loading, template extraction, generation and link
+checking at several scales, and records wall time, throughput and peak memory
+as JSON.  Results are compared against a stored baseline;  any benchmark that
+is slower, or uses more memory, than the baseline by more than the tolerance
+is reported as a regression, and the suite exits with a non-zero status.
+Start-up is also held to a fixed target:  'hsim --help' must take less than
+100 ms, on any machine.
+
+Run from the root of the repository:
+
+    python benchmarks/run_benchmarks.py                   # compare to baseline
+    python benchmarks/run_benchmarks.py --quick           # smaller scales
+    python benchmarks/run_benchmarks.py --save-baseline   # record a new baseline
+    python benchmarks/run_benchmarks.py --json results.json
+
+Timings depend on the machine;  record a new baseline after moving machines.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from hsim import cli  # noqa: E402
+from hsim import json_reader  # noqa: E402
+from hsim import scale  # noqa: E402
+from hsim import schema_util  # noqa: E402
+from hsim.version import __version__  # noqa: E402
+
+BASELINE_PATH = REPO_DIR / "benchmarks" / "baseline.json"
+EXAMPLE_PATH = REPO_DIR / "example_output" / "sim.json"
+DEFAULT_TOLERANCE = 0.25
+
+# Wall time regressions below this many seconds are considered noise
+MIN_SECONDS = 0.005
+
+# Fixed wall time targets, in seconds, of the best run, regardless of baseline
+TARGET_DICT = {"start_up/help": 0.1}
+
+
+class Benchmark:
+    """
+    A Single Benchmark:  a Function to Measure, and the Units it Processes.
+    """
+
+    def __init__(self, name, fn, units=None, unit_name=None, setup=None):
+        self.name = name
+        self.fn = fn
+        self.units = units
+        self.unit_name = unit_name
+        self.setup = setup
+
+
+class CountingSink:
+    """
+    Binary Output that Discards Everything, Counting Bytes Written.
+    Keeps the serialized output out of the memory measurements.
+    """
+
+    def __init__(self):
+        self.num_bytes = 0
+
+    def write(self, data):
+        self.num_bytes += len(data)
+        return len(data)
+
+
+def measure(benchmark, repeat):
+    """
+    Measure Wall Time (best of repeat runs), Throughput and Peak Memory.
+    Peak memory is measured with tracemalloc, in a separate run, so that
+    tracing does not distort the timings.
+    """
+    state = benchmark.setup() if benchmark.setup is not None else None
+    seconds_list = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        benchmark.fn(state)
+        seconds_list.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    benchmark.fn(state)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    seconds = min(seconds_list)
+    result = {}
+    result["seconds"] = seconds
+    result["mean_seconds"] = sum(seconds_list) / len(seconds_list)
+    result["peak_memory_mb"] = peak_bytes / (1024.0 * 1024.0)
+    if benchmark.units is not None:
+        units = benchmark.units(state) if callable(benchmark.units) else benchmark.units
+        result["units"] = units
+        result["unit_name"] = benchmark.unit_name
+        result["throughput"] = units / seconds if seconds > 0 else None
+    return result
+
+
+def count_records(json_file):
+    """Count all Records in a Simulated Data Set."""
+    with open(json_file) as fd:
+        doc = json.load(fd)
+    num_records = 0
+    for atlas in doc["atlases"]:
+        for value in atlas.values():
+            if isinstance(value, dict):
+                num_records += len(value["record_list"])
+    return num_records
+
+
+def get_template_subset(subset):
+    """Get a Subset of the Template List:  all, clinical or assay templates."""
+    template_list = cli.get_template_list()
+    if subset == "all":
+        return template_list
+    type_dict = {"clinical": cli.CLINICAL_TYPE, "assay": cli.ASSAY_TYPE}
+    return [template for template in template_list if template[1] == type_dict[subset]]
+
+
+def make_generate_benchmark(num_atlases, num_participants, subset):
+    """Make a Benchmark of Generating and Serializing a Data Set."""
+    template_list = get_template_subset(subset)
+    scale_params = scale.ScaleParams(num_participants=num_participants)
+    schema_dict = schema_util.load_htan_schema()
+    target_atlas_list = cli.get_atlas_list(num_atlases)
+
+    def run(ignored):
+        out = CountingSink()
+        cli.write_simulated_data(
+            out, target_atlas_list, schema_dict, template_list, 0, 1, scale_params
+        )
+
+    def units(ignored):
+        records_per_atlas = 0
+        for template in template_list:
+            if template[1] == cli.CLINICAL_TYPE:
+                records_per_atlas += num_participants
+            else:
+                records_per_atlas += num_participants * 6
+        return records_per_atlas * num_atlases
+
+    name = "generate/atlases=%d/participants=%d/templates=%s" % (
+        num_atlases,
+        num_participants,
+        subset,
+    )
+    return Benchmark(name, run, units, "records")
+
+
+def make_reader_benchmark(name, json_file, streaming):
+    """Make a Benchmark of Reading and Checking the Links of a Data Set."""
+    template_list = cli.get_template_list()
+
+    def run(ignored):
+        json_reader.HtanJsonReader(str(json_file), template_list, streaming)
+
+    return Benchmark(name, run, lambda ignored: count_records(json_file), "records")
+
+
+def write_synthetic_input(path, num_atlases, num_participants):
+    """Write a Synthetic Data Set, Larger than the Example Output."""
+    schema_dict = schema_util.load_htan_schema()
+    with open(path, "wb") as out:
+        cli.write_simulated_data(
+            out,
+            cli.get_atlas_list(num_atlases),
+            schema_dict,
+            cli.get_template_list(),
+            0,
+            1,
+            scale.ScaleParams(num_participants=num_participants),
+        )
+
+
+def make_start_up_benchmark(name, code):
+    """Make a Benchmark of Running Python Code in a New Interpreter."""
+
+    def run(ignored):
+        subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=str(REPO_DIR),
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+    return Benchmark(name, run)
+
+
+def get_benchmark_list(tmp_dir, quick):
+    """Get all Benchmarks of the Suite."""
+    benchmark_list = []
+    benchmark_list.append(make_start_up_benchmark("start_up/python", "pass"))
+    benchmark_list.append(make_start_up_benchmark("start_up/import_cli", "import hsim.cli"))
+    benchmark_list.append(
+        make_start_up_benchmark("start_up/help", "from hsim.cli import cli;  cli(['--help'])")
+    )
+
+    def load_schema(ignored):
+        schema_util.load_htan_schema()
+
+    benchmark_list.append(Benchmark("load_htan_schema/json", load_schema))
+
+    schema_dict = schema_util.load_htan_schema()
+    template_id_list = [template[0] for template in cli.get_template_list()]
+
+    def extract_templates(ignored):
+        for template_id in template_id_list:
+            schema_util.extract_template(schema_dict, template_id)
+
+    benchmark_list.append(
+        Benchmark(
+            "extract_template/all",
+            extract_templates,
+            len(template_id_list),
+            "templates",
+        )
+    )
+
+    if quick:
+        scale_list = [(1, 10, "all"), (4, 10, "all"), (1, 100, "assay")]
+    else:
+        scale_list = [
+            (1, 10, "all"),
+            (4, 10, "all"),
+            (16, 10, "all"),
+            (4, 100, "all"),
+            (4, 100, "clinical"),
+            (4, 100, "assay"),
+        ]
+    for num_atlases, num_participants, subset in scale_list:
+        benchmark_list.append(
+            make_generate_benchmark(num_atlases, num_participants, subset)
+        )
+
+    input_list = [("example", EXAMPLE_PATH)]
+    synthetic_atlases = 4 if quick else 16
+    synthetic_path = Path(tmp_dir) / "synthetic.json"
+    write_synthetic_input(synthetic_path, synthetic_atlases, 50)
+    input_list.append(("synthetic-%d" % synthetic_atlases, synthetic_path))
+    for input_name, json_file in input_list:
+        for streaming in [False, True]:
+            name = "check_links/%s/%s" % (
+                input_name,
+                "streaming" if streaming else "in_memory",
+            )
+            benchmark_list.append(make_reader_benchmark(name, json_file, streaming))
+    return benchmark_list
+
+
+def compare(result_dict, baseline_dict, tolerance):
+    """
+    Compare Results to the Baseline, and to their Fixed Targets.
+    Returns the list of regressions, as human-readable strings.
+    """
+    regression_list = get_target_misses(result_dict)
+    for name, result in result_dict.items():
+        baseline = baseline_dict.get(name)
+        if baseline is None:
+            continue
+        for metric, floor in [("seconds", MIN_SECONDS), ("peak_memory_mb", 0.1)]:
+            limit = max(baseline[metric] * (1.0 + tolerance), floor)
+            if result[metric] > limit:
+                regression_list.append(
+                    "%s:  %s is %.4f, baseline is %.4f (+%.0f%%)"
+                    % (
+                        name,
+                        metric,
+                        result[metric],
+                        baseline[metric],
+                        100.0 * (result[metric] / baseline[metric] - 1.0),
+                    )
+                )
+    return regression_list
+
+
+def get_target_misses(result_dict):
+    """Check Results against their Fixed Targets, as Human-Readable Strings."""
+    miss_list = []
+    for name, target in sorted(TARGET_DICT.items()):
+        result = result_dict.get(name)
+        if result is not None and result["seconds"] >= target:
+            miss_list.append(
+                "%s:  seconds is %.4f, target is under %.4f"
+                % (name, result["seconds"], target)
+            )
+    return miss_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true", help="Use smaller scales.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--filter", default="", help="Only run matching benchmarks.")
+    parser.add_argument("--json", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    result_dict = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for benchmark in get_benchmark_list(tmp_dir, args.quick):
+            if args.filter not in benchmark.name:
+                continue
+            result = measure(benchmark, args.repeat)
+            result_dict[benchmark.name] = result
+            throughput = ""
+            if result.get("throughput"):
+                throughput = "%12.0f %s/s" % (result["throughput"], result["unit_name"])
+            print(
+                "%-58s %9.4f s %9.1f MB %s"
+                % (benchmark.name, result["seconds"], result["peak_memory_mb"], throughput)
+            )
+
+    report = {}
+    report["meta"] = {
+        "hsim_version": __version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+    }
+    report["results"] = result_dict
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=4)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as out:
+            json.dump(report, out, indent=4)
+        print("Saved baseline to %s" % args.baseline)
+        return 0
+
+    if Path(args.baseline).exists():
+        with open(args.baseline) as fd:
+            baseline_dict = json.load(fd)["results"]
+    else:
+        print("No baseline found at %s;  only checking targets." % args.baseline)
+        baseline_dict = {}
+    regression_list = compare(result_dict, baseline_dict, args.tolerance)
+    if len(regression_list) > 0:
+        print("\nPERFORMANCE REGRESSIONS (tolerance %.0f%%):" % (100 * args.tolerance))
+        for regression in regression_list:
+            print("  " + regression)
+        return 1
+    print("\nNo regressions against %s." % args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
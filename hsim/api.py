@@ -0,0 +1,213 @@
+"""
+Python API, for Generating Simulated Atlases without Running 'hsim generate'.
+
+Each atlas of a run has its own random number generators, seeded from the
+run seed and the atlas ID, so the atlas at any position of a run can be
+generated directly, without generating the atlases before it:
+
+    from hsim import api
+
+    atlas = api.generate_atlas(1000, seed=42)
+    for atlas in api.iter_atlases(100, seed=42, start=90):
+        ...
+    for table in api.iter_tables(100, "Biospecimen", seed=42):
+        print(table.atlas_id, len(table.record_list))
+
+Atlases are identical to those of 'hsim generate' with the same seed, scale
+and vectorize;  atlas K of a run is HTA<K>.  Scale parameters are passed as
+a ScaleParams, or as a dictionary of the form of a scale config file.
+
+Atlases are generated one at a time, as they are iterated, so memory stays
+bounded no matter how many atlases are generated.  To hold many atlases in
+memory, generate a compact data set, which stores each template as columns;
+see column_store:
+
+    data_set = api.generate_data_set(100, seed=42)
+    table = data_set.get_table("HTA7", "Biospecimen")
+
+The schema is loaded once, on first use;  pass a schema dict to
+AtlasGenerator to use another schema.
+"""
+from collections import namedtuple
+from hsim import cli
+from hsim import column_store
+from hsim import scale
+from hsim import schema_util
+from hsim import table_export
+
+
+class TemplateTable(
+    namedtuple("TemplateTable", ["atlas_id", "label", "column_name_list", "record_list"])
+):
+    """
+    The Records of a Single Template of an Atlas, with the Column Names of
+    their Values.
+    """
+
+    __slots__ = ()
+
+    def get_row_dicts(self):
+        """Get Each Record as a Dictionary of Column Names to Values."""
+        return [dict(zip(self.column_name_list, record)) for record in self.record_list]
+
+
+class AtlasGenerator:
+    """
+    Generates Atlases by Position, from a Loaded Schema.
+    All templates are compiled up front, and shared by all atlases.
+    """
+
+    def __init__(self, schema_dict=None, template_list=None):
+        if schema_dict is None:
+            schema_dict = schema_util.load_htan_schema()
+        if template_list is None:
+            template_list = cli.get_template_list()
+        self.schema_dict = schema_dict
+        self.template_list = template_list
+        for template in template_list:
+            schema_util.get_template_plan(schema_dict, template[0])
+        self.column_name_dict = {}
+        for table_spec in table_export.get_table_spec_list(schema_dict, template_list):
+            self.column_name_dict[table_spec.label] = table_spec.column_name_list[1:]
+
+    def get_schemas(self):
+        """Get the Root Schemas Node, as Written by 'hsim generate'."""
+        data_set = {}
+        cli.generate_schemas_node(self.schema_dict, self.template_list, data_set)
+        return data_set["schemas"]
+
+    def get_template_labels(self):
+        """Get the Labels of all Templates, in Template List Order."""
+        return list(self.column_name_dict)
+
+    def generate_atlas(self, index, seed, params=None, vectorize=False):
+        """
+        Generate the Atlas at the Specified Position of a Run.
+        """
+        if index < 0:
+            raise ValueError("Atlas index must not be negative.")
+        return cli.generate_seeded_atlas(
+            cli.get_target_atlas(index),
+            seed,
+            self.schema_dict,
+            self.template_list,
+            get_scale_params(params),
+            vectorize,
+        )
+
+    def iter_atlases(
+        self, num_atlases, seed, params=None, start=0, vectorize=False, num_workers=1
+    ):
+        """
+        Generate the Atlases at Positions start to num_atlases - 1 of a Run,
+        One at a Time, in Order.
+        With more than one worker, atlases are generated in a process pool.
+        """
+        if start < 0:
+            raise ValueError("Atlas index must not be negative.")
+        target_atlas_list = [
+            cli.get_target_atlas(index) for index in range(start, num_atlases)
+        ]
+        return cli.generate_simulated_atlases(
+            target_atlas_list,
+            self.schema_dict,
+            self.template_list,
+            seed,
+            num_workers,
+            get_scale_params(params),
+            vectorize,
+        )
+
+    def generate_data_set(
+        self, num_atlases, seed, params=None, start=0, vectorize=False, num_workers=1
+    ):
+        """
+        Generate the Atlases at Positions start to num_atlases - 1 of a Run,
+        into a Compact Data Set, with the Schemas.
+        Each atlas is compacted as soon as it is generated.
+        """
+        data_set = column_store.CompactDataSet()
+        data_set.set_schemas(self.get_schemas())
+        for atlas in self.iter_atlases(
+            num_atlases, seed, params, start, vectorize, num_workers
+        ):
+            data_set.add_atlas(atlas)
+        return data_set
+
+    def iter_tables(
+        self,
+        num_atlases,
+        label,
+        seed,
+        params=None,
+        start=0,
+        vectorize=False,
+        num_workers=1,
+    ):
+        """
+        Generate the Table of a Single Template, for Each Atlas of a Run.
+        Atlases are generated whole, since the values of a template depend
+        on those generated before it, but only one is held at a time.
+        """
+        column_name_list = self.column_name_dict.get(label)
+        if column_name_list is None:
+            raise ValueError("Unknown template label:  %s" % label)
+        for atlas in self.iter_atlases(
+            num_atlases, seed, params, start, vectorize, num_workers
+        ):
+            yield TemplateTable(
+                atlas["htan_id"],
+                label,
+                column_name_list,
+                atlas[label]["record_list"],
+            )
+
+
+_generator = None
+
+
+def get_generator():
+    """Get the Generator of the HTAN Schema, Loading the Schema on First Use."""
+    global _generator
+    if _generator is None:
+        _generator = AtlasGenerator()
+    return _generator
+
+
+def get_scale_params(params):
+    """Get Scale Parameters from None, a Dictionary, or ScaleParams."""
+    if params is None:
+        return scale.ScaleParams()
+    if isinstance(params, dict):
+        return scale.ScaleParams.from_dict(params)
+    return params
+
+
+def generate_atlas(index, seed, params=None, vectorize=False):
+    """Generate the Atlas at the Specified Position of a Run."""
+    return get_generator().generate_atlas(index, seed, params, vectorize)
+
+
+def iter_atlases(num_atlases, seed, params=None, start=0, vectorize=False, num_workers=1):
+    """Generate the Atlases of a Run, One at a Time, in Order."""
+    return get_generator().iter_atlases(
+        num_atlases, seed, params, start, vectorize, num_workers
+    )
+
+
+def generate_data_set(
+    num_atlases, seed, params=None, start=0, vectorize=False, num_workers=1
+):
+    """Generate the Atlases of a Run, into a Compact Data Set."""
+    return get_generator().generate_data_set(
+        num_atlases, seed, params, start, vectorize, num_workers
+    )
+
+
+def iter_tables(
+    num_atlases, label, seed, params=None, start=0, vectorize=False, num_workers=1
+):
+    """Generate the Table of a Single Template, for Each Atlas of a Run."""
+    return get_generator().iter_tables(
+        num_atlases, label, seed, params, start, vectorize, num_workers
+    )
@@ -1,15 +1,25 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import json
-from . import schema_util
-from . import id_util
-from . import json_reader
-from pathlib import Path
-import emoji
+from collections import deque
+import contextlib
+import random
+from . import constants
 
-ASSAY_TYPE = "assay"
-CLINICAL_TYPE = "clinical"
-BIOSPECIMEN_TYPE = "biospecimen"
+# Only click and constants are imported up front:  the hsim modules, and
+# the modules they load, such as compression, threading, hashlib,
+# mmap, tracemalloc, emoji, cProfile and the process pool, are imported by
+# the commands and functions that use them, so that 'hsim --help' and the
+# other commands start quickly
+
+ASSAY_TYPE = constants.ASSAY_TYPE
+CLINICAL_TYPE = constants.CLINICAL_TYPE
+BIOSPECIMEN_TYPE = constants.BIOSPECIMEN_TYPE
+
+# Default output path of 'hsim generate', per output format
+DEFAULT_PATH_DICT = {
+    constants.JSON_FORMAT: "example_output/sim.json",
+    constants.SQLITE_FORMAT: "example_output/sim.db",
+}
 
 """
 This is the entry point for the command-line interface (CLI) application.
@@ -25,66 +35,619 @@ def cli():
 
 
 @cli.command()
-@click.argument("json_file", type=click.Path(), default="example_output/sim.json")
+@click.argument("json_file", type=click.Path(), default=None, required=False)
 @click.option("--num_atlases", type=click.INT, default=3)
-def generate(json_file, num_atlases):
+@click.option(
+    "--seed",
+    type=click.INT,
+    default=None,
+    help="Random seed;  each atlas gets its own seed derived from it.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of worker processes used to generate atlases.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(constants.OUTPUT_FORMAT_LIST),
+    default=constants.JSON_FORMAT,
+    show_default=True,
+    help="Write a JSON file, or an indexed SQLite database, one table per template.  "
+    "[default path: example_output/sim.json, or example_output/sim.db]",
+)
+@click.option(
+    "--compact",
+    is_flag=True,
+    default=False,
+    help="Write compact JSON, without indentation.",
+)
+@click.option(
+    "--compression",
+    "compression_type",
+    type=click.Choice(constants.COMPRESSION_LIST),
+    default=None,
+    help="Compress the output.  [default: from the extension, .gz, .xz or .bz2]",
+)
+@click.option(
+    "--config",
+    type=click.Path(exists=True),
+    default=None,
+    help="JSON config file with scale parameters.",
+)
+@click.option(
+    "--participants",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Number of participants per atlas.  [default: 10]",
+)
+@click.option(
+    "--samples-per-participant",
+    default=None,
+    help="Samples per participant, as a number or a min-max range.  [default: 6]",
+)
+@click.option(
+    "--max-lineage-depth",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum depth of biospecimen lineage chains.  [default: unlimited]",
+)
+@click.option(
+    "--template-multiplier",
+    multiple=True,
+    help="Records per ID for a template, as TEMPLATE_ID=N;  may be repeated.",
+)
+@click.option(
+    "--vectorize",
+    is_flag=True,
+    default=False,
+    help="Generate values a column at a time with NumPy.",
+)
+@click.option(
+    "--shards",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Split the atlases across this many shard files, listed in a manifest.",
+)
+@click.option(
+    "--max-shard-bytes",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Start a new shard file once a shard reaches this size.",
+)
+@click.option(
+    "--index",
+    is_flag=True,
+    default=False,
+    help="Write a sidecar index of byte offsets, for random access.",
+)
+@click.option(
+    "--tables",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Also export one table per template to this directory.",
+)
+@click.option(
+    "--table-format",
+    type=click.Choice(constants.TABLE_FORMAT_LIST),
+    default=constants.TSV,
+    show_default=True,
+    help="Format of the exported tables.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Cache serialized atlases in this directory, and reuse them on later runs.",
+)
+@click.option(
+    "--cache-max-bytes",
+    type=click.IntRange(min=0),
+    default=constants.DEFAULT_CACHE_MAX_BYTES,
+    show_default=True,
+    help="Evict least recently used atlases once the cache exceeds this size.",
+)
+@click.option(
+    "--pipeline-stats",
+    is_flag=True,
+    default=False,
+    help="Print the throughput of each pipeline stage:  generate, serialize, write.",
+)
+@click.option(
+    "--profile",
+    type=click.Path(),
+    default=None,
+    help="Write a per-stage timing and memory report, as JSON, to this file.",
+)
+@click.option(
+    "--pstats",
+    type=click.Path(),
+    default=None,
+    help="Write cProfile statistics, for use with pstats, to this file.",
+)
+def generate(
+    json_file,
+    num_atlases,
+    seed,
+    workers,
+    output_format,
+    compact,
+    compression_type,
+    config,
+    participants,
+    samples_per_participant,
+    max_lineage_depth,
+    template_multiplier,
+    vectorize,
+    shards,
+    max_shard_bytes,
+    index,
+    tables,
+    table_format,
+    cache_dir,
+    cache_max_bytes,
+    pipeline_stats,
+    profile,
+    pstats,
+):
     """Generate Simulated HTAN Data"""
 
+    from hsim import compression
+    from hsim import fragment_cache
+    from hsim import json_index
+    from hsim import profiling
+    from hsim import schema_util
+    from hsim import shard
+    from hsim import table_export
+
+    # Never write a database over the example JSON file
+    if json_file is None:
+        json_file = DEFAULT_PATH_DICT[output_format]
+
     # The Atlases for which we will generate simulated data
     target_atlas_list = get_atlas_list(num_atlases)
 
     # The Data Templates for which we will generate simulated data
     template_list = get_template_list()
 
-    # Load the HTAN JSON-LD Schema
-    schema_dict = schema_util.load_htan_schema()
-
-    atlas_list = []
-    for target_atlas in target_atlas_list:
-        atlas_list.append(
-            generate_simulated_atlas(
-                target_atlas[0], target_atlas[1], schema_dict, template_list
-            )
+    # How many participants, samples and records to generate per atlas
+    scale_params = get_scale_params(
+        template_list,
+        config,
+        participants,
+        samples_per_participant,
+        max_lineage_depth,
+        template_multiplier,
+    )
+    if vectorize and schema_util.import_numpy() is None:
+        raise click.UsageError((
+            "--vectorize requires NumPy, which is not installed;  "
+            "run pip install 'hsim[vectorize]'."
+        ))
+    if shards is not None and max_shard_bytes is not None:
+        raise click.UsageError("Use either --shards or --max-shard-bytes, not both.")
+    if tables is not None:
+        check_table_format(table_format)
+    if index and (shards is not None or max_shard_bytes is not None):
+        raise click.UsageError("--index is not supported for sharded output.")
+    if index and compression.get_compression(json_file, compression_type) != compression.NONE:
+        raise click.UsageError("--index requires uncompressed output.")
+    if cache_dir is not None and tables is not None:
+        raise click.UsageError("--cache-dir is not supported with --tables.")
+    if output_format == constants.SQLITE_FORMAT:
+        check_sqlite_options(
+            compact=compact,
+            compression=compression_type,
+            shards=shards,
+            max_shard_bytes=max_shard_bytes,
+            index=index,
+            tables=tables,
+            cache_dir=cache_dir,
         )
 
-    data_set = {}
-    data_set["atlases"] = atlas_list
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+        print("Using random seed:  %d" % seed)
+
+    with profile_command(profile, pstats):
+        # Load the HTAN JSON-LD Schema
+        with profiling.stage("load_schema"):
+            schema_dict = schema_util.load_htan_schema()
 
-    # Generate the root schema node
-    generate_schemas_node(schema_dict, template_list, data_set)
+        if output_format == constants.SQLITE_FORMAT:
+            print(emojize("Writing SQLite Database:  %s :beer:" % json_file))
+            stats_list = write_simulated_database(
+                json_file,
+                target_atlas_list,
+                schema_dict,
+                template_list,
+                seed,
+                workers,
+                scale_params,
+                vectorize,
+            )
+            if pipeline_stats:
+                print_pipeline_stats(stats_list)
+            return
 
-    json_dump = json.dumps(data_set, indent=4)
-    print(emoji.emojize("Writing JSON File:  %s :beer:" % json_file, use_aliases=True))
-    out = open(json_file, "w")
-    out.write(json_dump)
-    out.close()
+        # Stream atlases to disk as they are generated
+        indent = None if compact else 4
+        cache = None
+        if cache_dir is not None:
+            cache = fragment_cache.FragmentCache(cache_dir, cache_max_bytes)
+        table_exporter = None
+        if tables is not None:
+            print(emojize("Writing Tables:  %s :beer:" % tables))
+            table_exporter = table_export.TableExporter(
+                tables,
+                table_export.get_table_spec_list(schema_dict, template_list),
+                table_format,
+            )
+        if shards is None and max_shard_bytes is None:
+            print(emojize("Writing JSON File:  %s :beer:" % json_file))
+            index_writer = None
+            if index:
+                index_path = json_index.get_index_path(json_file)
+                print(emojize("Writing Index:  %s :beer:" % index_path))
+                index_writer = json_index.JsonIndexWriter(index_path, json_file)
+            with compression.open_output(json_file, compression_type) as out:
+                stats_list = write_simulated_data(
+                    out,
+                    target_atlas_list,
+                    schema_dict,
+                    template_list,
+                    seed,
+                    workers,
+                    scale_params,
+                    vectorize,
+                    indent,
+                    table_exporter,
+                    index_writer,
+                    cache,
+                )
+        else:
+            print(emojize("Writing Sharded JSON, with Manifest:  %s :beer:" % json_file))
+            atlases_per_shard = None
+            if shards is not None:
+                atlases_per_shard = shard.get_atlases_per_shard(num_atlases, shards)
+            writer = shard.ShardedJsonWriter(
+                json_file, atlases_per_shard, max_shard_bytes, indent, compression_type
+            )
+            stats_list = write_simulated_atlases(
+                writer,
+                target_atlas_list,
+                schema_dict,
+                template_list,
+                seed,
+                workers,
+                scale_params,
+                vectorize,
+                table_exporter,
+                cache,
+            )
+        if cache is not None:
+            cache.close()
+            stats = cache.get_stats()
+            print(
+                "Atlas cache:  %d hits, %d misses, %d evictions."
+                % (stats["hits"], stats["misses"], stats["evictions"])
+            )
+        if pipeline_stats:
+            print_pipeline_stats(stats_list)
 
 
 @cli.command()
 @click.argument(
     "json_file", type=click.Path(exists=True), default="example_output/sim.json"
 )
-def check_links(json_file):
+@click.option(
+    "--stream",
+    is_flag=True,
+    default=False,
+    help="Parse one atlas at a time, for files larger than memory.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of worker processes;  used for sharded data sets, and files "
+    "with a sidecar index.",
+)
+@click.option(
+    "--profile",
+    type=click.Path(),
+    default=None,
+    help="Write a per-stage timing and memory report, as JSON, to this file.",
+)
+@click.option(
+    "--pstats",
+    type=click.Path(),
+    default=None,
+    help="Write cProfile statistics, for use with pstats, to this file.",
+)
+def check_links(json_file, stream, workers, profile, pstats):
     """Check all internal links"""
+    from hsim import json_reader
+
     print ("Checking links in %s." % json_file)
     template_list = get_template_list()
-    reader = json_reader.HtanJsonReader(json_file, template_list)
+    with profile_command(profile, pstats):
+        reader = json_reader.HtanJsonReader(
+            json_file, template_list, streaming=stream, num_workers=workers
+        )
     error_list = reader.get_error_list()
     if len(error_list) == 0:
-        print (emoji.emojize("All links check out. Congrats! :beer:", use_aliases=True))
+        print (emojize("All links check out. Congrats! :beer:"))
     else:
-        print (emoji.emojize("Total number of error found:  %d :lemon:" % len(error_list), use_aliases=True))
+        print (emojize("Total number of error found:  %d :lemon:" % len(error_list)))
         for error in error_list:
             print (error)
 
 
+@cli.command()
+@click.argument("json_file", type=click.Path(exists=True))
+@click.argument("out_dir", type=click.Path(file_okay=False))
+@click.option(
+    "--format",
+    "table_format",
+    type=click.Choice(constants.TABLE_FORMAT_LIST),
+    default=constants.TSV,
+    show_default=True,
+    help="Format of the exported tables.",
+)
+def export_tables(json_file, out_dir, table_format):
+    """Export one table per template"""
+    from hsim import json_reader
+    from hsim import table_export
+
+    check_table_format(table_format)
+    # Records mean what the file's own schemas node says they mean
+    table_spec_list = table_export.get_schemas_table_spec_list(
+        json_reader.read_schemas(json_file)
+    )
+    table_exporter = table_export.TableExporter(out_dir, table_spec_list, table_format)
+    try:
+        for atlas in json_reader.iter_atlases(json_file):
+            table_exporter.write_atlas(atlas)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        table_exporter.close()
+    for label, path, num_rows in table_exporter.get_table_list():
+        print("%-24s %10d rows  %s" % (label, num_rows, path))
+    print(emojize("Wrote Tables:  %s :beer:" % out_dir))
+
+
+@cli.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", type=click.IntRange(min=0), default=8000, show_default=True)
+@click.option(
+    "--cache-size",
+    type=click.IntRange(min=1),
+    default=constants.DEFAULT_CACHE_SIZE,
+    show_default=True,
+    help="Number of recently generated atlases to keep in memory.",
+)
+@click.option("--verbose", is_flag=True, default=False, help="Log every request.")
+def serve(host, port, cache_size, verbose):
+    """Serve simulated atlases over HTTP"""
+    from hsim import schema_util
+    from hsim import server
+
+    schema_dict = schema_util.load_htan_schema()
+    service = server.AtlasService(schema_dict, get_template_list(), cache_size)
+    http_server = server.make_server(service, host, port, verbose)
+    host, port = http_server.server_address[:2]
+    print(emojize("Serving simulated atlases at http://%s:%d/ :beer:" % (host, port)))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+
+
+@cli.command()
+@click.argument("json_file", type=click.Path(exists=True))
+@click.argument("db_file", type=click.Path(dir_okay=False))
+def export_sqlite(json_file, db_file):
+    """Export one SQLite table per template"""
+    from hsim import json_reader
+    from hsim import sqlite_export
+
+    exporter = sqlite_export.SqliteExporter(
+        db_file, json_reader.read_schemas(json_file)
+    )
+    try:
+        for atlas in json_reader.iter_atlases(json_file):
+            exporter.write_atlas(atlas)
+    except ValueError as e:
+        exporter.abort()
+        raise click.ClickException(str(e))
+    except BaseException:
+        exporter.abort()
+        raise
+    exporter.close()
+    for label, num_rows in exporter.get_table_list():
+        print("%-24s %10d rows" % (label, num_rows))
+    print(emojize("Wrote SQLite Database:  %s :beer:" % db_file))
+
+
+@cli.command()
+@click.argument("json_file", type=click.Path(exists=True))
+def index_facets(json_file):
+    """Write a facet index of attribute values"""
+    from hsim import facet_index
+    from hsim import json_reader
+
+    reader = json_reader.HtanJsonReader(
+        json_file, get_template_list(), streaming=True, facets=True
+    )
+    index = reader.get_facet_index()
+    for label in index.get_template_labels():
+        print(
+            "%-24s %10d rows  %3d facets"
+            % (label, index.get_num_records(label), len(index.get_attribute_ids(label)))
+        )
+    index.write(json_file)
+    print(emojize("Wrote Facet Index:  %s :beer:" % facet_index.get_facet_path(json_file)))
+
+
+def print_pipeline_stats(stats_list):
+    """
+    Print the Throughput Counters of Each Pipeline Stage.
+    Busy is the time spent on items;  wait, the time spent waiting for the
+    previous stage;  blocked, the time spent waiting for the next stage.
+    The busiest stage is the bottleneck.
+    """
+    print(
+        "%-14s %8s %10s %10s %11s %10s %10s"
+        % ("stage", "items", "busy (s)", "wait (s)", "blocked (s)", "items/s", "MB/s")
+    )
+    for stats in stats_list:
+        items_per_second = "-"
+        if stats["items_per_second"] is not None:
+            items_per_second = "%.1f" % stats["items_per_second"]
+        mb_per_second = "-"
+        if stats["bytes"] > 0 and stats["bytes_per_second"] is not None:
+            mb_per_second = "%.1f" % (stats["bytes_per_second"] / 1e6)
+        print(
+            "%-14s %8d %10.3f %10.3f %11.3f %10s %10s"
+            % (
+                stats["name"],
+                stats["items"],
+                stats["busy_seconds"],
+                stats["wait_seconds"],
+                stats["blocked_seconds"],
+                items_per_second,
+                mb_per_second,
+            )
+        )
+
+
+def check_sqlite_options(**option_dict):
+    """
+    Check that no JSON Output Options are Given with --format sqlite.
+    """
+    for name, value in option_dict.items():
+        if value not in (None, False):
+            raise click.UsageError(
+                "--%s is not supported with --format sqlite."
+                % name.replace("_", "-")
+            )
+
+
+def check_table_format(table_format):
+    """Check that the Table Format can be Written."""
+    from hsim import table_export
+
+    if table_format == table_export.PARQUET and table_export.import_pyarrow() is None:
+        raise click.UsageError(table_export.PYARROW_ERROR)
+
+
+def emojize(message):
+    """Replace the Emoji Aliases in a Message, Importing emoji on First Use."""
+    import emoji
+
+    return emoji.emojize(message, use_aliases=True)
+
+
+@contextlib.contextmanager
+def profile_command(profile_file=None, pstats_file=None):
+    """
+    Profile a Command, if Requested.
+    Writes the per-stage report to profile_file, and cProfile
+    statistics to pstats_file.
+    """
+    from hsim import profiling
+
+    stage_profiler = None
+    if profile_file is not None:
+        stage_profiler = profiling.StageProfiler()
+        profiling.activate(stage_profiler)
+    cprofiler = None
+    if pstats_file is not None:
+        import cProfile
+
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+    try:
+        with profiling.stage("total"):
+            yield
+    finally:
+        if cprofiler is not None:
+            cprofiler.disable()
+            cprofiler.dump_stats(pstats_file)
+            print("Wrote cProfile stats:  %s" % pstats_file)
+        if stage_profiler is not None:
+            profiling.activate(profiling.NullProfiler())
+            stage_profiler.close()
+            stage_profiler.write_report(profile_file)
+            print("Wrote profile report:  %s" % profile_file)
+
+
 def get_atlas_list(num_atlases):
     target_atlas_list = []
     for i in range (num_atlases):
-        target_atlas_list.append(["HTA%d" % i, "HTAN Atlas %d" % i])
+        target_atlas_list.append(get_target_atlas(i))
     return target_atlas_list
 
 
+def get_target_atlas(index):
+    """Get the ID and Name of the Atlas at the Specified Position of a Run."""
+    return ["HTA%d" % index, "HTAN Atlas %d" % index]
+
+
+def get_scale_params(
+    template_list,
+    config=None,
+    participants=None,
+    samples_per_participant=None,
+    max_lineage_depth=None,
+    template_multiplier_list=(),
+):
+    """
+    Get Scale Parameters from the Config File, Overridden by CLI Options.
+    """
+    from hsim import scale
+
+    try:
+        if config is not None:
+            params = scale.load_scale_config(config).to_dict()
+        else:
+            params = scale.ScaleParams().to_dict()
+        if participants is not None:
+            params["num_participants"] = participants
+        if samples_per_participant is not None:
+            params["samples_per_participant"] = samples_per_participant
+        if max_lineage_depth is not None:
+            params["max_lineage_depth"] = max_lineage_depth
+        for template_multiplier in template_multiplier_list:
+            template_id, sep, multiplier = template_multiplier.partition("=")
+            if not sep or not multiplier.isdigit():
+                raise ValueError(
+                    "Invalid template multiplier:  %s" % template_multiplier
+                )
+            params["template_multipliers"][template_id] = int(multiplier)
+        scale_params = scale.ScaleParams.from_dict(params)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    template_type_dict = dict(template_list)
+    for template_id in scale_params.template_multipliers:
+        template_type = template_type_dict.get(template_id)
+        if template_type is None:
+            raise click.BadParameter("Unknown template:  %s" % template_id)
+        if template_type == BIOSPECIMEN_TYPE:
+            raise click.BadParameter(
+                "Biospecimen records are one per sample, and cannot be multiplied."
+            )
+    return scale_params
+
+
 def get_template_list():
     template_list = []
     template_list.append(["bts:Demographics", CLINICAL_TYPE])
@@ -110,6 +673,8 @@ def get_template_list():
 
 
 def generate_schemas_node(schema_dict, template_list, data_set):
+    from hsim import schema_util
+
     schema_list = []
     for template in template_list:
         current_schema = {}
@@ -121,44 +686,506 @@ def generate_schemas_node(schema_dict, template_list, data_set):
     data_set["schemas"] = schema_list
 
 
-def generate_simulated_atlas(atlas_id, atlas_name, schema_dict, template_list):
+def compile_templates(schema_dict, template_list):
+    """
+    Compile all Templates, and Get the Root Schemas Node.
+    """
+    from hsim import profiling
+    from hsim import schema_util
+
+    for template in template_list:
+        with profiling.stage("compile_templates", template=template[0]):
+            schema_util.get_template_plan(schema_dict, template[0])
+    data_set = {}
+    with profiling.stage("compile_templates"):
+        generate_schemas_node(schema_dict, template_list, data_set)
+    return data_set["schemas"]
+
+
+def write_simulated_database(
+    db_path,
+    target_atlas_list,
+    schema_dict,
+    template_list,
+    seed,
+    num_workers=1,
+    scale_params=None,
+    vectorize=False,
+):
+    """
+    Generate Simulated Atlases, and Insert them into a SQLite Database, One
+    Table per Template.  Indexes are built once all atlases are inserted.
+    Returns the throughput counters of each stage of the pipeline.
+    """
+    from hsim import pipeline
+    from hsim import profiling
+    from hsim import sqlite_export
+
+    schema_list = compile_templates(schema_dict, template_list)
+    exporter = sqlite_export.SqliteExporter(db_path, schema_list)
+
+    def insert(atlas):
+        with profiling.stage("insert", atlas=atlas["htan_id"]):
+            exporter.write_atlas(atlas)
+        return atlas
+
+    stage_list = [pipeline.Stage("insert", insert)]
+    threaded = not profiling.get_profiler().is_enabled()
+    atlas_pipeline = pipeline.Pipeline("generate", stage_list, threaded=threaded)
+    try:
+        atlas_pipeline.run(
+            generate_simulated_atlases(
+                target_atlas_list,
+                schema_dict,
+                template_list,
+                seed,
+                num_workers,
+                scale_params,
+                vectorize,
+            )
+        )
+        with profiling.stage("build_indexes"):
+            exporter.close()
+    except BaseException:
+        exporter.abort()
+        raise
+    return atlas_pipeline.get_stats()
+
+
+def write_simulated_data(
+    out,
+    target_atlas_list,
+    schema_dict,
+    template_list,
+    seed,
+    num_workers=1,
+    scale_params=None,
+    vectorize=False,
+    indent=4,
+    table_exporter=None,
+    index_writer=None,
+    cache=None,
+):
+    """
+    Generate Simulated Atlases, and Stream them to the Binary Output.
+    With a table exporter, atlases are also exported as tables;  with an
+    index writer, the byte ranges of atlases and record lists are indexed.
+    With a fragment cache, cached atlases are copied, rather than generated.
+    Returns the throughput counters of each stage of the pipeline.
+    """
+    from hsim import json_writer
+
+    writer = json_writer.HtanJsonWriter(out, indent, index_writer)
+    stats_list = write_simulated_atlases(
+        writer,
+        target_atlas_list,
+        schema_dict,
+        template_list,
+        seed,
+        num_workers,
+        scale_params,
+        vectorize,
+        table_exporter,
+        cache,
+    )
+    if index_writer is not None:
+        out.flush()
+        index_writer.close(writer.num_bytes)
+    return stats_list
+
+
+def write_simulated_atlases(
+    writer,
+    target_atlas_list,
+    schema_dict,
+    template_list,
+    seed,
+    num_workers=1,
+    scale_params=None,
+    vectorize=False,
+    table_exporter=None,
+    cache=None,
+):
+    """
+    Generate Simulated Atlases, and Stream them to the Writer:
+    an HtanJsonWriter, or a ShardedJsonWriter.
+    With a table exporter, atlases are also exported as tables.
+    With a fragment cache, cached atlases are copied, rather than generated;
+    tables cannot be exported from cached atlases.
+
+    Atlases are generated, serialized and written in a pipeline, so that
+    each stage works on its own atlas, while the others work on theirs.
+    Cached atlases are read in a stage of their own, and skip generation and
+    serialization.  Returns the throughput counters of each stage.
+    """
+    from hsim import json_writer
+    from hsim import pipeline
+    from hsim import profiling
+
+    if cache is not None and table_exporter is not None:
+        raise ValueError("Tables cannot be exported with a fragment cache.")
+    schema_list = compile_templates(schema_dict, template_list)
+
+    if cache is None:
+        atlas_iter = generate_simulated_atlases(
+            target_atlas_list,
+            schema_dict,
+            template_list,
+            seed,
+            num_workers,
+            scale_params,
+            vectorize,
+        )
+        source = ((None, None, atlas) for atlas in atlas_iter)
+    else:
+        source = iter_cached_atlases(
+            target_atlas_list,
+            schema_dict,
+            template_list,
+            seed,
+            num_workers,
+            scale_params,
+            vectorize,
+            writer.indent,
+            cache,
+        )
+
+    def read_cache(item):
+        key, target_atlas, atlas = item
+        with profiling.stage("read_cache", atlas=target_atlas[0]):
+            fragment = cache.get(key)
+        if fragment is not None:
+            return key, target_atlas, fragment
+        # Removed by another run, since this run started
+        atlas = generate_seeded_atlas(
+            target_atlas, seed, schema_dict, template_list, scale_params, vectorize
+        )
+        return key, target_atlas, atlas
+
+    def serialize(item):
+        key, target_atlas, atlas = item
+        with profiling.stage("serialize", atlas=atlas["htan_id"]):
+            fragment = writer.serialize_atlas(atlas)
+        if cache is not None:
+            with profiling.stage("write_cache", atlas=atlas["htan_id"]):
+                cache.put(key, fragment)
+        if table_exporter is None:
+            atlas = None
+        return key, atlas, fragment
+
+    def export_tables(item):
+        key, atlas, fragment = item
+        with profiling.stage("export_tables", atlas=fragment.htan_id):
+            table_exporter.write_atlas(atlas)
+        return item
+
+    def write(item):
+        # Serialized atlases, and atlases read from the cache, end in fragments
+        fragment = item[-1]
+        with profiling.stage("write", atlas=fragment.htan_id):
+            writer.write_fragment(fragment)
+        return fragment
+
+    def is_cache_hit(item):
+        return item[2] is None
+
+    def is_generated(item):
+        return item[2] is not None
+
+    def is_atlas(item):
+        return not isinstance(item[2], json_writer.AtlasFragment)
+
+    def get_size(item):
+        if is_atlas(item):
+            # Removed from the cache, and not read after all
+            return 0
+        return len(item[2].data)
+
+    stage_list = []
+    source_counts = None
+    if cache is not None:
+        stage_list.append(pipeline.Stage("read_cache", read_cache, get_size, is_cache_hit))
+        source_counts = is_generated
+    stage_list.append(
+        pipeline.Stage("serialize", serialize, lambda item: len(item[2].data), is_atlas)
+    )
+    if table_exporter is not None:
+        stage_list.append(pipeline.Stage("export_tables", export_tables))
+    stage_list.append(pipeline.Stage("write", write, lambda fragment: len(fragment.data)))
+    # The stage profiler times one stage at a time, so profiled runs are serial
+    threaded = not profiling.get_profiler().is_enabled()
+    atlas_pipeline = pipeline.Pipeline(
+        "generate", stage_list, threaded=threaded, source_counts=source_counts
+    )
+    atlas_pipeline.run(source)
+
+    with profiling.stage("serialize"):
+        writer.write_schemas(schema_list)
+    if table_exporter is not None:
+        table_exporter.close()
+    return atlas_pipeline.get_stats()
+
+
+def get_atlas_seed(seed, atlas_id):
+    """
+    Derive the Seed of a Single Atlas from the Run Seed.
+    The derived seed only depends on the run seed and the atlas ID,
+    so every atlas is reproducible no matter which process generates it.
+    """
+    import hashlib
+
+    digest = hashlib.sha256(("%d:%s" % (seed, atlas_id)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def iter_cached_atlases(
+    target_atlas_list,
+    schema_dict,
+    template_list,
+    seed,
+    num_workers,
+    scale_params,
+    vectorize,
+    indent,
+    cache,
+):
+    """
+    Get the Keys, Target Atlases and Atlases of a Run, in order.
+    Atlases missing from the cache are generated, in the process pool if
+    there are several workers, and are to be serialized, and stored in the
+    cache;  cached atlases are None, and are to be read from the cache.
+    """
+    from hsim import fragment_cache
+
+    key_prefix = fragment_cache.get_key_prefix(
+        schema_dict, template_list, seed, scale_params, vectorize, indent
+    )
+    key_list = []
+    miss_list = []
+    for target_atlas in target_atlas_list:
+        key = fragment_cache.get_atlas_key(key_prefix, target_atlas)
+        key_list.append(key)
+        if not cache.contains(key):
+            miss_list.append(target_atlas)
+    miss_set = set(target_atlas[0] for target_atlas in miss_list)
+    atlas_iter = generate_simulated_atlases(
+        miss_list,
+        schema_dict,
+        template_list,
+        seed,
+        num_workers,
+        scale_params,
+        vectorize,
+    )
+
+    for target_atlas, key in zip(target_atlas_list, key_list):
+        if target_atlas[0] in miss_set:
+            yield key, target_atlas, next(atlas_iter)
+        else:
+            yield key, target_atlas, None
+
+
+def generate_simulated_atlases(
+    target_atlas_list,
+    schema_dict,
+    template_list,
+    seed,
+    num_workers=1,
+    scale_params=None,
+    vectorize=False,
+):
+    """
+    Generate Simulated Atlases, in order.
+    With more than one worker, atlases are generated in a process pool;
+    the output is identical to the single process output.
+    With vectorize, values are generated a column at a time with NumPy.
+    """
+    from hsim import profiling
+
+    if num_workers == 1:
+        for target_atlas in target_atlas_list:
+            yield generate_seeded_atlas(
+                target_atlas, seed, schema_dict, template_list, scale_params, vectorize
+            )
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    profiler = profiling.get_profiler()
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_atlas_worker,
+        initargs=(
+            schema_dict,
+            template_list,
+            scale_params,
+            vectorize,
+            profiler.is_enabled(),
+        ),
+    ) as executor:
+        # Bound the number of atlases in flight, so memory stays flat
+        pending = deque()
+        for target_atlas in target_atlas_list:
+            if len(pending) >= num_workers * 2:
+                atlas, record_list = pending.popleft().result()
+                profiler.add_records(record_list)
+                yield atlas
+            pending.append(executor.submit(_run_atlas_worker, target_atlas, seed))
+        while pending:
+            atlas, record_list = pending.popleft().result()
+            profiler.add_records(record_list)
+            yield atlas
+
+
+_worker_state = {}
+
+
+def _init_atlas_worker(schema_dict, template_list, scale_params, vectorize, profile):
+    """Initialize a Worker Process of the Atlas Pool."""
+    from hsim import profiling
+
+    _worker_state["schema_dict"] = schema_dict
+    _worker_state["template_list"] = template_list
+    _worker_state["scale_params"] = scale_params
+    _worker_state["vectorize"] = vectorize
+    if profile:
+        profiling.activate(profiling.StageProfiler())
+    else:
+        profiling.activate(profiling.NullProfiler())
+
+
+def _run_atlas_worker(target_atlas, seed):
+    """
+    Generate a Single Atlas within a Worker Process.
+    Returns the atlas, and the stage records of the worker's profiler.
+    """
+    from hsim import profiling
+
+    atlas = generate_seeded_atlas(
+        target_atlas,
+        seed,
+        _worker_state["schema_dict"],
+        _worker_state["template_list"],
+        _worker_state["scale_params"],
+        _worker_state["vectorize"],
+    )
+    return atlas, profiling.get_profiler().pop_records()
+
+
+def generate_seeded_atlas(
+    target_atlas, seed, schema_dict, template_list, scale_params=None, vectorize=False
+):
+    """Generate a Single Atlas with its own Random Number Generators."""
+    from hsim import schema_util
+
+    atlas_seed = get_atlas_seed(seed, target_atlas[0])
+    rng = random.Random(atlas_seed)
+    np_rng = schema_util.get_numpy_rng(atlas_seed) if vectorize else None
+    return generate_simulated_atlas(
+        target_atlas[0],
+        target_atlas[1],
+        schema_dict,
+        template_list,
+        rng,
+        scale_params,
+        np_rng,
+    )
+
+
+def generate_simulated_atlas(
+    atlas_id,
+    atlas_name,
+    schema_dict,
+    template_list,
+    rng=random,
+    scale_params=None,
+    np_rng=None,
+):
+    from hsim import profiling
+    from hsim import scale
+
     atlas = {}
     atlas["htan_id"] = atlas_id
     atlas["htan_name"] = atlas_name
 
-    NUM_PARTICIPANTS = 10
-    NUM_SAMPLES_PER_PARTICIPANT = 6
-
-    id_set = id_util.generate_id_set(
-        atlas_id, NUM_PARTICIPANTS, NUM_SAMPLES_PER_PARTICIPANT
-    )
+    if scale_params is None:
+        scale_params = scale.ScaleParams()
+    with profiling.stage("generate_ids", atlas=atlas_id):
+        id_set = generate_atlas_id_set(atlas_id, scale_params, rng)
 
     for template in template_list:
-        template_label = schema_util.get_label(schema_dict, template[0])
-        template_type = template[1]
-        if template_type == CLINICAL_TYPE:
-            atlas[template_label] = get_dummy_clinical_data(
-                id_set, schema_dict, template[0], template[1]
-            )
-        elif template_type == BIOSPECIMEN_TYPE:
-            atlas[template_label] = get_dummy_biospecimen_data(
-                id_set, schema_dict, template[0], template[1]
-            )
-        else:
-            atlas[template_label] = get_dummy_assay_files(
-                id_set, schema_dict, template[0], template[1]
+        with profiling.stage("generate_values", atlas=atlas_id, template=template[0]):
+            generate_template_data(
+                atlas, id_set, schema_dict, template, rng, scale_params, np_rng
             )
     return atlas
 
 
-def get_dummy_clinical_data(id_set, schema_dict, template_id, template_type):
-    participant_id_list = id_util.extract_participant_id_list(id_set)
-    record_list = []
-    for participant_id in participant_id_list:
-        current_record = schema_util.get_front_end_simulated_values(
-            schema_dict, template_id, participant_id
+def generate_template_data(
+    atlas, id_set, schema_dict, template, rng, scale_params, np_rng=None
+):
+    """Generate the Simulated Data of a Single Template, within the Atlas."""
+    from hsim import schema_util
+
+    template_label = schema_util.get_template_plan(schema_dict, template[0]).label
+    template_type = template[1]
+    multiplier = scale_params.get_multiplier(template[0])
+    if template_type == CLINICAL_TYPE:
+        atlas[template_label] = get_dummy_clinical_data(
+            id_set, schema_dict, template[0], template[1], rng, multiplier, np_rng
+        )
+    elif template_type == BIOSPECIMEN_TYPE:
+        atlas[template_label] = get_dummy_biospecimen_data(
+            id_set, schema_dict, template[0], template[1], rng, np_rng
+        )
+    else:
+        atlas[template_label] = get_dummy_assay_files(
+            id_set, schema_dict, template[0], template[1], rng, multiplier, np_rng
         )
-        record_list.append(current_record)
+
+
+def generate_atlas_id_set(atlas_id, scale_params, rng=random):
+    """Generate the ID Set of a Single Atlas, at the Specified Scale."""
+    from hsim import id_util
+
+    sample_distribution = scale_params.sample_distribution
+    num_participants = scale_params.num_participants
+    if sample_distribution.is_fixed():
+        num_sample_list = [sample_distribution.get_max()] * num_participants
+    else:
+        num_sample_list = [
+            sample_distribution.draw(rng) for x in range(num_participants)
+        ]
+    return id_util.generate_scaled_id_set(
+        atlas_id, num_sample_list, scale_params.max_lineage_depth
+    )
+
+
+def get_dummy_clinical_data(
+    id_set,
+    schema_dict,
+    template_id,
+    template_type,
+    rng=random,
+    multiplier=1,
+    np_rng=None,
+):
+    from hsim import schema_util
+
+    template_plan = schema_util.get_template_plan(schema_dict, template_id)
+    participant_id_list = id_set.get_participant_ids()
+    if np_rng is not None:
+        record_list = schema_util.generate_plan_records(
+            template_plan, repeat_ids(participant_id_list, multiplier), None, np_rng
+        )
+    else:
+        record_list = []
+        for participant_id in participant_id_list:
+            for x in range(multiplier):
+                current_record = schema_util.generate_plan_record(
+                    template_plan, participant_id, rng=rng
+                )
+                record_list.append(current_record)
     data = {}
     data["data_schema"] = template_id
     data["data_link"] = "https://www.synapse.org/#!Synapse:synXXXX/tables/YYYYY"
@@ -166,15 +1193,28 @@ def get_dummy_clinical_data(id_set, schema_dict, template_id, template_type):
     return data
 
 
-def get_dummy_biospecimen_data(id_set, schema_dict, template_id, template_type):
-    sample_id_list = id_util.extract_sample_id_list(id_set)
-    record_list = []
-    for sample_id in sample_id_list:
-        parent_id = id_util.extract_parent_id(id_set, sample_id)
-        current_record = schema_util.get_front_end_simulated_values(
-            schema_dict, template_id, sample_id, parent_id
+def get_dummy_biospecimen_data(
+    id_set, schema_dict, template_id, template_type, rng=random, np_rng=None
+):
+    from hsim import schema_util
+
+    template_plan = schema_util.get_template_plan(schema_dict, template_id)
+    if np_rng is not None:
+        sample_id_list = []
+        parent_id_list = []
+        for sample_id, parent_id in id_set.iter_samples():
+            sample_id_list.append(sample_id)
+            parent_id_list.append(parent_id)
+        record_list = schema_util.generate_plan_records(
+            template_plan, sample_id_list, parent_id_list, np_rng
         )
-        record_list.append(current_record)
+    else:
+        record_list = []
+        for sample_id, parent_id in id_set.iter_samples():
+            current_record = schema_util.generate_plan_record(
+                template_plan, sample_id, parent_id, rng
+            )
+            record_list.append(current_record)
     data = {}
     data["data_schema"] = template_id
     data["data_link"] = "https://www.synapse.org/#!Synapse:synXXXX/tables/YYYYY"
@@ -182,16 +1222,40 @@ def get_dummy_biospecimen_data(id_set, schema_dict, template_id, template_type):
     return data
 
 
-def get_dummy_assay_files(id_set, schema_dict, template_id, template_type):
-    sample_id_list = id_util.extract_sample_id_list(id_set)
-    record_list = []
-    for sample_id in sample_id_list:
-        current_record = schema_util.get_front_end_simulated_values(
-            schema_dict, template_id, sample_id
+def get_dummy_assay_files(
+    id_set,
+    schema_dict,
+    template_id,
+    template_type,
+    rng=random,
+    multiplier=1,
+    np_rng=None,
+):
+    from hsim import schema_util
+
+    template_plan = schema_util.get_template_plan(schema_dict, template_id)
+    sample_id_list = id_set.get_sample_ids()
+    if np_rng is not None:
+        record_list = schema_util.generate_plan_records(
+            template_plan, repeat_ids(sample_id_list, multiplier), None, np_rng
         )
-        record_list.append(current_record)
+    else:
+        record_list = []
+        for sample_id in sample_id_list:
+            for x in range(multiplier):
+                current_record = schema_util.generate_plan_record(
+                    template_plan, sample_id, rng=rng
+                )
+                record_list.append(current_record)
     data = {}
     data["data_schema"] = template_id
     data["data_link"] = "https://www.synapse.org/#!Synapse:synXXXX/tables/YYYYY"
     data["record_list"] = record_list
     return data
+
+
+def repeat_ids(id_list, multiplier):
+    """Repeat Each ID multiplier Times, Keeping the Order."""
+    if multiplier == 1:
+        return list(id_list)
+    return [id for id in id_list for x in range(multiplier)]
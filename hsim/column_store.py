@@ -0,0 +1,433 @@
+"""
+Compact, Column-Oriented Storage of Simulated Atlases.
+
+A data set of nested atlases holds each record as a list of boxed values,
+and, once parsed, each string as an object of its own, although categorical
+columns repeat the same few display names over and over.  A CompactDataSet
+holds the same atlases, one column store per template of each atlas:
+
+    * columns of integers are held in typed arrays, of the smallest type
+      that fits their values;
+    * columns of strings are held as arrays of small integer codes, into a
+      string pool shared by all columns of the data set, so that each
+      distinct string is held once;
+    * columns of mostly distinct strings of the form prefix + number, such
+      as lorem ipsum values and participant IDs, are held as the prefix and
+      a typed array of the numbers, since interning them saves nothing;
+    * any other column, e.g. of floats, or of mixed types, is held as is.
+
+Records and atlases are only materialized on access, or when written, and
+are then identical to those they were built from;  strings materialized from
+the pool are shared, rather than copied.  The typed arrays are those of the
+standard library array module, so NumPy is not required.
+"""
+from array import array
+from collections import namedtuple
+from itertools import repeat
+import sys
+
+# Kinds of Columns
+INT = "int"
+CODE = "code"
+PREFIXED = "prefixed"
+OBJECT = "object"
+
+# Typecodes of Integer Columns, and of Code Columns, Smallest First
+_INT_TYPECODE_LIST = ["b", "h", "i", "q"]
+_CODE_TYPECODE_LIST = ["B", "H", "I", "Q"]
+
+_DIGITS = "0123456789"
+_INT_TYPE_SET = {int}
+_STRING_TYPE_SET = {str, type(None)}
+
+
+class StringPool:
+    """
+    Interned Strings, Shared by all Code Columns of a Data Set.
+    Code 0 stands for None, i.e. JSON null.
+    """
+
+    def __init__(self):
+        self.value_list = [None]
+        self.code_dict = {None: 0}
+
+    def get_code(self, value):
+        """Get the Code of a String, Adding it to the Pool on First Use."""
+        code = self.code_dict.get(value)
+        if code is None:
+            code = len(self.value_list)
+            self.code_dict[value] = code
+            self.value_list.append(value)
+        return code
+
+    def get_code_list(self, value_list):
+        """Get the Codes of a List of Strings, Adding New Strings to the Pool."""
+        code_list = list(map(self.code_dict.get, value_list))
+        if None in code_list:
+            code_list = [self.get_code(value) for value in value_list]
+        return code_list
+
+    def get_value(self, code):
+        """Get the String of a Code."""
+        return self.value_list[code]
+
+    def get_num_values(self):
+        """Get the Number of Distinct Strings, and None."""
+        return len(self.value_list)
+
+    def get_num_bytes(self):
+        """Estimate the Memory Held by the Pool, in Bytes."""
+        num_bytes = sys.getsizeof(self.value_list) + sys.getsizeof(self.code_dict)
+        for value in self.value_list:
+            num_bytes += sys.getsizeof(value)
+        return num_bytes
+
+
+class ColumnTable:
+    """
+    The Records of a Single Template, Stored Column by Column.
+    Records of differing lengths are not split into columns, but held as is.
+    """
+
+    def __init__(self, record_list, pool):
+        self.pool = pool
+        self.num_records = len(record_list)
+        self.kind_list = []
+        self.column_list = []
+        self.record_list = None
+        if self.num_records == 0:
+            return
+        if len(set(map(len, record_list))) > 1:
+            self.record_list = record_list
+            return
+        for value_list in zip(*record_list):
+            kind, column = compact_column(value_list, pool)
+            self.kind_list.append(kind)
+            self.column_list.append(column)
+
+    def __len__(self):
+        return self.num_records
+
+    def get_num_columns(self):
+        """Get the Number of Columns."""
+        if self.record_list is not None:
+            return None
+        return len(self.column_list)
+
+    def get_kind(self, position):
+        """Get the Kind of a Column:  INT, CODE, PREFIXED or OBJECT."""
+        return self.kind_list[position]
+
+    def get_value(self, record_position, column_position):
+        """Get a Single Value."""
+        if self.record_list is not None:
+            return self.record_list[record_position][column_position]
+        kind = self.kind_list[column_position]
+        column = self.column_list[column_position]
+        if kind == CODE:
+            return self.pool.value_list[column[record_position]]
+        if kind == PREFIXED:
+            return column.get_value(record_position)
+        return column[record_position]
+
+    def get_record(self, position):
+        """Materialize a Single Record."""
+        if self.record_list is not None:
+            return list(self.record_list[position])
+        return [
+            self.get_value(position, column_position)
+            for column_position in range(len(self.column_list))
+        ]
+
+    def get_column(self, position):
+        """Materialize all Values of a Single Column."""
+        if self.record_list is not None:
+            return [record[position] for record in self.record_list]
+        kind = self.kind_list[position]
+        column = self.column_list[position]
+        if kind == CODE:
+            value_list = self.pool.value_list
+            return [value_list[code] for code in column]
+        if kind == PREFIXED:
+            return column.get_value_list()
+        return list(column)
+
+    def get_codes(self, position):
+        """
+        Get the Codes of a Code Column, into the Shared Pool, without
+        Materializing its Strings.
+        """
+        if self.record_list is not None or self.kind_list[position] != CODE:
+            raise ValueError("Column %d is not a code column." % position)
+        return self.column_list[position]
+
+    def to_record_list(self):
+        """Materialize all Records."""
+        if self.record_list is not None:
+            return [list(record) for record in self.record_list]
+        if len(self.column_list) == 0:
+            return [[] for i in range(self.num_records)]
+        column_list = [
+            self.get_column(position) for position in range(len(self.column_list))
+        ]
+        return list(map(list, zip(*column_list)))
+
+    def get_num_bytes(self):
+        """Estimate the Memory Held by the Table, Excluding the Shared Pool."""
+        if self.record_list is not None:
+            return get_record_list_bytes(self.record_list)
+        num_bytes = sys.getsizeof(self.column_list)
+        for kind, column in zip(self.kind_list, self.column_list):
+            num_bytes += sys.getsizeof(column)
+            if kind == PREFIXED:
+                num_bytes += sys.getsizeof(column.prefix)
+                num_bytes += sys.getsizeof(column.number_array)
+            elif kind == OBJECT:
+                num_bytes += sum(sys.getsizeof(value) for value in column)
+        return num_bytes
+
+
+class PrefixedColumn(namedtuple("PrefixedColumn", ["prefix", "number_array"])):
+    """
+    A Column of Strings of the Form prefix + number, Held as the Prefix, and
+    the Numbers;  -1 stands for None.
+    """
+
+    __slots__ = ()
+
+    def get_value(self, position):
+        """Materialize a Single Value."""
+        number = self.number_array[position]
+        if number < 0:
+            return None
+        return "%s%d" % (self.prefix, number)
+
+    def get_value_list(self):
+        """Materialize all Values."""
+        prefix = self.prefix
+        return [
+            None if number < 0 else "%s%d" % (prefix, number)
+            for number in self.number_array
+        ]
+
+
+class CompactAtlas:
+    """
+    A Single Atlas, with a Column Table in Place of Each Record List.
+    """
+
+    def __init__(self, atlas, pool):
+        self.htan_id = atlas.get("htan_id")
+        self.member_list = []
+        self.table_dict = {}
+        for key, member in atlas.items():
+            if isinstance(member, dict) and isinstance(member.get("record_list"), list):
+                table = ColumnTable(member["record_list"], pool)
+                self.table_dict[key] = table
+                template_member_list = []
+                for template_key, value in member.items():
+                    if template_key == "record_list":
+                        value = table
+                    template_member_list.append((template_key, value))
+                member = template_member_list
+            self.member_list.append((key, member))
+
+    def get_template_labels(self):
+        """Get the Labels of all Templates."""
+        return list(self.table_dict)
+
+    def get_table(self, label):
+        """Get the Column Table of a Single Template."""
+        table = self.table_dict.get(label)
+        if table is None:
+            raise KeyError("Atlas %s has no template %s." % (self.htan_id, label))
+        return table
+
+    def to_dict(self):
+        """Materialize the Atlas, as it was Built."""
+        atlas = {}
+        for key, member in self.member_list:
+            if key in self.table_dict:
+                template_data = {}
+                for template_key, value in member:
+                    if isinstance(value, ColumnTable):
+                        value = value.to_record_list()
+                    template_data[template_key] = value
+                member = template_data
+            atlas[key] = member
+        return atlas
+
+    def get_num_bytes(self):
+        """Estimate the Memory Held by the Atlas, Excluding the Shared Pool."""
+        num_bytes = sys.getsizeof(self.member_list)
+        for table in self.table_dict.values():
+            num_bytes += table.get_num_bytes()
+        return num_bytes
+
+
+class CompactDataSet:
+    """
+    Atlases, and their Schemas, in Compact Form, Sharing a Single String Pool.
+    Atlases are looked up by HTAN ID, or by position.
+    """
+
+    def __init__(self, pool=None):
+        if pool is None:
+            pool = StringPool()
+        self.pool = pool
+        self.atlas_list = []
+        self.position_dict = {}
+        self.schemas = None
+
+    def add_atlas(self, atlas):
+        """Add a Single Atlas, Built from its Dictionary."""
+        compact_atlas = CompactAtlas(atlas, self.pool)
+        self.position_dict.setdefault(compact_atlas.htan_id, len(self.atlas_list))
+        self.atlas_list.append(compact_atlas)
+        return compact_atlas
+
+    def set_schemas(self, schema_list):
+        """Set the Root Schemas Node."""
+        self.schemas = schema_list
+
+    def get_schemas(self):
+        """Get the Root Schemas Node, or None."""
+        return self.schemas
+
+    def get_num_atlases(self):
+        """Get the Number of Atlases."""
+        return len(self.atlas_list)
+
+    def get_atlas_ids(self):
+        """Get the HTAN IDs of all Atlases, in Order."""
+        return [compact_atlas.htan_id for compact_atlas in self.atlas_list]
+
+    def get_compact_atlas(self, atlas):
+        """Get a Single Compact Atlas, by HTAN ID or Position."""
+        if isinstance(atlas, int):
+            return self.atlas_list[atlas]
+        position = self.position_dict.get(atlas)
+        if position is None:
+            raise KeyError("No atlas with ID %s." % atlas)
+        return self.atlas_list[position]
+
+    def get_atlas(self, atlas):
+        """Materialize a Single Atlas, by HTAN ID or Position."""
+        return self.get_compact_atlas(atlas).to_dict()
+
+    def get_table(self, atlas, label):
+        """Get the Column Table of a Single Template of an Atlas."""
+        return self.get_compact_atlas(atlas).get_table(label)
+
+    def iter_atlases(self):
+        """Materialize the Atlases, One at a Time, in Order."""
+        for compact_atlas in self.atlas_list:
+            yield compact_atlas.to_dict()
+
+    def write(self, writer):
+        """
+        Write all Atlases, and the Schemas, to an HtanJsonWriter, or a
+        ShardedJsonWriter, Materializing One Atlas at a Time.
+        """
+        for atlas in self.iter_atlases():
+            writer.write_atlas(atlas)
+        if self.schemas is not None:
+            writer.write_schemas(self.schemas)
+        else:
+            writer.close()
+
+    def get_num_bytes(self):
+        """Estimate the Memory Held by the Atlases, and by the String Pool."""
+        num_bytes = self.pool.get_num_bytes()
+        for compact_atlas in self.atlas_list:
+            num_bytes += compact_atlas.get_num_bytes()
+        return num_bytes
+
+
+def compact_column(value_list, pool):
+    """
+    Get the Kind, and the Compact Storage, of a Single Column of Values.
+    """
+    type_set = set(map(type, value_list))
+    if type_set == _INT_TYPE_SET:
+        typecode = get_int_typecode(min(value_list), max(value_list))
+        if typecode is not None:
+            return INT, array(typecode, value_list)
+    elif type_set <= _STRING_TYPE_SET:
+        if len(set(value_list)) * 2 > len(value_list):
+            column = get_prefixed_column(value_list)
+            if column is not None:
+                return PREFIXED, column
+        code_list = pool.get_code_list(value_list)
+        typecode = get_code_typecode(max(code_list))
+        return CODE, array(typecode, code_list)
+    return OBJECT, tuple(value_list)
+
+
+def get_prefixed_column(value_list):
+    """
+    Get the Prefixed Column of Strings, if all Share a Prefix Followed by
+    a Number, Written without Leading Zeros;  otherwise, None.
+    """
+    has_none = None in value_list
+    if has_none:
+        present_list = [value for value in value_list if value is not None]
+        if len(present_list) == 0:
+            return None
+    else:
+        present_list = value_list
+    prefix = present_list[0].rstrip(_DIGITS)
+    if not all(map(str.startswith, present_list, repeat(prefix))):
+        return None
+    start = len(prefix)
+    number_txt_list = [value[start:] for value in present_list]
+    try:
+        number_list = list(map(int, number_txt_list))
+    except ValueError:
+        return None
+    # Only numbers that are written back as they were, e.g. without signs,
+    # spaces or leading zeros
+    if min(number_list) < 0 or list(map(str, number_list)) != number_txt_list:
+        return None
+    typecode = get_int_typecode(-1 if has_none else 0, max(number_list))
+    if typecode is None:
+        return None
+    if has_none:
+        number_iter = iter(number_list)
+        number_list = [-1 if value is None else next(number_iter) for value in value_list]
+    return PrefixedColumn(prefix, array(typecode, number_list))
+
+
+def get_int_typecode(min_value, max_value):
+    """
+    Get the Smallest Signed Typecode that Holds all Values, or None.
+    """
+    for typecode in _INT_TYPECODE_LIST:
+        bits = array(typecode).itemsize * 8
+        if -(1 << (bits - 1)) <= min_value and max_value < (1 << (bits - 1)):
+            return typecode
+    return None
+
+
+def get_code_typecode(max_code):
+    """Get the Smallest Unsigned Typecode that Holds all Codes."""
+    for typecode in _CODE_TYPECODE_LIST:
+        if max_code < (1 << (array(typecode).itemsize * 8)):
+            return typecode
+    raise ValueError("Too many distinct strings:  %d." % max_code)
+
+
+def get_record_list_bytes(record_list):
+    """
+    Estimate the Memory Held by a Record List, Counting Each Distinct
+    Value Object Once.
+    """
+    num_bytes = sys.getsizeof(record_list)
+    id_set = set()
+    for record in record_list:
+        num_bytes += sys.getsizeof(record)
+        for value in record:
+            if id(value) not in id_set:
+                id_set.add(id(value))
+                num_bytes += sys.getsizeof(value)
+    return num_bytes
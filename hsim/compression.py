@@ -0,0 +1,200 @@
+"""
+Compressed Output and Transparent Decompression of Input.
+
+Output is compressed in blocks by a pool of background threads.  zlib, lzma
+and bz2 release the GIL while compressing, so compressing earlier blocks
+overlaps with generating the records of later ones.  Each block is compressed
+into a stream of its own;  gzip, xz and bz2 all allow concatenated streams,
+and decompress them as a single file.  Block boundaries only depend on the
+data written, and gzip streams have no timestamp, so seeded output is
+byte-identical from run to run.
+
+Input is decompressed transparently;  the compression is detected from the
+first bytes of each file, no matter what its extension is.
+"""
+from collections import deque
+from pathlib import Path
+import bz2
+import gzip
+import lzma
+import os
+import zlib
+from hsim import constants
+
+GZIP = constants.GZIP
+XZ = constants.XZ
+BZ2 = constants.BZ2
+NONE = constants.NO_COMPRESSION
+COMPRESSION_LIST = constants.COMPRESSION_LIST
+
+EXTENSION_DICT = {".gz": GZIP, ".xz": XZ, ".bz2": BZ2}
+MAGIC_LIST = [(b"\x1f\x8b", GZIP), (b"\xfd7zXZ\x00", XZ), (b"BZh", BZ2)]
+
+# Uncompressed bytes per block, and the largest number of compression threads
+BLOCK_SIZE = 1 << 20
+MAX_THREADS = 4
+
+
+class CompressedOutput:
+    """
+    Binary Output, Compressed in Blocks by a Pool of Background Threads.
+
+    Writes are gathered into blocks, and full blocks are handed to the pool.
+    Compressed blocks are written in order;  at most two blocks per thread
+    are in flight, so memory stays bounded.  Errors raised while compressing
+    or writing a block are raised on a later write, or on close.
+    """
+
+    def __init__(
+        self,
+        fd,
+        compression,
+        block_size=BLOCK_SIZE,
+        num_threads=None,
+        close_fd=False,
+    ):
+        # Imported here, as concurrent.futures is slow to import
+        from concurrent.futures import ThreadPoolExecutor
+
+        get_compressor(compression)
+        if num_threads is None:
+            num_threads = min(MAX_THREADS, os.cpu_count() or 1)
+        self.fd = fd
+        self.compression = compression
+        self.block_size = block_size
+        self.close_fd = close_fd
+        self.block_list = []
+        self.block_bytes = 0
+        self.num_bytes = 0
+        self.num_blocks = 0
+        self.max_pending = 2 * num_threads
+        self.pending = deque()
+        self.executor = ThreadPoolExecutor(max_workers=num_threads)
+
+    def write(self, data):
+        """Write Uncompressed Data."""
+        self.block_list.append(data)
+        self.block_bytes += len(data)
+        self.num_bytes += len(data)
+        if self.block_bytes >= self.block_size:
+            self.__submit_block()
+        return len(data)
+
+    def close(self):
+        """Compress all Remaining Data, and Write all Compressed Blocks."""
+        if self.executor is None:
+            return
+        try:
+            # An empty output still needs a single, empty stream
+            if self.block_bytes > 0 or self.num_blocks == 0:
+                self.__submit_block()
+            while self.pending:
+                self.fd.write(self.pending.popleft().result())
+        finally:
+            self.executor.shutdown()
+            self.executor = None
+            if self.close_fd:
+                self.fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __submit_block(self):
+        """
+        Hand the Current Block to the Pool.
+        Waits for, and writes, the oldest block if too many are in flight.
+        """
+        if len(self.pending) >= self.max_pending:
+            self.fd.write(self.pending.popleft().result())
+        block = b"".join(self.block_list)
+        future = self.executor.submit(compress_block, self.compression, block)
+        self.pending.append(future)
+        self.block_list = []
+        self.block_bytes = 0
+        self.num_blocks += 1
+
+
+def get_compression(path, compression=None):
+    """
+    Get the Compression of an Output File:  the one requested, if any,
+    or else the one implied by the extension of the file.
+    """
+    if compression is not None:
+        if compression not in COMPRESSION_LIST:
+            raise ValueError("Unknown compression:  %s" % compression)
+        return compression
+    return EXTENSION_DICT.get(Path(path).suffix, NONE)
+
+
+def split_extension(file_name):
+    """Split a File Name into its Base Name, and its Compression Extension, if Any."""
+    suffix = Path(file_name).suffix
+    if suffix in EXTENSION_DICT:
+        return file_name[: -len(suffix)], suffix
+    return file_name, ""
+
+
+def get_compressor(compression):
+    """Get a New Compressor Object."""
+    if compression == GZIP:
+        # With wbits 31, zlib writes a gzip header without a timestamp
+        return zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 31)
+    if compression == XZ:
+        return lzma.LZMACompressor(lzma.FORMAT_XZ)
+    if compression == BZ2:
+        return bz2.BZ2Compressor()
+    raise ValueError("Unknown compression:  %s" % compression)
+
+
+def compress_block(compression, block):
+    """Compress a Block into a Complete Stream of its Own."""
+    compressor = get_compressor(compression)
+    return compressor.compress(block) + compressor.flush()
+
+
+def open_output(path, compression=None):
+    """
+    Open a Binary Output File, Compressed as Requested, or as Implied by
+    its Extension.
+    """
+    compression = get_compression(path, compression)
+    fd = open(path, "wb")
+    if compression == NONE:
+        return fd
+    return CompressedOutput(fd, compression, close_fd=True)
+
+
+def detect_compression(path):
+    """Detect the Compression of an Input File from its First Bytes."""
+    with open(path, "rb") as fd:
+        header = fd.read(6)
+    for magic, compression in MAGIC_LIST:
+        if header.startswith(magic):
+            return compression
+    return NONE
+
+
+def decompress_input(fd, compression):
+    """Wrap a Binary Input, Decompressing it as it is Read."""
+    if compression == GZIP:
+        return gzip.GzipFile(fileobj=fd, mode="rb")
+    if compression == XZ:
+        return lzma.LZMAFile(fd)
+    if compression == BZ2:
+        return bz2.BZ2File(fd)
+    return fd
+
+
+def open_input(path):
+    """Open a Binary Input File, Decompressing it Transparently."""
+    compression = detect_compression(path)
+    if compression == NONE:
+        return open(path, "rb")
+    if compression == GZIP:
+        return gzip.open(path, "rb")
+    if compression == XZ:
+        return lzma.open(path, "rb")
+    return bz2.open(path, "rb")
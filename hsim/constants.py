@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Constants Shared across Modules.
+
+This module imports nothing, so that any module, and the CLI in particular,
+can use it without slowing down start-up.
+
+.. currentmodule:: hsim.constants
+"""
+
+# Template types
+ASSAY_TYPE = "assay"
+CLINICAL_TYPE = "clinical"
+BIOSPECIMEN_TYPE = "biospecimen"
+
+# Default number of atlases cached by 'hsim serve'
+DEFAULT_CACHE_SIZE = 32
+
+# Output formats of 'hsim generate'
+JSON_FORMAT = "json"
+SQLITE_FORMAT = "sqlite"
+OUTPUT_FORMAT_LIST = [JSON_FORMAT, SQLITE_FORMAT]
+
+# Path of the HTAN JSON-LD schema
+SCHEMA_PATH = "schema/HTAN.jsonld"
+
+# Compression types of output files
+GZIP = "gzip"
+XZ = "xz"
+BZ2 = "bz2"
+NO_COMPRESSION = "none"
+COMPRESSION_LIST = [GZIP, XZ, BZ2, NO_COMPRESSION]
+
+# Table formats of 'hsim export-tables' and 'hsim generate --tables'
+NDJSON = "ndjson"
+TSV = "tsv"
+PARQUET = "parquet"
+TABLE_FORMAT_LIST = [TSV, NDJSON, PARQUET]
+
+# Default size limit of the atlas cache of 'hsim generate'
+DEFAULT_CACHE_MAX_BYTES = 1 << 30
@@ -0,0 +1,482 @@
+"""
+Facet Index of Simulated Atlases, for Faceted Filtering and Counting.
+
+Portals filter records by the values of their attributes, and show how many
+records have each value, per template and per atlas.  Rather than scanning
+all record lists for every query, a FacetIndex holds, for each template, an
+inverted index from each attribute value to the rows holding it:
+
+    * rows of a template are numbered across all atlases, in file order;
+      the first row of each atlas is kept, so that rows map back to an atlas
+      and a position within its record list, and so that postings can be
+      restricted to an atlas by binary search;
+    * the postings of a value are the sorted row numbers, in a typed array,
+      so that the number of records with a value is the length of its
+      postings, and is known without scanning;
+    * attributes with more than max_values distinct values across the data
+      set, such as IDs and lorem ipsum values, are not facets, and are
+      dropped once they reach it, which bounds the memory of the index.
+      Attributes mixing booleans and numbers, or holding lists, are dropped
+      too, since their values cannot be told apart as dictionary keys.
+
+Queries filter by several attributes at once, with any of several values per
+attribute, by intersecting postings, smallest first:
+
+    facet_index.get_facet_counts("Demographics", "bts:Gender")
+    facet_index.query("Biospecimen", {"bts:PreservationMethod": ["Frozen", "OCT"]})
+
+The index is written next to the JSON file, e.g. sim.json.facets, as JSON
+with the postings packed as base64, and with the same stamp of the JSON file
+as its sidecar index;  it is only read back if the stamp still matches.
+"""
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import chain
+from pathlib import Path
+import base64
+import sys
+from hsim import json_backend
+from hsim import json_index
+
+FACET_FORMAT = 2
+FACET_EXTENSION = ".facets"
+
+# Distinct values above which an attribute is not a facet
+DEFAULT_MAX_VALUES = 1000
+
+# Types that are equal as dictionary keys, although distinct in JSON
+_NUMBER_TYPE_SET = {bool, int, float}
+_FACET_TYPE_SET = {str, bool, int, float, type(None)}
+
+
+class FacetIndexError(ValueError):
+    """
+    Raised when the Facet Index does not Match its JSON File.
+    """
+
+    pass
+
+
+class RecordRef(namedtuple("RecordRef", ["atlas_id", "position"])):
+    """A Record, by Atlas ID and Position within its Record List."""
+
+    __slots__ = ()
+
+
+class FacetTable:
+    """
+    The Postings of all Facets of a Single Template.
+    """
+
+    def __init__(self, label, attribute_position_dict):
+        self.label = label
+        self.attribute_position_dict = attribute_position_dict
+        self.atlas_offset_list = array("I", [0])
+        self.num_rows = 0
+        self.posting_dict = {}
+        self.type_dict = {}
+        for attribute_id in attribute_position_dict:
+            self.posting_dict[attribute_id] = {}
+            self.type_dict[attribute_id] = set()
+
+    def add_record_list(self, record_list, max_values):
+        """
+        Add the Records of the Next Atlas;  pass None if the atlas has no
+        records of this template.
+        """
+        if record_list:
+            num_values = len(record_list[0])
+            if any(len(record) != num_values for record in record_list):
+                raise ValueError(
+                    "Records of %s have different numbers of values." % self.label
+                )
+            column_list = list(zip(*record_list))
+            for attribute_id, position in self.attribute_position_dict.items():
+                if self.posting_dict[attribute_id] is None:
+                    continue
+                if position >= num_values:
+                    raise ValueError(
+                        "Records of %s have no value for %s."
+                        % (self.label, attribute_id)
+                    )
+                self.__add_column(attribute_id, column_list[position], max_values)
+            self.num_rows += len(record_list)
+        self.atlas_offset_list.append(self.num_rows)
+
+    def get_attribute_ids(self):
+        """Get the IDs of all Faceted Attributes, in Schema Order."""
+        return [
+            attribute_id
+            for attribute_id, value_dict in self.posting_dict.items()
+            if value_dict is not None
+        ]
+
+    def get_value_dict(self, attribute_id):
+        """Get the Postings of Each Value of a Faceted Attribute."""
+        if attribute_id not in self.posting_dict:
+            raise KeyError("%s has no attribute %s." % (self.label, attribute_id))
+        value_dict = self.posting_dict[attribute_id]
+        if value_dict is None:
+            raise ValueError(
+                "%s of %s is not a facet, as it has too many distinct values, "
+                "or values of mixed types." % (attribute_id, self.label)
+            )
+        return value_dict
+
+    def get_row_range(self, atlas_position):
+        """Get the Rows of an Atlas, as [start, end), or of all Atlases."""
+        if atlas_position is None:
+            return 0, self.num_rows
+        return (
+            self.atlas_offset_list[atlas_position],
+            self.atlas_offset_list[atlas_position + 1],
+        )
+
+    def __add_column(self, attribute_id, column, max_values):
+        """
+        Add the Values of a Single Column, Dropping the Attribute once it
+        is No Longer a Facet.
+        """
+        type_set = self.type_dict[attribute_id]
+        type_set.update(set(map(type, column)))
+        if not type_set <= _FACET_TYPE_SET or len(type_set & _NUMBER_TYPE_SET) > 1:
+            self.__drop(attribute_id)
+            return
+        value_dict = self.posting_dict[attribute_id]
+        row_dict = {}
+        for row, value in enumerate(column, self.num_rows):
+            row_list = row_dict.get(value)
+            if row_list is None:
+                row_dict[value] = [row]
+            else:
+                row_list.append(row)
+        for value, row_list in row_dict.items():
+            posting = value_dict.get(value)
+            if posting is None:
+                if len(value_dict) >= max_values:
+                    self.__drop(attribute_id)
+                    return
+                value_dict[value] = array("I", row_list)
+            else:
+                posting.extend(row_list)
+
+    def __drop(self, attribute_id):
+        """Drop an Attribute that is No Longer a Facet."""
+        self.posting_dict[attribute_id] = None
+        self.type_dict[attribute_id] = None
+
+
+class FacetIndex:
+    """
+    Inverted Indexes, and Facet Counts, of the Attribute Values of all
+    Templates of a Data Set.
+
+    Has the add_atlas interface of CompactDataSet, so that it can be built
+    while atlases are generated or read.  Set the schemas before adding
+    atlases.  Atlases are looked up by HTAN ID, or by position;  pass None
+    to query all atlases.
+    """
+
+    def __init__(self, max_values=DEFAULT_MAX_VALUES):
+        self.max_values = max_values
+        self.atlas_id_list = []
+        self.position_dict = {}
+        self.table_dict = None
+
+    def set_schemas(self, schema_list):
+        """
+        Set the Root Schemas Node, which Lists the Attributes of Each
+        Template.  Attributes listed more than once are indexed at their
+        last position, as in AtlasLinkChecker.
+        """
+        self.table_dict = {}
+        for schema in schema_list:
+            attribute_position_dict = {}
+            for position, attribute in enumerate(schema["attributes"]):
+                attribute_position_dict[attribute["id"]] = position
+            label = schema["data_schema"]
+            if label not in self.table_dict:
+                self.table_dict[label] = FacetTable(label, attribute_position_dict)
+
+    def add_atlas(self, atlas):
+        """Add the Records of a Single Atlas to the Postings."""
+        if self.table_dict is None:
+            raise ValueError("Set the schemas before adding atlases.")
+        atlas_id = atlas.get("htan_id")
+        for label, table in self.table_dict.items():
+            member = atlas.get(label)
+            record_list = None
+            if isinstance(member, dict):
+                record_list = member.get("record_list")
+            table.add_record_list(record_list, self.max_values)
+        self.position_dict.setdefault(atlas_id, len(self.atlas_id_list))
+        self.atlas_id_list.append(atlas_id)
+
+    def get_num_atlases(self):
+        """Get the Number of Atlases."""
+        return len(self.atlas_id_list)
+
+    def get_atlas_ids(self):
+        """Get the HTAN IDs of all Atlases, in Order."""
+        return list(self.atlas_id_list)
+
+    def get_template_labels(self):
+        """Get the Labels of all Templates, in Schema Order."""
+        return list(self.table_dict or {})
+
+    def get_attribute_ids(self, label):
+        """Get the IDs of the Faceted Attributes of a Template."""
+        return self.__get_table(label).get_attribute_ids()
+
+    def is_facet(self, label, attribute_id):
+        """Check whether an Attribute of a Template is Faceted."""
+        table = self.__get_table(label)
+        return table.posting_dict.get(attribute_id) is not None
+
+    def get_num_records(self, label, atlas=None):
+        """Get the Number of Records of a Template, in an Atlas, or in all."""
+        start, end = self.__get_table(label).get_row_range(self.__get_position(atlas))
+        return end - start
+
+    def get_facet_counts(self, label, attribute_id, filter_dict=None, atlas=None):
+        """
+        Get the Number of Records with Each Value of an Attribute, in First
+        Seen Order, Leaving out Values without Records.
+
+        Without a filter, the counts of all atlases are the lengths of the
+        postings, and those of a single atlas are found by binary search.
+        With a filter, only records matching it are counted;  to count
+        records as portals do, leave the attribute itself out of the filter.
+        """
+        table = self.__get_table(label)
+        value_dict = table.get_value_dict(attribute_id)
+        start, end = table.get_row_range(self.__get_position(atlas))
+        count_dict = {}
+        if filter_dict:
+            row_set = set(self.__get_rows(table, filter_dict, start, end))
+            for value, posting in value_dict.items():
+                lo = bisect_left(posting, start)
+                hi = bisect_left(posting, end, lo)
+                count = 0
+                if hi > lo:
+                    count = len(row_set.intersection(posting[lo:hi]))
+                if count > 0:
+                    count_dict[value] = count
+        elif start == 0 and end == table.num_rows:
+            for value, posting in value_dict.items():
+                count_dict[value] = len(posting)
+        else:
+            for value, posting in value_dict.items():
+                lo = bisect_left(posting, start)
+                count = bisect_left(posting, end, lo) - lo
+                if count > 0:
+                    count_dict[value] = count
+        return count_dict
+
+    def get_atlas_facet_counts(self, label, attribute_id):
+        """
+        Get the Facet Counts of an Attribute, per Atlas ID, for all Atlases.
+        """
+        return {
+            atlas_id: self.get_facet_counts(label, attribute_id, atlas=position)
+            for position, atlas_id in enumerate(self.atlas_id_list)
+        }
+
+    def query(self, label, filter_dict, atlas=None):
+        """
+        Find the Records of a Template Matching all Attributes of the
+        Filter;  each attribute maps to a value, or to a list of values, any
+        of which match.  Returns a RecordRef per record, in file order.
+        """
+        table = self.__get_table(label)
+        start, end = table.get_row_range(self.__get_position(atlas))
+        return [
+            self.__get_record_ref(table, row)
+            for row in self.__get_rows(table, filter_dict, start, end)
+        ]
+
+    def count(self, label, filter_dict, atlas=None):
+        """Count the Records of a Template Matching all Attributes of the Filter."""
+        table = self.__get_table(label)
+        start, end = table.get_row_range(self.__get_position(atlas))
+        return len(self.__get_rows(table, filter_dict, start, end))
+
+    def write(self, json_file_name, facet_file_name=None):
+        """
+        Write the Index Next to its JSON File, with the Stamp of the File.
+        """
+        if facet_file_name is None:
+            facet_file_name = get_facet_path(json_file_name)
+        template_list = []
+        for table in self.table_dict.values():
+            attribute_list = []
+            for attribute_id, value_dict in table.posting_dict.items():
+                if value_dict is None:
+                    continue
+                attribute = {}
+                attribute["id"] = attribute_id
+                attribute["values"] = list(value_dict)
+                attribute["postings"] = [
+                    encode_array(posting) for posting in value_dict.values()
+                ]
+                attribute_list.append(attribute)
+            template = {}
+            template["label"] = table.label
+            template["attribute_positions"] = table.attribute_position_dict
+            template["atlas_offsets"] = encode_array(table.atlas_offset_list)
+            template["attributes"] = attribute_list
+            template_list.append(template)
+
+        doc = {}
+        doc["facet_format"] = FACET_FORMAT
+        doc["data_file"] = Path(json_file_name).name
+        doc.update(json_index.get_data_stamp(json_file_name))
+        doc["max_values"] = self.max_values
+        doc["atlas_ids"] = self.atlas_id_list
+        doc["templates"] = template_list
+        with open(facet_file_name, "w") as out:
+            out.write(json_backend.dumps(doc))
+
+    def __get_table(self, label):
+        """Get the Facet Table of a Template."""
+        if self.table_dict is None or label not in self.table_dict:
+            raise KeyError("No template with label %s." % label)
+        return self.table_dict[label]
+
+    def __get_position(self, atlas):
+        """Get the Position of an Atlas, by HTAN ID or Position, or None."""
+        if atlas is None or isinstance(atlas, int):
+            return atlas
+        position = self.position_dict.get(atlas)
+        if position is None:
+            raise KeyError("No atlas with ID %s." % atlas)
+        return position
+
+    def __get_rows(self, table, filter_dict, start, end):
+        """
+        Get the Sorted Rows, within [start, end), Matching the Filter.
+        """
+        posting_list = []
+        for attribute_id, value in filter_dict.items():
+            value_dict = table.get_value_dict(attribute_id)
+            if isinstance(value, (list, tuple, set, frozenset)):
+                posting_list.append(
+                    sorted(
+                        chain.from_iterable(
+                            get_posting_range(value_dict.get(item), start, end)
+                            for item in value
+                        )
+                    )
+                )
+            else:
+                posting_list.append(
+                    get_posting_range(value_dict.get(value), start, end)
+                )
+        if len(posting_list) == 0:
+            return list(range(start, end))
+        return intersect_postings(posting_list)
+
+    def __get_record_ref(self, table, row):
+        """Get the Atlas ID, and Position within the Atlas, of a Row."""
+        atlas_position = bisect_right(table.atlas_offset_list, row) - 1
+        return RecordRef(
+            self.atlas_id_list[atlas_position],
+            row - table.atlas_offset_list[atlas_position],
+        )
+
+
+def read_facet_index(json_file_name, facet_file_name=None):
+    """
+    Read the Facet Index Written Next to a JSON File.
+    Raises FacetIndexError if the index is stale, or of another format.
+    """
+    if facet_file_name is None:
+        facet_file_name = get_facet_path(json_file_name)
+    with open(facet_file_name, "rb") as fd:
+        doc = json_backend.load(fd)
+    if doc.get("facet_format") != FACET_FORMAT:
+        raise FacetIndexError("Unsupported facet index format in %s." % facet_file_name)
+    try:
+        json_index.check_data_stamp(json_file_name, doc)
+    except json_index.JsonIndexError as error:
+        raise FacetIndexError(str(error)) from None
+
+    facet_index = FacetIndex(doc["max_values"])
+    facet_index.table_dict = {}
+    for template in doc["templates"]:
+        table = FacetTable(template["label"], template["attribute_positions"])
+        table.atlas_offset_list = decode_array(template["atlas_offsets"])
+        table.num_rows = table.atlas_offset_list[-1]
+        for attribute_id in table.posting_dict:
+            table.posting_dict[attribute_id] = None
+            table.type_dict[attribute_id] = None
+        for attribute in template["attributes"]:
+            value_dict = {}
+            for value, posting in zip(attribute["values"], attribute["postings"]):
+                value_dict[value] = decode_array(posting)
+            table.posting_dict[attribute["id"]] = value_dict
+            table.type_dict[attribute["id"]] = set(map(type, value_dict))
+        facet_index.table_dict[table.label] = table
+    for atlas_id in doc["atlas_ids"]:
+        facet_index.position_dict.setdefault(atlas_id, len(facet_index.atlas_id_list))
+        facet_index.atlas_id_list.append(atlas_id)
+    return facet_index
+
+
+def get_facet_path(json_file_name):
+    """Get the Path of the Facet Index of a JSON File."""
+    return str(json_file_name) + FACET_EXTENSION
+
+
+def get_posting_range(posting, start, end):
+    """Get the Rows of a Posting within [start, end);  None has no rows."""
+    if posting is None:
+        return array("I")
+    if start == 0 and (len(posting) == 0 or posting[-1] < end):
+        return posting
+    lo = bisect_left(posting, start)
+    return posting[lo:bisect_left(posting, end, lo)]
+
+
+def intersect_postings(posting_list):
+    """
+    Intersect Sorted Postings, Smallest First.
+    Rows of the smaller side are looked up by binary search in much larger
+    postings, and in a set otherwise.
+    """
+    posting_list = sorted(posting_list, key=len)
+    row_list = list(posting_list[0])
+    for posting in posting_list[1:]:
+        if len(row_list) == 0:
+            break
+        if len(row_list) * 16 < len(posting):
+            row_list = [row for row in row_list if _contains(posting, row)]
+        else:
+            row_set = set(posting)
+            row_list = [row for row in row_list if row in row_set]
+    return row_list
+
+
+def encode_array(row_array):
+    """Encode a Typed Array as Base64, in Little-Endian Byte Order."""
+    if sys.byteorder == "big":
+        row_array = array(row_array.typecode, row_array)
+        row_array.byteswap()
+    return base64.b64encode(row_array.tobytes()).decode("ascii")
+
+
+def decode_array(data):
+    """Decode a Typed Array of Row Numbers, Encoded by encode_array."""
+    row_array = array("I")
+    row_array.frombytes(base64.b64decode(data))
+    if sys.byteorder == "big":
+        row_array.byteswap()
+    return row_array
+
+
+def _contains(posting, row):
+    """Check whether a Sorted Posting Holds a Row, by Binary Search."""
+    position = bisect_left(posting, row)
+    return position < len(posting) and posting[position] == row
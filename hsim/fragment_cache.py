@@ -0,0 +1,174 @@
+"""
+On-Disk, Content-Addressed Cache of Serialized Atlases.
+
+Each entry holds a single atlas, serialized as HtanJsonWriter writes it within
+the atlases array, so that a cached atlas is spliced into the output with a
+single copy, without being generated or serialized again.
+
+Entries are keyed by the SHA-256 hash of everything the serialized atlas
+depends on:  the schema content, the compiled template plans, the atlas ID
+and name, the seed, the scale parameters, vectorize, the indent, and the hsim
+version.  Entries are stored as:
+
+    cache_dir/3f/3f9ac1...e2.atlas
+
+Each entry file starts with a single line of JSON, holding the atlas ID and
+its index entry, followed by the serialized atlas.  Entries are written to a
+temporary file first, and then renamed, so that concurrent runs never see
+partial entries.
+
+The cache is bounded in size;  on close, least recently used entries are
+evicted until the cache fits.  Reading an entry marks it as used.
+"""
+from pathlib import Path
+import hashlib
+import json
+import os
+from hsim import constants
+from hsim import json_writer
+from hsim import schema_util
+from hsim.version import __version__
+
+CACHE_FORMAT = 1
+ENTRY_EXTENSION = ".atlas"
+DEFAULT_MAX_BYTES = constants.DEFAULT_CACHE_MAX_BYTES
+
+
+class FragmentCache:
+    """
+    Size-Bounded, On-Disk Cache of Atlas Fragments.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+
+    def contains(self, key):
+        """Check whether the Cache holds an Entry, without Reading it."""
+        return self.__get_path(key).exists()
+
+    def get(self, key):
+        """Get the Cached Fragment, or None."""
+        path = self.__get_path(key)
+        try:
+            fragment = self.__read_entry(path)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            # A corrupt entry is a miss, and is replaced by the next put
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.num_hits += 1
+        return fragment
+
+    def put(self, key, fragment):
+        """
+        Store a Fragment, after a Miss.
+        Entries are only evicted on close, so that entries found at the start
+        of a run are still there when they are read.
+        """
+        self.num_misses += 1
+        header = {}
+        header["cache_format"] = CACHE_FORMAT
+        header["htan_id"] = fragment.htan_id
+        header["index_entry"] = fragment.index_entry
+        path = self.__get_path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name("%s.%d.tmp" % (path.name, os.getpid()))
+        with open(tmp_path, "wb") as out:
+            out.write(json.dumps(header, separators=(",", ":")).encode("utf-8"))
+            out.write(b"\n")
+            out.write(fragment.data)
+        tmp_path.replace(path)
+
+    def close(self):
+        """Evict Least Recently Used Entries, until the Cache Fits."""
+        entry_list = []
+        total_bytes = 0
+        for path in self.cache_dir.glob("*/*" + ENTRY_EXTENSION):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entry_list.append((stat.st_mtime, path, stat.st_size))
+            total_bytes += stat.st_size
+        entry_list.sort()
+        for mtime, path, size in entry_list:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            self.num_evictions += 1
+
+    def get_stats(self):
+        """Get the Cache Statistics."""
+        stats = {}
+        stats["hits"] = self.num_hits
+        stats["misses"] = self.num_misses
+        stats["evictions"] = self.num_evictions
+        return stats
+
+    def __read_entry(self, path):
+        """
+        Read an Entry, Raising ValueError, KeyError, IndexError, TypeError or
+        AttributeError if it is Corrupt.
+        """
+        with open(path, "rb") as fd:
+            header = json.loads(fd.readline())
+            data = fd.read()
+        if header.get("cache_format") != CACHE_FORMAT:
+            raise ValueError("Unknown cache format:  %s" % path)
+        fragment = json_writer.AtlasFragment(
+            header["htan_id"], data, header["index_entry"]
+        )
+        if fragment.index_entry[2] != len(data):
+            raise ValueError("Truncated cache entry:  %s" % path)
+        fragment.get_num_records()
+        return fragment
+
+    def __get_path(self, key):
+        """Get the Path of an Entry."""
+        return self.cache_dir / key[:2] / (key + ENTRY_EXTENSION)
+
+
+def get_key_prefix(
+    schema_dict, template_list, seed, scale_params=None, vectorize=False, indent=4
+):
+    """
+    Hash Everything the Atlases of a Run Depend on, Except their IDs.
+    """
+    key = {}
+    key["cache_format"] = CACHE_FORMAT
+    key["version"] = __version__
+    key["schema"] = schema_util.get_schema_hash(schema_dict)
+    key["templates"] = template_list
+    key["plans"] = [
+        schema_util.get_template_plan(schema_dict, template[0])
+        for template in template_list
+    ]
+    key["seed"] = seed
+    key["scale"] = scale_params.to_dict() if scale_params is not None else None
+    key["vectorize"] = vectorize
+    key["indent"] = indent
+    txt = json.dumps(key, sort_keys=True)
+    return hashlib.sha256(txt.encode("utf-8")).hexdigest()
+
+
+def get_atlas_key(key_prefix, target_atlas):
+    """Get the Key of a Single Atlas, from the Key Prefix of its Run."""
+    txt = json.dumps([key_prefix, target_atlas[0], target_atlas[1]])
+    return hashlib.sha256(txt.encode("utf-8")).hexdigest()
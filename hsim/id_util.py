@@ -1,8 +1,180 @@
 """
 Utility Functions for Generating and Managing HTAN Identifiers.
 """
+from array import array
+
 PARTICIPANT = "PARTICIPANT"
 SAMPLE = "SAMPLE"
+NO_PARENT = "-"
+
+
+class IdTable:
+    """
+    Columnar Table of the Participant and Sample IDs of a Single Atlas.
+
+    Rows are held in compact parallel arrays of integers;  ID strings are only
+    built when requested.  Each participant row is immediately followed by the
+    rows of its samples, so any ID can be mapped back to its row in O(1).
+    Rows can also be read as [kind, HTAN ID, parent HTAN ID] lists.
+    """
+
+    def __init__(self, htan_id):
+        self.htan_id = htan_id
+        self.prefix = "%s_" % htan_id
+
+        # Per row:  participant number, sample number (-1 for participants),
+        # and row of the parent (-1 for participants)
+        self.participant_number_array = array("l")
+        self.sample_number_array = array("l")
+        self.parent_row_array = array("l")
+
+        # Row of each participant, and rows of all samples
+        self.participant_row_array = array("l")
+        self.sample_row_array = array("l")
+
+    def add_participant(self, sample_parent_list):
+        """
+        Add a Participant and its Samples.
+        sample_parent_list holds, for each sample, the sample number of its
+        parent sample, or -1 if the parent is the participant itself.
+        """
+        participant_number = len(self.participant_row_array)
+        participant_row = len(self.parent_row_array)
+        self.participant_row_array.append(participant_row)
+        self.participant_number_array.append(participant_number)
+        self.sample_number_array.append(-1)
+        self.parent_row_array.append(-1)
+        for sample_number, parent_sample_number in enumerate(sample_parent_list):
+            if parent_sample_number >= sample_number:
+                raise ValueError("Parent samples must precede their children.")
+            self.sample_row_array.append(len(self.parent_row_array))
+            self.participant_number_array.append(participant_number)
+            self.sample_number_array.append(sample_number)
+            self.parent_row_array.append(participant_row + 1 + parent_sample_number)
+
+    def get_num_participants(self):
+        """Get Number of Participants."""
+        return len(self.participant_row_array)
+
+    def get_num_samples(self):
+        """Get Number of Samples."""
+        return len(self.sample_row_array)
+
+    def get_participant_ids(self):
+        """Get Lazy View of all Participant IDs."""
+        return IdView(self, self.participant_row_array)
+
+    def get_sample_ids(self):
+        """Get Lazy View of all Sample IDs."""
+        return IdView(self, self.sample_row_array)
+
+    def iter_samples(self):
+        """Iterate over (Sample ID, Parent ID) Pairs."""
+        for row in self.sample_row_array:
+            yield self.get_id(row), self.get_id(self.parent_row_array[row])
+
+    def get_id(self, row):
+        """Get the HTAN ID of the Specified Row."""
+        participant_number = self.participant_number_array[row]
+        sample_number = self.sample_number_array[row]
+        if sample_number < 0:
+            return "%s%d" % (self.prefix, participant_number)
+        return "%s%d_%d" % (self.prefix, participant_number, sample_number)
+
+    def get_kind(self, row):
+        """Get the Kind, PARTICIPANT or SAMPLE, of the Specified Row."""
+        if self.sample_number_array[row] < 0:
+            return PARTICIPANT
+        return SAMPLE
+
+    def get_parent_row(self, row):
+        """Get the Row of the Parent of the Specified Row, or -1."""
+        return self.parent_row_array[row]
+
+    def find_row(self, target_id):
+        """Find the Row of the Specified HTAN ID, or None."""
+        if not target_id.startswith(self.prefix):
+            return None
+        part_list = target_id[len(self.prefix) :].split("_")
+        if len(part_list) > 2:
+            return None
+        number_list = [parse_id_number(part) for part in part_list]
+        if None in number_list:
+            return None
+        participant_number = number_list[0]
+        if participant_number >= len(self.participant_row_array):
+            return None
+        row = self.participant_row_array[participant_number]
+        if len(part_list) == 1:
+            return row
+        sample_number = number_list[1]
+        if participant_number + 1 < len(self.participant_row_array):
+            next_row = self.participant_row_array[participant_number + 1]
+        else:
+            next_row = len(self.parent_row_array)
+        if row + 1 + sample_number >= next_row:
+            return None
+        return row + 1 + sample_number
+
+    def get_parent_id(self, target_id):
+        """Get the Parent ID of the Specified HTAN ID, or None if Unknown."""
+        row = self.find_row(target_id)
+        if row is None:
+            return None
+        parent_row = self.parent_row_array[row]
+        if parent_row < 0:
+            return NO_PARENT
+        return self.get_id(parent_row)
+
+    def __len__(self):
+        return len(self.parent_row_array)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("IdTable row out of range")
+        parent_row = self.parent_row_array[row]
+        if parent_row < 0:
+            parent_id = NO_PARENT
+        else:
+            parent_id = self.get_id(parent_row)
+        return [self.get_kind(row), self.get_id(row), parent_id]
+
+
+class IdView:
+    """
+    Lazy, Read-Only Sequence of the IDs of Selected IdTable Rows.
+    """
+
+    def __init__(self, id_table, row_array):
+        self.id_table = id_table
+        self.row_array = row_array
+
+    def __len__(self):
+        return len(self.row_array)
+
+    def __getitem__(self, index):
+        return self.id_table.get_id(self.row_array[index])
+
+    def __iter__(self):
+        get_id = self.id_table.get_id
+        for row in self.row_array:
+            yield get_id(row)
+
+
+def parse_id_number(part):
+    """
+    Parse a Number within an HTAN ID, or None.
+    Only numbers as get_id writes them are accepted:  ASCII digits, without
+    leading zeros.
+    """
+    if not part.isascii() or not part.isdigit():
+        return None
+    number = int(part)
+    if str(number) != part:
+        return None
+    return number
 
 
 def generate_htan_participant_ids(htan_id, num_ids):
@@ -23,33 +195,58 @@ def generate_sample_ids(participant_id, num_ids):
 
 def generate_id_set(htan_id, num_participants, num_samples_per_participant):
     """Generate Simulated ID Set."""
-    id_table = []
-    participant_id_list = generate_htan_participant_ids(htan_id, num_participants)
+    id_table = IdTable(htan_id)
 
-    # Table is of the form:
+    # Rows are of the form:
     # 0 - SAMPLE OR PARTICIPANT
     # 1 - HTAN ID
     # 2 - Parent HTAN ID
-    for participant_id in participant_id_list:
-        id_table.append([PARTICIPANT, participant_id, "-"])
-        sample_id_list = generate_sample_ids(
-            participant_id, num_samples_per_participant
-        )
-
-        counter = 0
-        parent_id = participant_id
-        for sample_id in sample_id_list:
-            id_table.append([SAMPLE, sample_id, parent_id])
-            if counter % 2 == 0:
-                parent_id = sample_id
-            else:
-                parent_id = participant_id
+    # Each sample is derived from the one before it, and the first
+    # sample from the participant.
+    sample_parent_list = get_sample_lineage(num_samples_per_participant)
+    for x in range(num_participants):
+        id_table.add_participant(sample_parent_list)
+    return id_table
+
 
+def generate_scaled_id_set(htan_id, num_sample_list, max_lineage_depth=None):
+    """
+    Generate Simulated ID Set with a Variable Number of Samples per Participant.
+    Lineage chains are restarted from the participant whenever they would
+    exceed max_lineage_depth.
+    """
+    id_table = IdTable(htan_id)
+    lineage_dict = {}
+    for num_samples in num_sample_list:
+        sample_parent_list = lineage_dict.get(num_samples)
+        if sample_parent_list is None:
+            sample_parent_list = get_sample_lineage(num_samples, max_lineage_depth)
+            lineage_dict[num_samples] = sample_parent_list
+        id_table.add_participant(sample_parent_list)
     return id_table
 
 
+def get_sample_lineage(num_samples, max_lineage_depth=None):
+    """
+    Get the Parent Sample Number of Each Sample in a Lineage Chain.
+    -1 denotes the participant;  the participant itself is at depth 0.
+    """
+    sample_parent_list = []
+    depth = 0
+    for x in range(num_samples):
+        if x == 0 or (max_lineage_depth is not None and depth >= max_lineage_depth):
+            sample_parent_list.append(-1)
+            depth = 1
+        else:
+            sample_parent_list.append(x - 1)
+            depth += 1
+    return sample_parent_list
+
+
 def extract_participant_id_list(id_table):
     """Extract Participant ID List from ID Set Table."""
+    if isinstance(id_table, IdTable):
+        return list(id_table.get_participant_ids())
     participant_id_list = []
     for row in id_table:
         if row[0] == PARTICIPANT:
@@ -59,6 +256,8 @@ def extract_participant_id_list(id_table):
 
 def extract_sample_id_list(id_table):
     """Extract Sample ID List from ID Set Table."""
+    if isinstance(id_table, IdTable):
+        return list(id_table.get_sample_ids())
     sample_id_list = []
     for row in id_table:
         if row[0] == SAMPLE:
@@ -68,6 +267,8 @@ def extract_sample_id_list(id_table):
 
 def extract_parent_id(id_table, target_id):
     """Extract Parent ID of Target from ID Set Table."""
+    if isinstance(id_table, IdTable):
+        return id_table.get_parent_id(target_id)
     for row in id_table:
         if row[1] == target_id:
             return row[2]
@@ -0,0 +1,174 @@
+"""
+Pluggable JSON Backend, for Serializing and Parsing.
+
+When orjson is installed, it is picked automatically;  otherwise the standard
+library json module is used.  Set the HSIM_JSON_BACKEND environment variable
+to "json" or "orjson" to pick a backend explicitly.
+
+Output is byte-identical across backends, for a given indent:  with an
+indent, it is that of json.dumps(value, indent=indent), and without one, that
+of json.dumps(value, separators=(",", ":")).  orjson only indents by two
+spaces, and writes non-ASCII characters as UTF-8, so its output is re-indented,
+and values it would write differently, such as non-ASCII strings and floats
+in exponent notation, are serialized by the standard library instead.
+NaN and infinite floats are not valid JSON;  json.dumps writes them as NaN
+and Infinity, but orjson writes them as null, so values holding them are
+serialized by the standard library too.
+
+Parsing with orjson falls back to the standard library for documents that
+orjson rejects, so that errors are those of json.loads.
+"""
+import json
+import math
+import os
+
+STDLIB = "json"
+ORJSON = "orjson"
+BACKEND_LIST = [STDLIB, ORJSON]
+BACKEND_ENV = "HSIM_JSON_BACKEND"
+
+# orjson writes floats in exponent notation differently from json.dumps, e.g.
+# 1e16 rather than 1e+16.  Mapping digits and dots to "0" finds them with two
+# searches, for "0e0" and "0e-", which is much faster than a regular expression.
+# Floats in [1e-5, 1e-4) are written by orjson without an exponent, e.g.
+# 0.00001 rather than 1e-05, and are found by searching for "0.0000".
+_DIGIT_TABLE = bytes.maketrans(b"123456789.", b"0000000000")
+
+
+class StdlibBackend:
+    """
+    JSON Backend of the Standard Library.
+    """
+
+    name = STDLIB
+
+    def dumps(self, value, indent=None):
+        """Serialize a Value, Indented, or Compact without an Indent."""
+        if indent is None:
+            return json.dumps(value, separators=(",", ":"))
+        return json.dumps(value, indent=indent)
+
+    def loads(self, data):
+        """Parse a Document from a String, or from Bytes."""
+        return json.loads(data)
+
+    def load(self, fd):
+        """Parse a Document from a File."""
+        return json.load(fd)
+
+
+class OrjsonBackend:
+    """
+    JSON Backend of orjson, with the Output of the Standard Library.
+    """
+
+    name = ORJSON
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError(
+                "The orjson backend requires orjson, which is not installed;  "
+                "run pip install 'hsim[fast-json]'."
+            )
+
+        self.orjson = orjson
+        self.stdlib_backend = StdlibBackend()
+
+    def dumps(self, value, indent=None):
+        """Serialize a Value, Indented, or Compact without an Indent."""
+        orjson = self.orjson
+        try:
+            data = orjson.dumps(value)
+        except orjson.JSONEncodeError:
+            return self.stdlib_backend.dumps(value, indent)
+        # json.dumps escapes non-ASCII characters, and DEL
+        if not data.isascii() or b"\x7f" in data:
+            return self.stdlib_backend.dumps(value, indent)
+        digit_data = data.translate(_DIGIT_TABLE)
+        if b"0e0" in digit_data or b"0e-" in digit_data or b"0.0000" in data:
+            return self.stdlib_backend.dumps(value, indent)
+        # orjson writes NaN and infinite floats as null
+        if b"null" in data and has_nonfinite_float(value):
+            return self.stdlib_backend.dumps(value, indent)
+        if indent is not None:
+            # Re-indenting replaces runs of spaces, so strings must have none
+            if b"  " in data:
+                return self.stdlib_backend.dumps(value, indent)
+            data = orjson.dumps(value, option=orjson.OPT_INDENT_2)
+            if indent != 2:
+                data = data.replace(b"  ", b" " * indent)
+        return data.decode("ascii")
+
+    def loads(self, data):
+        """Parse a Document from a String, or from Bytes."""
+        try:
+            return self.orjson.loads(data)
+        except self.orjson.JSONDecodeError:
+            return json.loads(data)
+
+    def load(self, fd):
+        """Parse a Document from a File."""
+        return self.loads(fd.read())
+
+
+def has_nonfinite_float(value):
+    """Check whether a Value Holds a NaN or Infinite Float, at any Depth."""
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return False
+    return any(has_nonfinite_float(item) for item in value)
+
+
+_backend = None
+
+
+def get_backend():
+    """Get the Current Backend, Picking One on First Use."""
+    global _backend
+    if _backend is None:
+        name = os.environ.get(BACKEND_ENV)
+        if name:
+            set_backend(name)
+        else:
+            try:
+                _backend = OrjsonBackend()
+            except ImportError:
+                _backend = StdlibBackend()
+    return _backend
+
+
+def set_backend(name):
+    """Pick the Backend by Name;  raises ImportError if it is not installed."""
+    global _backend
+    if name == STDLIB:
+        _backend = StdlibBackend()
+    elif name == ORJSON:
+        _backend = OrjsonBackend()
+    else:
+        raise ValueError("Unknown JSON backend:  %s" % name)
+    return _backend
+
+
+def get_backend_name():
+    """Get the Name of the Current Backend."""
+    return get_backend().name
+
+
+def dumps(value, indent=None):
+    """Serialize a Value with the Current Backend."""
+    return get_backend().dumps(value, indent)
+
+
+def loads(data):
+    """Parse a Document with the Current Backend."""
+    return get_backend().loads(data)
+
+
+def load(fd):
+    """Parse a Document from a File with the Current Backend."""
+    return get_backend().load(fd)
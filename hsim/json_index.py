@@ -0,0 +1,262 @@
+"""
+Byte-Offset Sidecar Index, for Random Access into an HTAN JSON File.
+
+The index is written next to the JSON file, e.g. sim.json.idx, while the JSON
+file itself is written.  It is a JSON document of the form:
+
+    {
+        "index_format": 1,
+        "data_file": "sim.json",
+        "atlases": [
+            ["HTA0", 17, 401233, {"Demographics": [410, 9120, 10], ...}],
+            ...
+        ],
+        "schemas": [4152417, 4283841],
+        "data_bytes": 4283843,
+        "data_mtime_ns": 1760000000000000000,
+        "data_crc32": 2302599317
+    }
+
+Each atlas lists the byte range of the atlas object, and, per template label,
+the byte range of its record_list and its number of records.  The byte range
+of the schemas node follows the atlases.  Ranges are [start, end) byte offsets
+into the JSON file.
+
+The index also records the size and modification time of the JSON file, and
+the CRC-32 of its first and last STAMP_BLOCK_BYTES;  if any of these differ,
+the index is stale.
+
+IndexedJsonReader memory-maps the JSON file, and parses only the slice of
+the requested atlas, or record list.
+"""
+import json
+import mmap
+import os
+import zlib
+from pathlib import Path
+from hsim import json_backend
+
+INDEX_FORMAT = 2
+INDEX_EXTENSION = ".idx"
+STAMP_BLOCK_BYTES = 1 << 16
+
+
+class JsonIndexError(ValueError):
+    """
+    Raised when the Index does not Match its JSON File.
+    """
+
+    pass
+
+
+class JsonIndexWriter:
+    """
+    Streams the Index to Disk, One Atlas per Line, as the Atlases are Written.
+    Pass to HtanJsonWriter as its index writer.
+    """
+
+    def __init__(self, index_path, data_path):
+        self.data_path = data_path
+        self.out = open(index_path, "w")
+        self.out.write('{"index_format": %d, ' % INDEX_FORMAT)
+        self.out.write('"data_file": %s, ' % json.dumps(Path(data_path).name))
+        self.out.write('"atlases": [')
+        self.num_atlases = 0
+        self.schemas_range = None
+
+    def add_atlas(self, atlas, start, end, range_dict):
+        """
+        Add the Byte Ranges of a Single Atlas, and of its Record Lists.
+        """
+        self.add_entry(get_atlas_entry(atlas, start, end, range_dict))
+
+    def add_entry(self, entry, offset=0):
+        """
+        Add the Index Entry of a Single Atlas, Shifted by offset Bytes.
+        """
+        if offset != 0:
+            template_dict = {}
+            for label, template_entry in entry[3].items():
+                template_dict[label] = [
+                    template_entry[0] + offset,
+                    template_entry[1] + offset,
+                    template_entry[2],
+                ]
+            entry = [entry[0], entry[1] + offset, entry[2] + offset, template_dict]
+        if self.num_atlases > 0:
+            self.out.write(",")
+        self.out.write("\n" + json_backend.dumps(entry))
+        self.num_atlases += 1
+
+    def add_schemas(self, start, end):
+        """
+        Add the Byte Range of the Schemas Node.
+        """
+        self.schemas_range = [start, end]
+
+    def close(self, data_bytes):
+        """
+        Complete the Index, with the Stamp of the JSON File.
+        The JSON file must be flushed first, so that its stamp is final.
+        """
+        stamp = get_data_stamp(self.data_path)
+        if stamp["data_bytes"] != data_bytes:
+            self.out.close()
+            raise JsonIndexError(
+                "%s has %d bytes, but %d were written;  flush it before "
+                "closing its index." % (self.data_path, stamp["data_bytes"], data_bytes)
+            )
+        self.out.write("\n], ")
+        if self.schemas_range is not None:
+            self.out.write('"schemas": %s, ' % json.dumps(self.schemas_range))
+        self.out.write(", ".join('"%s": %d' % item for item in stamp.items()))
+        self.out.write("}\n")
+        self.out.close()
+
+
+class IndexedJsonReader:
+    """
+    Random Access into an HTAN JSON File, through its Sidecar Index.
+
+    Atlases are looked up by HTAN ID, or by position.  Only the requested
+    slice of the memory-mapped file is parsed.
+    """
+
+    def __init__(self, json_file_name, index_file_name=None):
+        if index_file_name is None:
+            index_file_name = get_index_path(json_file_name)
+        with open(index_file_name, "rb") as fd:
+            index = json_backend.load(fd)
+        if index.get("index_format") != INDEX_FORMAT:
+            raise JsonIndexError(
+                "Unsupported index format in %s." % index_file_name
+            )
+        self.atlas_entry_list = index["atlases"]
+        self.schemas_range = index.get("schemas")
+        self.position_dict = {}
+        for position, entry in enumerate(self.atlas_entry_list):
+            self.position_dict[entry[0]] = position
+
+        check_data_stamp(json_file_name, index)
+        self.fd = open(json_file_name, "rb")
+        data_bytes = self.fd.seek(0, 2)
+        if data_bytes > 0:
+            self.data = mmap.mmap(self.fd.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b""
+
+    def close(self):
+        """Unmap and Close the JSON File."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_num_atlases(self):
+        """Get the Number of Atlases."""
+        return len(self.atlas_entry_list)
+
+    def get_atlas_ids(self):
+        """Get the HTAN IDs of all Atlases, in File Order."""
+        return [entry[0] for entry in self.atlas_entry_list]
+
+    def get_template_labels(self, atlas):
+        """Get the Labels of all Templates of an Atlas."""
+        return list(self.__get_entry(atlas)[3])
+
+    def get_num_records(self, atlas, label):
+        """Get the Number of Records of a Template, without Parsing it."""
+        return self.__get_template_entry(atlas, label)[2]
+
+    def get_schemas(self):
+        """Parse the Schemas Node."""
+        if self.schemas_range is None:
+            raise JsonIndexError("The index has no schemas.")
+        return self.__parse(self.schemas_range[0], self.schemas_range[1])
+
+    def get_atlas(self, atlas):
+        """Parse a Single Atlas, by HTAN ID or Position."""
+        entry = self.__get_entry(atlas)
+        return self.__parse(entry[1], entry[2])
+
+    def get_record_list(self, atlas, label):
+        """Parse the Record List of a Single Template of an Atlas."""
+        template_entry = self.__get_template_entry(atlas, label)
+        return self.__parse(template_entry[0], template_entry[1])
+
+    def __get_entry(self, atlas):
+        """Get the Index Entry of an Atlas, by HTAN ID or Position."""
+        if isinstance(atlas, int):
+            return self.atlas_entry_list[atlas]
+        position = self.position_dict.get(atlas)
+        if position is None:
+            raise KeyError("No atlas with ID %s." % atlas)
+        return self.atlas_entry_list[position]
+
+    def __get_template_entry(self, atlas, label):
+        """Get the Index Entry of a Template of an Atlas."""
+        entry = self.__get_entry(atlas)
+        template_entry = entry[3].get(label)
+        if template_entry is None:
+            raise KeyError("Atlas %s has no template %s." % (entry[0], label))
+        return template_entry
+
+    def __parse(self, start, end):
+        """Parse a Slice of the JSON File."""
+        return json_backend.loads(self.data[start:end])
+
+
+def get_atlas_entry(atlas, start, end, range_dict):
+    """
+    Get the Index Entry of a Single Atlas, from the Byte Ranges of its
+    Members, as Recorded by HtanJsonWriter.
+    """
+    template_dict = {}
+    for label, member in atlas.items():
+        if isinstance(member, dict) and "record_list" in member:
+            record_start, record_end = range_dict[label]["record_list"]
+            num_records = len(member["record_list"])
+            template_dict[label] = [record_start, record_end, num_records]
+    return [atlas["htan_id"], start, end, template_dict]
+
+
+def get_data_stamp(json_file_name):
+    """
+    Get the Stamp of a JSON File, which its Indexes Record:  its size, its
+    modification time, and the CRC-32 of its first and last blocks.
+    """
+    with open(json_file_name, "rb") as fd:
+        stat = os.fstat(fd.fileno())
+        crc = zlib.crc32(fd.read(STAMP_BLOCK_BYTES))
+        if stat.st_size > STAMP_BLOCK_BYTES:
+            fd.seek(max(STAMP_BLOCK_BYTES, stat.st_size - STAMP_BLOCK_BYTES))
+            crc = zlib.crc32(fd.read(STAMP_BLOCK_BYTES), crc)
+    stamp = {}
+    stamp["data_bytes"] = stat.st_size
+    stamp["data_mtime_ns"] = stat.st_mtime_ns
+    stamp["data_crc32"] = crc
+    return stamp
+
+
+def check_data_stamp(json_file_name, doc):
+    """
+    Check a JSON File against the Stamp Recorded in an Index Document.
+    Raises JsonIndexError if the JSON file changed since it was indexed.
+    """
+    stamp = get_data_stamp(json_file_name)
+    for key, value in stamp.items():
+        if doc.get(key) != value:
+            raise JsonIndexError(
+                "%s has %s %s, but its index lists %s;  the index is stale."
+                % (json_file_name, key, value, doc.get(key))
+            )
+
+
+def get_index_path(json_file_name):
+    """Get the Path of the Sidecar Index of a JSON File."""
+    return str(json_file_name) + INDEX_EXTENSION
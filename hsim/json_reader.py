@@ -1,32 +1,124 @@
-import json
-from hsim import cli
+from collections import deque
+from collections import namedtuple
+import contextlib
+import os
+from hsim import column_store
+from hsim import compression
+from hsim import constants
+from hsim import facet_index
+from hsim import json_backend
+from hsim import json_index
+from hsim import json_stream
+from hsim import profiling
+from hsim import shard
 
 class HtanJsonReader:
     """
     Utility Class for Reading in HTAN JSON File.
+
+    By default, the whole file is loaded into memory.  In streaming mode,
+    the schemas are read first, and atlases are then parsed, checked and
+    discarded one at a time, so files larger than memory can be validated.
+
+    The file can also be the manifest of a sharded data set.  Each shard is
+    then checked on its own, against the shared schemas, and verified against
+    its checksum, size, atlas IDs and record count in the manifest.
+
+    With more than one worker, shards, or the atlases of a file with a
+    sidecar index, are parsed and checked in a process pool.  Errors are
+    merged in file order, so the error list is identical to the single
+    process one.  Files without shards or an index are checked in a single
+    process, as finding the atlas boundaries costs as much as parsing them.
+
+    In compact mode, atlases are parsed one at a time, as in streaming mode,
+    and kept in a column_store.CompactDataSet, several times smaller than
+    the parsed doc;  see get_data_set.  Compact data sets are built in a
+    single process.
+
+    With facets, a facet_index.FacetIndex of the attribute values of all
+    templates is built as atlases are read;  see get_facet_index.  As with
+    compact data sets, it is built in a single process.
     """
 
-    def __init__(self, json_file_name, template_list):
+    def __init__(
+        self,
+        json_file_name,
+        template_list,
+        streaming=False,
+        num_workers=1,
+        compact=False,
+        facets=False,
+    ):
         self.error_list = []
         self.json_file_name = json_file_name
-        fd = open(json_file_name, "r")
-        self.doc = json.load(fd)
-        self.__load_schema()
-
-        # Check Links for All Assays
+        self.num_workers = num_workers
+        self.id_index_list = []
+        self.num_atlases = 0
+        self.doc = None
+        self.schema_dict = None
+        self.link_checker = None
+        self.data_set = column_store.CompactDataSet() if compact else None
+        self.facet_index = facet_index.FacetIndex() if facets else None
+        self.manifest_error_list = []
+        self.assay_list_names = []
         for template in template_list:
-            if template[1] == cli.ASSAY_TYPE:
-                self.__check_assay_links(template[0].replace("bts:", ""))
+            if template[1] == constants.ASSAY_TYPE:
+                self.assay_list_names.append(template[0].replace("bts:", ""))
+
+        # One error bucket per link check, so that errors are reported check
+        # by check, and atlas by atlas within each check, in all modes
+        self.error_bucket_list = []
+        for i in range(len(self.assay_list_names) + 1):
+            self.error_bucket_list.append([])
+
+        self.manifest = shard.read_manifest(json_file_name)
+        num_indexed_atlases = None
+        if self.manifest is None and num_workers > 1 and not (compact or facets):
+            num_indexed_atlases = self.__load_index()
+        if self.manifest is not None:
+            self.__check_links_sharded(streaming)
+        elif num_indexed_atlases is not None:
+            self.__check_links_indexed(num_indexed_atlases)
+        elif streaming or compact:
+            self.__check_links_streaming()
+        else:
+            with profiling.stage("parse_json"):
+                with compression.open_input(json_file_name) as fd:
+                    self.doc = json_backend.load(fd)
+            with profiling.stage("load_schema"):
+                self.__load_schema(self.doc["schemas"])
+            self.__check_doc_links(self.doc)
 
-        # Check the Biospecimen Links
-        self.__check_biospecimen_links()
+        self.error_list.extend(self.manifest_error_list)
+        for error_bucket in self.error_bucket_list:
+            self.error_list.extend(error_bucket)
 
     def get_doc(self):
         """
         Get the Loaded JSON Doc.
+        Returns None in streaming and compact modes, as the doc is never held
+        in memory, for sharded data sets, and when checked by workers.
         """
         return self.doc
 
+    def get_data_set(self):
+        """
+        Get the Compact Data Set, or None if not in Compact Mode.
+        """
+        return self.data_set
+
+    def get_facet_index(self):
+        """
+        Get the Facet Index, or None if not Built.
+        """
+        return self.facet_index
+
+    def get_manifest(self):
+        """
+        Get the Manifest, or None if the File is not a Manifest.
+        """
+        return self.manifest
+
     def get_error_list(self):
         """
         Get the Error List.
@@ -37,20 +129,213 @@ class HtanJsonReader:
         """
         Get Total Number of Atlases Loaded.
         """
-        atlas_list = self.doc["atlases"]
-        return len(atlas_list)
+        return self.num_atlases
 
     def get_attribute_index(self, list_name, attribute_name):
         """
         Get the index value for the specified list and attribute pair.
         """
-        return self.schema_dict[list_name][attribute_name]
+        return self.link_checker.get_attribute_index(list_name, attribute_name)
 
-    def __load_schema(self):
+    def __load_schema(self, schema_list):
         """
         Load the Schemas into Various Hashes for Quick Look up Later.
         """
-        schema_list = self.doc["schemas"]
+        self.link_checker = AtlasLinkChecker(schema_list, self.assay_list_names)
+        self.schema_dict = self.link_checker.schema_dict
+        if self.data_set is not None:
+            self.data_set.set_schemas(schema_list)
+        if self.facet_index is not None:
+            self.facet_index.set_schemas(schema_list)
+
+    def get_id_index(self, atlas_position):
+        """
+        Get the ID Index of the Atlas at the Specified Position.
+        Only available for in-memory reads, in a single process.
+        """
+        return self.id_index_list[atlas_position]
+
+    def __check_doc_links(self, doc):
+        """
+        Check Links of all Atlases in a Loaded Doc.
+        """
+        # Index all IDs once, and share the index across all link checks
+        for atlas in doc["atlases"]:
+            id_index = self.link_checker.build_id_index(atlas)
+            self.id_index_list.append(id_index)
+            self.link_checker.check_atlas_links(
+                atlas, id_index, self.error_bucket_list
+            )
+            if self.facet_index is not None:
+                _add_facet_atlas(self.facet_index, atlas)
+            self.num_atlases += 1
+
+    def __check_links_sharded(self, streaming):
+        """
+        Check Links of a Sharded Data Set, One Shard at a Time.
+        """
+        schemas = self.manifest["schemas"]
+        with _open_listed_file(
+            self.json_file_name, schemas, self.manifest_error_list
+        ) as (fd, checksum_file):
+            if fd is None:
+                raise shard.ManifestError(
+                    "Schemas file %s is missing." % schemas["path"]
+                )
+            with profiling.stage("load_schema"):
+                self.__load_schema(json_backend.load(fd)["schemas"])
+        _verify_listed_file(schemas, checksum_file, self.manifest_error_list)
+
+        shard_entry_list = self.manifest["shards"]
+        single_process = self.num_workers == 1 or len(shard_entry_list) < 2
+        if single_process or self.data_set is not None or self.facet_index is not None:
+            for shard_entry in shard_entry_list:
+                shard_result = check_shard(
+                    self.link_checker,
+                    self.json_file_name,
+                    shard_entry,
+                    streaming,
+                    keep_id_index=not streaming and self.data_set is None,
+                    data_set=self.data_set,
+                    facet_index=self.facet_index,
+                )
+                self.__merge_result(shard_result)
+        else:
+            task_list = [
+                (_run_shard_worker, (shard_entry, streaming))
+                for shard_entry in shard_entry_list
+            ]
+            for shard_result in self.__run_workers(task_list):
+                self.__merge_result(shard_result)
+
+        if self.num_atlases != self.manifest["num_atlases"]:
+            self.manifest_error_list.append(
+                "Found %d atlases, but the manifest lists %d."
+                % (self.num_atlases, self.manifest["num_atlases"])
+            )
+
+    def __load_index(self):
+        """
+        Load the Schemas through the Sidecar Index, if the File has One.
+        Returns the number of atlases, or None if the file has no usable index.
+        """
+        index_path = json_index.get_index_path(self.json_file_name)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with json_index.IndexedJsonReader(self.json_file_name) as reader:
+                num_atlases = reader.get_num_atlases()
+                with profiling.stage("load_schema"):
+                    self.__load_schema(reader.get_schemas())
+        except json_index.JsonIndexError:
+            # The JSON file, not its index, is authoritative;  check it in a single process
+            return None
+        return num_atlases
+
+    def __check_links_indexed(self, num_atlases):
+        """
+        Check Links of the Atlases of a File with a Sidecar Index, in Workers.
+        """
+        # Several chunks per worker, so that workers stay busy until the end
+        chunk_size = max(1, -(-num_atlases // (self.num_workers * 4)))
+        task_list = []
+        for start in range(0, num_atlases, chunk_size):
+            end = min(num_atlases, start + chunk_size)
+            task_list.append((_run_indexed_worker, (start, end)))
+        for shard_result in self.__run_workers(task_list):
+            self.__merge_result(shard_result)
+
+    def __run_workers(self, task_list):
+        """
+        Run Check Tasks in a Process Pool, Yielding their Results in Task Order.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        profiler = profiling.get_profiler()
+        with ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_init_check_worker,
+            initargs=(self.link_checker, self.json_file_name, profiler.is_enabled()),
+        ) as executor:
+            # Bound the number of results in flight, so memory stays flat
+            pending = deque()
+            for function, args in task_list:
+                if len(pending) >= self.num_workers * 2:
+                    shard_result, record_list = pending.popleft().result()
+                    profiler.add_records(record_list)
+                    yield shard_result
+                pending.append(executor.submit(function, *args))
+            while pending:
+                shard_result, record_list = pending.popleft().result()
+                profiler.add_records(record_list)
+                yield shard_result
+
+    def __merge_result(self, shard_result):
+        """
+        Merge the Result of Checking a Shard, or a Chunk of Atlases.
+        """
+        for error_bucket, shard_error_bucket in zip(
+            self.error_bucket_list, shard_result.error_bucket_list
+        ):
+            error_bucket.extend(shard_error_bucket)
+        self.manifest_error_list.extend(shard_result.manifest_error_list)
+        self.id_index_list.extend(shard_result.id_index_list)
+        self.num_atlases += len(shard_result.atlas_id_list)
+
+    def __check_links_streaming(self):
+        """
+        Check Links, Streaming One Atlas at a Time.
+        """
+        atlases_skipped = False
+        with compression.open_input(self.json_file_name) as fd:
+            stream_reader = json_stream.JsonStreamReader(fd)
+            for key in stream_reader.iter_keys():
+                if key == "schemas":
+                    with profiling.stage("load_schema"):
+                        self.__load_schema(stream_reader.read_value())
+                elif key == "atlases" and self.schema_dict is not None:
+                    self.__check_atlas_stream(stream_reader)
+                elif key == "atlases":
+                    # Atlases come before schemas;  read them in a second pass
+                    atlases_skipped = True
+                    stream_reader.skip_value()
+                else:
+                    stream_reader.skip_value()
+        if self.schema_dict is None:
+            raise json_stream.JsonStreamError(
+                "No schemas found in %s." % self.json_file_name
+            )
+        if atlases_skipped:
+            with compression.open_input(self.json_file_name) as fd:
+                stream_reader = json_stream.JsonStreamReader(fd)
+                for key in stream_reader.iter_keys():
+                    if key == "atlases":
+                        self.__check_atlas_stream(stream_reader)
+                    else:
+                        stream_reader.skip_value()
+
+    def __check_atlas_stream(self, stream_reader):
+        """
+        Check Links of Each Atlas in the Stream, then Discard the Atlas.
+        """
+        atlas_id_list = _check_atlas_stream(
+            self.link_checker,
+            stream_reader,
+            self.error_bucket_list,
+            self.data_set,
+            self.facet_index,
+        )
+        self.num_atlases += len(atlas_id_list)
+
+
+class AtlasLinkChecker:
+    """
+    Checks the Links within Single Atlases, against the Loaded Schemas.
+    Holds no file state, so that it can be sent to worker processes.
+    """
+
+    def __init__(self, schema_list, assay_list_names):
+        self.assay_list_names = assay_list_names
         self.schema_dict = {}
         for schema in schema_list:
             schema_name = schema["data_schema"]
@@ -63,65 +348,367 @@ class HtanJsonReader:
                 index_counter += 1
             self.schema_dict[schema_name] = name_dict
 
-    def __extract_sample_ids(self, atlas):
+    def get_attribute_index(self, list_name, attribute_name):
         """
-        Extract the Sample IDs.
+        Get the index value for the specified list and attribute pair.
         """
-        sample_id_list = []
-        biospecimen_list = "Biospecimen"
-        attribute_index = self.get_attribute_index(biospecimen_list, "bts:HTANBiospecimenID")
-        record_list = atlas[biospecimen_list]["record_list"]
-        for record in record_list:
-            sample_id = record[attribute_index]
-            sample_id_list.append(sample_id)
-        return sample_id_list
+        return self.schema_dict[list_name][attribute_name]
 
-    def __extract_participant_ids(self, atlas):
+    def new_error_bucket_list(self):
         """
-        Extract the Participant IDs.
+        Get One Empty Error Bucket per Link Check.
         """
-        participant_id_list = []
-        biospecimen_list = "Demographics"
-        attribute_index = self.get_attribute_index(biospecimen_list, "bts:HTANParticipantID")
-        record_list = atlas[biospecimen_list]["record_list"]
-        for record in record_list:
-            participant_id = record[attribute_index]
-            participant_id_list.append(participant_id)
-        return participant_id_list        
+        return [[] for i in range(len(self.assay_list_names) + 1)]
+
+    def build_id_index(self, atlas):
+        """
+        Build the ID Index for a Single Atlas.
+        """
+        with profiling.stage("build_id_index", atlas=atlas.get("htan_id")):
+            return self.__index_atlas(atlas)
+
+    def __index_atlas(self, atlas):
+        """
+        Index all IDs of a Single Atlas.
+        """
+        sample_index = self.get_attribute_index("Biospecimen", "bts:HTANBiospecimenID")
+        participant_index = self.get_attribute_index(
+            "Demographics", "bts:HTANParticipantID"
+        )
+        return AtlasIdIndex(
+            atlas["Biospecimen"]["record_list"],
+            sample_index,
+            atlas["Demographics"]["record_list"],
+            participant_index,
+        )
+
+    def check_atlas_links(self, atlas, id_index, error_bucket_list):
+        """
+        Check All Links within a Single Atlas.
+        """
+        atlas_id = atlas.get("htan_id")
+        for list_name, error_bucket in zip(self.assay_list_names, error_bucket_list):
+            with profiling.stage("check_links", atlas_id, "bts:" + list_name):
+                self.__check_assay_links(list_name, atlas, id_index, error_bucket)
+        with profiling.stage("check_links", atlas_id, "bts:Biospecimen"):
+            self.__check_biospecimen_links(atlas, id_index, error_bucket_list[-1])
 
-    def __check_assay_links(self, list_name):
+    def __check_assay_links(self, list_name, atlas, id_index, error_bucket):
         """
         Check Assay Links.
         """
-        atlas_list = self.doc["atlases"]
         target_id = "bts:HTANParentBiospecimenID"
         attribute_index = self.get_attribute_index(list_name, target_id)
-        for atlas in atlas_list:
-            sample_id_list = self.__extract_sample_ids(atlas)
-            record_list = atlas[list_name]["record_list"]
-            for record in record_list:
-                biospecimen_id = record[attribute_index]
-                if biospecimen_id not in sample_id_list:
-                    self.error_list.append(
-                        "Within %s, we have %s:%s, but this ID does not exist within the Biospecimen list."
-                        % (list_name, target_id, biospecimen_id)
-                    )
-
-    def __check_biospecimen_links(self):
+        sample_id_set = id_index.sample_id_set
+        record_list = atlas[list_name]["record_list"]
+        for record in record_list:
+            biospecimen_id = record[attribute_index]
+            if biospecimen_id not in sample_id_set:
+                error_bucket.append(
+                    "Within %s, we have %s:%s, but this ID does not exist within the Biospecimen list."
+                    % (list_name, target_id, biospecimen_id)
+                )
+
+    def __check_biospecimen_links(self, atlas, id_index, error_bucket):
         """
         Check Biospecimen Links.
         """
-        atlas_list = self.doc["atlases"]
         target_id = "bts:HTANParentID"
         list_name = "Biospecimen"
         attribute_index = self.get_attribute_index(list_name, target_id)
-        for atlas in atlas_list:
-            participant_id_list = self.__extract_participant_ids(atlas)
-            sample_id_list = self.__extract_sample_ids(atlas)
-            record_list = atlas[list_name]["record_list"]
-            for record in record_list:
-                parent_id = record[attribute_index]
-                if parent_id not in participant_id_list and parent_id not in sample_id_list:
-                    msg = "Within %s, we have %s:%s, but this ID does not exist within " \
-                        "the Biospecimen or Demographics list." % (list_name, target_id, parent_id)
-                    self.error_list.append(msg)
\ No newline at end of file
+        participant_id_set = id_index.participant_id_set
+        sample_id_set = id_index.sample_id_set
+        record_list = atlas[list_name]["record_list"]
+        for record in record_list:
+            parent_id = record[attribute_index]
+            if parent_id not in participant_id_set and parent_id not in sample_id_set:
+                msg = "Within %s, we have %s:%s, but this ID does not exist within " \
+                    "the Biospecimen or Demographics list." % (list_name, target_id, parent_id)
+                error_bucket.append(msg)
+
+
+class ShardResult(
+    namedtuple(
+        "ShardResult",
+        ["atlas_id_list", "error_bucket_list", "manifest_error_list", "id_index_list"],
+    )
+):
+    """Result of Checking a Single Shard, or a Chunk of Atlases."""
+
+    __slots__ = ()
+
+
+def check_shard(
+    link_checker,
+    manifest_path,
+    shard_entry,
+    streaming,
+    keep_id_index=False,
+    data_set=None,
+    facet_index=None,
+):
+    """
+    Check the Links of a Single Shard, and Verify it against the Manifest.
+    With keep_id_index, the ID index of each atlas is kept in the result;
+    with a compact data set, or a facet index, each atlas is added to it.
+    """
+    error_bucket_list = link_checker.new_error_bucket_list()
+    manifest_error_list = []
+    id_index_list = []
+    atlas_id_list = []
+    with _open_listed_file(manifest_path, shard_entry, manifest_error_list) as (
+        fd,
+        checksum_file,
+    ):
+        if fd is not None:
+            if streaming:
+                stream_reader = json_stream.JsonStreamReader(fd)
+                for key in stream_reader.iter_keys():
+                    if key == "atlases":
+                        atlas_id_list = _check_atlas_stream(
+                            link_checker,
+                            stream_reader,
+                            error_bucket_list,
+                            data_set,
+                            facet_index,
+                        )
+                    else:
+                        stream_reader.skip_value()
+            else:
+                with profiling.stage("parse_json"):
+                    doc = json_backend.load(fd)
+                for atlas in doc["atlases"]:
+                    id_index = link_checker.build_id_index(atlas)
+                    if keep_id_index:
+                        id_index_list.append(id_index)
+                    link_checker.check_atlas_links(atlas, id_index, error_bucket_list)
+                    if data_set is not None:
+                        _add_compact_atlas(data_set, atlas)
+                    if facet_index is not None:
+                        _add_facet_atlas(facet_index, atlas)
+                    atlas_id_list.append(atlas.get("htan_id"))
+    if fd is None:
+        return ShardResult([], error_bucket_list, manifest_error_list, [])
+    _verify_listed_file(shard_entry, checksum_file, manifest_error_list)
+    if atlas_id_list != shard_entry["atlases"]:
+        manifest_error_list.append(
+            "Shard %s holds atlases %s, but the manifest lists %s."
+            % (shard_entry["path"], atlas_id_list, shard_entry["atlases"])
+        )
+    return ShardResult(atlas_id_list, error_bucket_list, manifest_error_list, id_index_list)
+
+
+def _check_atlas_stream(
+    link_checker, stream_reader, error_bucket_list, data_set=None, facet_index=None
+):
+    """
+    Check Links of Each Atlas in the Stream, then Discard the Atlas, or Add
+    it to the Compact Data Set, and the Facet Index.  Returns the IDs of the
+    atlases.
+    """
+    atlas_id_list = []
+    atlas_iter = stream_reader.iter_array()
+    while True:
+        with profiling.stage("parse_json"):
+            atlas = next(atlas_iter, _END_OF_ARRAY)
+        if atlas is _END_OF_ARRAY:
+            break
+        link_checker.check_atlas_links(
+            atlas, link_checker.build_id_index(atlas), error_bucket_list
+        )
+        if data_set is not None:
+            _add_compact_atlas(data_set, atlas)
+        if facet_index is not None:
+            _add_facet_atlas(facet_index, atlas)
+        atlas_id_list.append(atlas.get("htan_id"))
+    return atlas_id_list
+
+
+def _add_compact_atlas(data_set, atlas):
+    """Add a Single Atlas to the Compact Data Set."""
+    with profiling.stage("compact", atlas=atlas.get("htan_id")):
+        data_set.add_atlas(atlas)
+
+
+def _add_facet_atlas(facet_index, atlas):
+    """Add the Values of a Single Atlas to the Facet Index."""
+    with profiling.stage("index_facets", atlas=atlas.get("htan_id")):
+        facet_index.add_atlas(atlas)
+
+
+@contextlib.contextmanager
+def _open_listed_file(manifest_path, entry, manifest_error_list):
+    """
+    Open a File Listed in the Manifest, for Reading with a Checksum.
+    Yields the decompressed input, and the checksum file of the raw input;
+    yields None for both, and records an error, if the file is missing.
+    The raw input is read to its end on exit, so that the checksum is complete.
+    """
+    path = shard.resolve_path(manifest_path, entry["path"])
+    try:
+        compression_type = compression.detect_compression(path)
+        raw_fd = open(path, "rb")
+    except FileNotFoundError:
+        manifest_error_list.append("File %s is missing." % entry["path"])
+        yield None, None
+        return
+    with raw_fd:
+        checksum_file = shard.ChecksumFile(raw_fd)
+        fd = compression.decompress_input(checksum_file, compression_type)
+        yield fd, checksum_file
+        checksum_file.read()
+
+
+def _verify_listed_file(entry, checksum_file, manifest_error_list):
+    """
+    Verify the Size and Checksum of a File Listed in the Manifest.
+    """
+    if checksum_file is None:
+        return
+    if checksum_file.num_bytes != entry["bytes"]:
+        manifest_error_list.append(
+            "File %s has %d bytes, but the manifest lists %d."
+            % (entry["path"], checksum_file.num_bytes, entry["bytes"])
+        )
+    elif checksum_file.get_checksum() != entry["sha256"]:
+        manifest_error_list.append(
+            "File %s does not match its checksum in the manifest." % entry["path"]
+        )
+
+
+_worker_state = {}
+
+
+def _init_check_worker(link_checker, json_file_name, profile):
+    """Initialize a Worker Process of the Link Check Pool."""
+    _worker_state["link_checker"] = link_checker
+    _worker_state["json_file_name"] = json_file_name
+    _worker_state["indexed_reader"] = None
+    if profile:
+        profiling.activate(profiling.StageProfiler())
+    else:
+        profiling.activate(profiling.NullProfiler())
+
+
+def _run_shard_worker(shard_entry, streaming):
+    """
+    Check a Single Shard within a Worker Process.
+    Returns the shard result, and the stage records of the worker's profiler.
+    """
+    shard_result = check_shard(
+        _worker_state["link_checker"],
+        _worker_state["json_file_name"],
+        shard_entry,
+        streaming,
+    )
+    return shard_result, profiling.get_profiler().pop_records()
+
+
+def _run_indexed_worker(start, end):
+    """
+    Check the Atlases at Positions [start, end) of an Indexed File, within a
+    Worker Process.  The file is memory-mapped once per worker.
+    Returns the result, and the stage records of the worker's profiler.
+    """
+    if _worker_state["indexed_reader"] is None:
+        _worker_state["indexed_reader"] = json_index.IndexedJsonReader(
+            _worker_state["json_file_name"]
+        )
+    reader = _worker_state["indexed_reader"]
+    link_checker = _worker_state["link_checker"]
+    error_bucket_list = link_checker.new_error_bucket_list()
+    atlas_id_list = []
+    for position in range(start, end):
+        with profiling.stage("parse_json"):
+            atlas = reader.get_atlas(position)
+        link_checker.check_atlas_links(
+            atlas, link_checker.build_id_index(atlas), error_bucket_list
+        )
+        atlas_id_list.append(atlas.get("htan_id"))
+    shard_result = ShardResult(atlas_id_list, error_bucket_list, [], [])
+    return shard_result, profiling.get_profiler().pop_records()
+
+
+def iter_atlases(json_file_name):
+    """
+    Iterate over all Atlases of a Data Set, Parsing One Atlas at a Time.
+    For a manifest, iterates over the atlases of all shards, in order.
+    """
+    manifest = shard.read_manifest(json_file_name)
+    if manifest is None:
+        path_list = [json_file_name]
+    else:
+        path_list = []
+        for shard_entry in manifest["shards"]:
+            path_list.append(shard.resolve_path(json_file_name, shard_entry["path"]))
+    for path in path_list:
+        with compression.open_input(path) as fd:
+            stream_reader = json_stream.JsonStreamReader(fd)
+            for key in stream_reader.iter_keys():
+                if key == "atlases":
+                    for atlas in stream_reader.iter_array():
+                        yield atlas
+                else:
+                    stream_reader.skip_value()
+
+
+def read_schemas(json_file_name):
+    """
+    Read the Schemas Node of a Data Set, without Parsing its Atlases.
+    Uses the schemas file of a manifest, or the sidecar index of a file if it
+    has one;  otherwise skips over the atlases of the file.
+    """
+    manifest = shard.read_manifest(json_file_name)
+    if manifest is not None:
+        path = shard.resolve_path(json_file_name, manifest["schemas"]["path"])
+        with compression.open_input(path) as fd:
+            return json_backend.load(fd)["schemas"]
+    if os.path.exists(json_index.get_index_path(json_file_name)):
+        try:
+            with json_index.IndexedJsonReader(json_file_name) as reader:
+                return reader.get_schemas()
+        except json_index.JsonIndexError:
+            pass
+    with compression.open_input(json_file_name) as fd:
+        stream_reader = json_stream.JsonStreamReader(fd)
+        for key in stream_reader.iter_keys():
+            if key == "schemas":
+                return stream_reader.read_value()
+            stream_reader.skip_value()
+    raise json_stream.JsonStreamError("No schemas found in %s." % json_file_name)
+
+
+# Marks the end of the atlases, when streaming
+_END_OF_ARRAY = object()
+
+
+class AtlasIdIndex:
+    """
+    Index of all Participant and Sample IDs within a Single Atlas.
+    """
+
+    def __init__(
+        self, sample_record_list, sample_index, participant_record_list, participant_index
+    ):
+        self.sample_position_dict = {}
+        for position, record in enumerate(sample_record_list):
+            self.sample_position_dict.setdefault(record[sample_index], position)
+        self.participant_position_dict = {}
+        for position, record in enumerate(participant_record_list):
+            self.participant_position_dict.setdefault(
+                record[participant_index], position
+            )
+        self.sample_id_set = self.sample_position_dict.keys()
+        self.participant_id_set = self.participant_position_dict.keys()
+
+    def get_sample_position(self, sample_id):
+        """
+        Get Position of the Sample within the Biospecimen List, or None.
+        """
+        return self.sample_position_dict.get(sample_id)
+
+    def get_participant_position(self, participant_id):
+        """
+        Get Position of the Participant within the Demographics List, or None.
+        """
+        return self.participant_position_dict.get(participant_id)
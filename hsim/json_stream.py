@@ -0,0 +1,284 @@
+"""
+Incremental Parser for Reading Large JSON Documents from a Stream.
+
+Only the top-level object is walked incrementally;  each value is either
+skipped, decoded as a whole, or, for arrays, handed out one element at a time.
+Memory use is therefore bounded by the largest single element, e.g. one atlas,
+rather than by the size of the document.
+
+Skipped objects and arrays are scanned, rather than decoded, so no objects are
+built, and only brackets are handled one at a time.  Where the buffer holds no
+escapes, every quote starts or ends a string, so a bracket is within a string
+if an odd number of quotes precedes it;  otherwise, a regular expression runs
+over whole strings.  The scan only checks that brackets match, and that strings
+are closed.
+
+Values are decoded by the C decoder of the json module.  When a value does not
+fit in the buffer yet, the buffer is at least doubled before decoding is retried,
+so the total decoding work stays linear in the size of the value.  Only errors
+at the end of the buffer mean that the value continues in the next chunk;
+any other error is raised at once, without reading the rest of the stream.
+"""
+import codecs
+import json
+import re
+
+CHUNK_SIZE = 1 << 20
+
+_NON_WHITESPACE_PATTERN = re.compile(r"[^ \t\n\r]")
+
+# Everything up to the next bracket, skipping over whole strings;  stops at an
+# opening quote if the string is not closed within the buffer
+_SKIP_PATTERN = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*', re.DOTALL)
+_BRACKET_LIST = "[]{}"
+_CLOSING_BRACKET_DICT = {"]": "[", "}": "{"}
+_NUMBER_START = "-0123456789"
+
+# Errors this close to the end of the buffer may be a token cut short, such as
+# a partial literal (fals), number (1.5e-) or escape (\u00e)
+_MAX_TRUNCATED_TOKEN = 5
+_UNTERMINATED_STRING = "Unterminated string"
+
+
+class JsonStreamError(ValueError):
+    """
+    Raised when the Stream does not Contain the Expected JSON.
+    """
+
+    pass
+
+
+class JsonStreamReader:
+    """
+    Incremental Reader over a JSON Document in a Binary or Text Stream.
+    """
+
+    def __init__(self, fd, chunk_size=CHUNK_SIZE):
+        self.fd = fd
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.size_hint = 0
+        self.json_decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def iter_keys(self):
+        """
+        Iterate over the Keys of the Top-Level Object.
+        The caller must consume each value, via read_value, skip_value or
+        iter_array, before asking for the next key.
+        """
+        self.__expect("{")
+        if self.__peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.__peek() != '"':
+                raise JsonStreamError("Expected an object key.")
+            key = self.__decode()[0]
+            self.__expect(":")
+            yield key
+            next_char = self.__peek()
+            self.pos += 1
+            if next_char == "}":
+                return
+            if next_char != ",":
+                raise JsonStreamError("Expected ',' or '}' after an object member.")
+
+    def read_value(self):
+        """
+        Read and Decode the Next Value.
+        """
+        return self.__decode()[0]
+
+    def read_raw_value(self):
+        """
+        Read the Raw JSON Text of the Next Value.
+        """
+        value, start, end = self.__decode()
+        return self.buf[start:end]
+
+    def skip_value(self):
+        """
+        Skip the Next Value.
+        Objects and arrays are scanned a chunk at a time, without decoding
+        them, so skipping the atlases holds no atlas in memory.
+        """
+        if self.__peek() not in "[{":
+            self.__decode()
+            return
+        bracket_list = []
+        while True:
+            if self.buf.find("\\", self.pos) == -1:
+                found_end = self.__scan_unescaped(bracket_list)
+            else:
+                found_end = self.__scan_escaped(bracket_list)
+            if found_end:
+                return
+            # The value, or a string within it, continues in the next chunk
+            if not self.__fill(max(self.chunk_size, len(self.buf) - self.pos)):
+                raise JsonStreamError("Unexpected end of JSON stream.")
+
+    def iter_array(self, raw=False):
+        """
+        Iterate over Each Element of the Next Value, which must be an Array.
+        Elements are decoded, or, with raw, handed out as raw JSON text.
+        """
+        self.__expect("[")
+        if self.__peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            if raw:
+                yield self.read_raw_value()
+            else:
+                yield self.read_value()
+            next_char = self.__peek()
+            self.pos += 1
+            if next_char == "]":
+                return
+            if next_char != ",":
+                raise JsonStreamError("Expected ',' or ']' after an array element.")
+
+    def __scan_unescaped(self, bracket_list):
+        """
+        Scan a Buffer without Escapes, Bracket by Bracket, up to the End of
+        the Value, or of the Buffer.  Returns True at the end of the value;
+        otherwise, the position is left outside of any string.
+        """
+        buf = self.buf
+        end = len(buf)
+        start = pos = self.pos
+        in_string = False
+
+        # The next position of each kind of bracket;  str.find is much
+        # faster than searching for a character class
+        def find(char, pos):
+            position = buf.find(char, pos)
+            return end if position < 0 else position
+
+        next_list = [find(char, pos) for char in _BRACKET_LIST]
+        while True:
+            bracket_pos = min(next_list)
+            if bracket_pos == end:
+                break
+            if buf.count('"', pos, bracket_pos) % 2 == 1:
+                in_string = not in_string
+            pos = bracket_pos + 1
+            char = buf[bracket_pos]
+            position = _BRACKET_LIST.index(char)
+            next_list[position] = find(char, pos)
+            if not in_string and scan_bracket(bracket_list, char):
+                self.pos = pos
+                return True
+        if (buf.count('"', pos) % 2 == 1) != in_string:
+            # Read the string left open again, as a whole, after the next fill
+            self.pos = buf.rfind('"', start)
+        else:
+            self.pos = end
+        return False
+
+    def __scan_escaped(self, bracket_list):
+        """
+        Scan a Buffer with Escapes, String by String, up to the End of the
+        Value, or of the Buffer.  Returns True at the end of the value;
+        otherwise, the position is left outside of any string.
+        """
+        while True:
+            self.pos = _SKIP_PATTERN.match(self.buf, self.pos).end()
+            if self.pos == len(self.buf) or self.buf[self.pos] == '"':
+                return False
+            self.pos += 1
+            if scan_bracket(bracket_list, self.buf[self.pos - 1]):
+                return True
+
+    def __decode(self):
+        """
+        Decode the Value at the Current Position, Reading More as Needed.
+        Returns the value, and its start and end positions within the buffer.
+        """
+        first_char = self.__peek()
+
+        # Consecutive atlases tend to be of similar size, so read ahead
+        # enough for the previous value before trying to decode
+        if len(self.buf) - self.pos < self.size_hint and not self.eof:
+            self.__fill(self.size_hint - (len(self.buf) - self.pos))
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof or first_char not in _NUMBER_START:
+                    break
+            except json.JSONDecodeError as e:
+                if self.eof or not is_truncated(e, len(self.buf)):
+                    raise JsonStreamError("Invalid JSON stream:  %s" % e)
+            self.__fill(max(self.chunk_size, len(self.buf) - self.pos))
+        start = self.pos
+        self.pos = end
+        self.size_hint = end - start
+        return value, start, end
+
+    def __peek(self):
+        """
+        Skip Whitespace, and Return the Next Character without Consuming it.
+        """
+        while True:
+            match = _NON_WHITESPACE_PATTERN.search(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self.__fill(self.chunk_size):
+                raise JsonStreamError("Unexpected end of JSON stream.")
+
+    def __expect(self, char):
+        """
+        Consume the Expected Character.
+        """
+        if self.__peek() != char:
+            raise JsonStreamError("Expected '%s' in JSON stream." % char)
+        self.pos += 1
+
+    def __fill(self, size):
+        """
+        Read at least size More Bytes, Dropping Everything Already Consumed.
+        Returns False at the end of the stream.
+        """
+        if self.eof:
+            return False
+        chunk = self.fd.read(size)
+        if isinstance(chunk, bytes):
+            text = self.text_decoder.decode(chunk, final=not chunk)
+        else:
+            text = chunk
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos :] + text
+        self.pos = 0
+        return bool(chunk)
+
+
+def scan_bracket(bracket_list, char):
+    """
+    Track a Bracket of a Skipped Value, on the List of Open Brackets.
+    Returns True once the outermost bracket is closed.
+    """
+    if char in "[{":
+        bracket_list.append(char)
+        return False
+    if bracket_list.pop() != _CLOSING_BRACKET_DICT[char]:
+        raise JsonStreamError("Mismatched '%s' in JSON stream." % char)
+    return not bracket_list
+
+
+def is_truncated(error, buf_size):
+    """
+    Check whether a Decode Error may be Due to the Value Continuing past the
+    End of the Buffer, rather than to Invalid JSON.
+    A string left open runs to the end of the buffer, wherever it starts.
+    """
+    if error.msg.startswith(_UNTERMINATED_STRING):
+        return True
+    return buf_size - error.pos <= _MAX_TRUNCATED_TOKEN
@@ -0,0 +1,179 @@
+from collections import namedtuple
+import io
+from hsim import json_backend
+from hsim import json_index
+
+
+class HtanJsonWriter:
+    """
+    Utility Class for Streaming an HTAN JSON File to Disk.
+
+    Atlases are written one at a time, and each record list is serialized
+    on its own, so memory stays flat no matter how many atlases are written.
+    With an indent, the output is identical to json.dumps(data_set, indent=indent);
+    without one, the output is compact.  Values are serialized with the
+    current JSON backend;  see json_backend.
+
+    With an index writer, the byte range of each atlas, and of each of its
+    members, is passed to index_writer.add_atlas as the atlas is written,
+    and the byte range of the schemas to index_writer.add_schemas.
+
+    Atlases can also be serialized ahead of time, into fragments, which are
+    then written as they are;  see serialize_atlas and write_fragment.
+    """
+
+    def __init__(self, out, indent=4, index_writer=None):
+        self.out = out
+        self.indent = indent
+        self.index_writer = index_writer
+        self.dumps = json_backend.get_backend().dumps
+        self.num_atlases = 0
+        self.num_bytes = 0
+        if indent is None:
+            self.key_separator = ":"
+        else:
+            self.key_separator = ": "
+        self.__write("{" + self.__newline(1) + '"atlases"' + self.key_separator + "[")
+
+    def write_atlas(self, atlas):
+        """
+        Write a Single Atlas.
+        """
+        if self.num_atlases > 0:
+            self.__write(",")
+        self.__write(self.__newline(2))
+        if self.index_writer is None:
+            self.__write_object(atlas, 2)
+        else:
+            start = self.num_bytes
+            range_dict = {}
+            self.__write_object(atlas, 2, range_dict)
+            self.index_writer.add_atlas(atlas, start, self.num_bytes, range_dict)
+        self.num_atlases += 1
+
+    def serialize_atlas(self, atlas):
+        """
+        Serialize a Single Atlas into a Fragment, without Writing it.
+        The atlas is serialized by a writer of its own, so that atlases can be
+        serialized in one thread, while fragments are written in another.
+        """
+        fragment_writer = HtanJsonWriter(io.BytesIO(), self.indent)
+        buffer = io.BytesIO()
+        fragment_writer.out = buffer
+        fragment_writer.num_bytes = 0
+        range_dict = {}
+        fragment_writer.__write_object(atlas, 2, range_dict)
+        data = buffer.getvalue()
+        index_entry = json_index.get_atlas_entry(atlas, 0, len(data), range_dict)
+        return AtlasFragment(atlas["htan_id"], data, index_entry)
+
+    def write_fragment(self, fragment):
+        """
+        Write a Single Atlas, Serialized by a Writer with the Same Indent.
+        """
+        if self.num_atlases > 0:
+            self.__write(",")
+        self.__write(self.__newline(2))
+        start = self.num_bytes
+        self.num_bytes += len(fragment.data)
+        self.out.write(fragment.data)
+        if self.index_writer is not None:
+            self.index_writer.add_entry(fragment.index_entry, start)
+        self.num_atlases += 1
+
+    def write_schemas(self, schema_list):
+        """
+        Write the Root Schemas Node, and Complete the Document.
+        """
+        self.__close_atlases()
+        self.__write("," + self.__newline(1) + '"schemas"' + self.key_separator)
+        start = self.num_bytes
+        self.__write(self.__dumps(schema_list, 1))
+        if self.index_writer is not None:
+            self.index_writer.add_schemas(start, self.num_bytes)
+        self.__write(self.__newline(0) + "}")
+
+    def close(self):
+        """
+        Complete the Document, without a Schemas Node.
+        """
+        self.__close_atlases()
+        self.__write(self.__newline(0) + "}")
+
+    def __close_atlases(self):
+        """
+        Close the Atlases Array.
+        """
+        if self.num_atlases == 0:
+            self.__write("]")
+        else:
+            self.__write(self.__newline(1) + "]")
+
+    def __write_object(self, value, level, range_dict=None):
+        """
+        Write an Atlas or Template Object, one Member at a Time.
+        With a range dict, records the byte range of each member;  the
+        ranges of the members of nested objects go into nested range dicts.
+        """
+        if len(value) == 0:
+            self.__write("{}")
+            return
+        self.__write("{")
+        first = True
+        for key, member in value.items():
+            if not first:
+                self.__write(",")
+            first = False
+            self.__write(self.__newline(level + 1))
+            self.__write(self.dumps(key) + self.key_separator)
+            if range_dict is None:
+                if isinstance(member, dict):
+                    self.__write_object(member, level + 1)
+                else:
+                    self.__write(self.__dumps(member, level + 1))
+            elif isinstance(member, dict):
+                range_dict[key] = {}
+                self.__write_object(member, level + 1, range_dict[key])
+            else:
+                start = self.num_bytes
+                self.__write(self.__dumps(member, level + 1))
+                range_dict[key] = (start, self.num_bytes)
+        self.__write(self.__newline(level) + "}")
+
+    def __dumps(self, value, level):
+        """
+        Serialize a Value Nested at the Specified Level.
+        """
+        json_dump = self.dumps(value, self.indent)
+        if self.indent is None:
+            return json_dump
+        return json_dump.replace("\n", self.__newline(level))
+
+    def __newline(self, level):
+        """
+        Get the Line Break and Indentation for the Specified Level.
+        """
+        if self.indent is None:
+            return ""
+        return "\n" + " " * (self.indent * level)
+
+    def __write(self, txt):
+        """
+        Write Text to the Output.
+        """
+        data = txt.encode("utf-8")
+        self.num_bytes += len(data)
+        self.out.write(data)
+
+
+class AtlasFragment(namedtuple("AtlasFragment", ["htan_id", "data", "index_entry"])):
+    """
+    A Single Atlas, Serialized as Nested within the Atlases Array.
+    The index entry holds byte ranges relative to the start of the data.
+    """
+
+    __slots__ = ()
+
+    def get_num_records(self):
+        """Count all Records of the Atlas."""
+        return sum(template_entry[2] for template_entry in self.index_entry[3].values())
@@ -0,0 +1,245 @@
+"""
+Bounded Producer / Consumer Pipeline, with Throughput Counters per Stage.
+
+A pipeline pulls items from a source iterator, and passes each item through
+a chain of stages, in order.  The source and each stage but the last run in
+threads of their own, connected by bounded queues, so that a slow stage holds
+back the stages before it, and memory stays flat.  The last stage runs in the
+calling thread.  Items reach each stage in source order.
+
+Threads help where stages wait, or release the GIL:  atlases generated in
+worker processes, compression, and disk writes.  Each stage counts its items
+and bytes, the time it is busy, the time it waits for input, and the time it
+is blocked by the next stage;  the busiest stage is the bottleneck.  Stages
+that only apply to some items, e.g. serializing atlases that were not read
+from a cache, pass the other items on unchanged, and do not count them.
+"""
+import queue
+import threading
+import time
+
+DEFAULT_QUEUE_SIZE = 4
+
+# Marks the end of the items, and polling interval of blocked threads
+_END = object()
+_POLL_SECONDS = 0.1
+
+
+class Stage:
+    """
+    A Single Stage:  a Function Mapping Each Item to the Item of the Next
+    Stage.  With get_size, the stage also counts the bytes of its results.
+    With applies_to, items for which it is false skip the function, and are
+    passed on unchanged, and uncounted.
+    """
+
+    def __init__(self, name, function, get_size=None, applies_to=None):
+        self.name = name
+        self.function = function
+        self.get_size = get_size
+        self.applies_to = applies_to
+
+
+class StageCounter:
+    """
+    Throughput Counters of a Single Stage.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.num_items = 0
+        self.num_bytes = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    def get_stats(self):
+        """Get the Counters, with the Throughput while Busy."""
+        stats = {}
+        stats["name"] = self.name
+        stats["items"] = self.num_items
+        stats["bytes"] = self.num_bytes
+        stats["busy_seconds"] = self.busy_seconds
+        stats["wait_seconds"] = self.wait_seconds
+        stats["blocked_seconds"] = self.blocked_seconds
+        if self.busy_seconds > 0:
+            stats["items_per_second"] = self.num_items / self.busy_seconds
+            stats["bytes_per_second"] = self.num_bytes / self.busy_seconds
+        else:
+            stats["items_per_second"] = None
+            stats["bytes_per_second"] = None
+        return stats
+
+
+class Pipeline:
+    """
+    Runs Items from a Source through a Chain of Stages.
+    Without threads, each item goes through all stages before the next item
+    is pulled, e.g. so that stage profiles are not interleaved.
+    With source_counts, the source only counts items for which it is true.
+    """
+
+    def __init__(
+        self,
+        source_name,
+        stage_list,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        threaded=True,
+        source_counts=None,
+    ):
+        self.stage_list = stage_list
+        self.source_counts = source_counts
+        self.queue_size = queue_size
+        self.threaded = threaded
+        self.counter_list = [StageCounter(source_name)]
+        for stage in stage_list:
+            self.counter_list.append(StageCounter(stage.name))
+        self.stop_event = threading.Event()
+        self.error_list = []
+
+    def run(self, source):
+        """Pull all Items from the Source, and Pass them through all Stages."""
+        if not self.threaded or len(self.stage_list) == 0:
+            self.__run_serial(source)
+            return
+
+        queue_list = [queue.Queue(self.queue_size) for stage in self.stage_list]
+        thread_list = []
+        thread_list.append(
+            threading.Thread(
+                target=self.__run_source, args=(source, queue_list[0]), daemon=True
+            )
+        )
+        for i in range(len(self.stage_list) - 1):
+            thread_list.append(
+                threading.Thread(
+                    target=self.__run_stage,
+                    args=(i, queue_list[i], queue_list[i + 1]),
+                    daemon=True,
+                )
+            )
+        for thread in thread_list:
+            thread.start()
+        try:
+            self.__run_stage(len(self.stage_list) - 1, queue_list[-1], None)
+        finally:
+            # On errors, release threads blocked on full queues
+            self.stop_event.set()
+            for thread in thread_list:
+                thread.join()
+        if self.error_list:
+            raise self.error_list[0]
+
+    def get_stats(self):
+        """Get the Counters of the Source, and of Each Stage."""
+        return [counter.get_stats() for counter in self.counter_list]
+
+    def __run_serial(self, source):
+        """Pass Each Item through all Stages, in the Calling Thread."""
+        source_counter = self.counter_list[0]
+        source_iter = iter(source)
+        while True:
+            start = time.perf_counter()
+            item = next(source_iter, _END)
+            source_counter.busy_seconds += time.perf_counter() - start
+            if item is _END:
+                break
+            self.__count_source(source_counter, item)
+            for stage, counter in zip(self.stage_list, self.counter_list[1:]):
+                item = self.__apply(stage, counter, item)
+
+    def __run_source(self, source, out_queue):
+        """Pull Items from the Source, into the First Queue."""
+        counter = self.counter_list[0]
+        source_iter = iter(source)
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                item = next(source_iter, _END)
+                counter.busy_seconds += time.perf_counter() - start
+                if item is _END:
+                    break
+                self.__count_source(counter, item)
+                if not self.__put(counter, out_queue, item):
+                    return
+        except BaseException as e:
+            self.error_list.append(e)
+        finally:
+            # Shut down generators, e.g. with process pools, in this thread
+            close = getattr(source_iter, "close", None)
+            if close is not None:
+                close()
+        self.__put(counter, out_queue, _END)
+
+    def __run_stage(self, position, in_queue, out_queue):
+        """Pass Items from the Input Queue through a Stage."""
+        stage = self.stage_list[position]
+        counter = self.counter_list[position + 1]
+        try:
+            while True:
+                item = self.__get(counter, in_queue)
+                if item is _END:
+                    break
+                if self.error_list:
+                    # Drain the queue, so the stages before this one can end
+                    continue
+                result = self.__apply(stage, counter, item)
+                if out_queue is not None and not self.__put(counter, out_queue, result):
+                    return
+        except BaseException as e:
+            if out_queue is None:
+                raise
+            self.error_list.append(e)
+            self.stop_event.set()
+        if out_queue is not None:
+            self.__put(counter, out_queue, _END)
+
+    def __count_source(self, counter, item):
+        """Count an Item Pulled from the Source."""
+        if self.source_counts is None or self.source_counts(item):
+            counter.num_items += 1
+
+    def __apply(self, stage, counter, item):
+        """Apply a Stage to a Single Item, and Count it."""
+        if stage.applies_to is not None and not stage.applies_to(item):
+            return item
+        start = time.perf_counter()
+        result = stage.function(item)
+        counter.busy_seconds += time.perf_counter() - start
+        counter.num_items += 1
+        if stage.get_size is not None:
+            counter.num_bytes += stage.get_size(result)
+        return result
+
+    def __get(self, counter, in_queue):
+        """
+        Get an Item from a Queue, Waiting while the Queue is Empty.
+        Returns the end marker if the pipeline was stopped.
+        """
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    return in_queue.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if self.stop_event.is_set():
+                        return _END
+        finally:
+            counter.wait_seconds += time.perf_counter() - start
+
+    def __put(self, counter, out_queue, item):
+        """
+        Put an Item into a Bounded Queue, Waiting while the Queue is Full.
+        Returns False if the pipeline was stopped.
+        """
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    out_queue.put(item, timeout=_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    if self.stop_event.is_set():
+                        return False
+        finally:
+            counter.blocked_seconds += time.perf_counter() - start
@@ -0,0 +1,198 @@
+"""
+Opt-In, Per-Stage Timing and Memory Instrumentation.
+
+Code is instrumented with named stages:
+
+    with profiling.stage("generate_values", atlas=atlas_id, template=template_id):
+        ...
+
+By default, stages cost next to nothing.  Once a StageProfiler is activated,
+each stage records its wall time, CPU time and tracemalloc peak, which are
+rolled up per stage, per atlas and per template in the final report.
+"""
+import contextlib
+import json
+import time
+import tracemalloc
+
+# Fields of a single stage record
+NAME = 0
+ATLAS = 1
+TEMPLATE = 2
+WALL_SECONDS = 3
+CPU_SECONDS = 4
+PEAK_MEMORY_BYTES = 5
+
+_null_stage = contextlib.nullcontext()
+
+
+class NullProfiler:
+    """
+    Profiler that Records Nothing;  Active unless Profiling is Requested.
+    """
+
+    def stage(self, name, atlas=None, template=None):
+        """Enter a Stage, without Recording it."""
+        return _null_stage
+
+    def is_enabled(self):
+        """Check whether Stages are Recorded."""
+        return False
+
+    def pop_records(self):
+        """Get and Clear all Stage Records."""
+        return []
+
+    def add_records(self, record_list):
+        """Add Stage Records, e.g. from a Worker Process."""
+        pass
+
+
+class StageProfiler:
+    """
+    Profiler Recording Wall Time, CPU Time and Memory Peak of Each Stage.
+
+    Memory peaks are measured with tracemalloc, and reported as the increase
+    over the memory traced when the stage was entered.  Nested stages are
+    supported;  the peak of an outer stage includes the peaks of inner stages.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.record_list = []
+        self.frame_stack = []
+        self.started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def close(self):
+        """Stop Tracing Memory, if this Profiler Started it."""
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def is_enabled(self):
+        """Check whether Stages are Recorded."""
+        return True
+
+    @contextlib.contextmanager
+    def stage(self, name, atlas=None, template=None):
+        """Enter a Stage, and Record it on Exit."""
+        frame = self.__enter_frame()
+        try:
+            yield
+        finally:
+            self.__exit_frame(frame, name, atlas, template)
+
+    def pop_records(self):
+        """Get and Clear all Stage Records."""
+        record_list = self.record_list
+        self.record_list = []
+        return record_list
+
+    def add_records(self, record_list):
+        """Add Stage Records, e.g. from a Worker Process."""
+        self.record_list.extend(record_list)
+
+    def get_report(self):
+        """Get the Report, Rolled Up per Stage, per Atlas and per Template."""
+        return summarize(self.record_list)
+
+    def write_report(self, json_file):
+        """Write the Report as JSON."""
+        with open(json_file, "w") as out:
+            json.dump(self.get_report(), out, indent=4)
+
+    def __enter_frame(self):
+        """Start Measuring a Stage."""
+        current = 0
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if len(self.frame_stack) > 0:
+                parent = self.frame_stack[-1]
+                parent[2] = max(parent[2], peak)
+            _reset_peak()
+        frame = [time.perf_counter(), time.process_time(), current, current]
+        self.frame_stack.append(frame)
+        return frame
+
+    def __exit_frame(self, frame, name, atlas, template):
+        """Stop Measuring a Stage, and Record it."""
+        wall_seconds = time.perf_counter() - frame[0]
+        cpu_seconds = time.process_time() - frame[1]
+        self.frame_stack.pop()
+        peak_memory_bytes = 0
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = max(frame[2], tracemalloc.get_traced_memory()[1])
+            peak_memory_bytes = peak - frame[3]
+            if len(self.frame_stack) > 0:
+                parent = self.frame_stack[-1]
+                parent[2] = max(parent[2], peak)
+            _reset_peak()
+        self.record_list.append(
+            (name, atlas, template, wall_seconds, cpu_seconds, peak_memory_bytes)
+        )
+
+
+def summarize(record_list):
+    """Roll Up Stage Records per Stage, per Atlas and per Template."""
+    report = {}
+    report["stages"] = {}
+    report["atlases"] = {}
+    report["templates"] = {}
+    for record in record_list:
+        _add_record(report["stages"], record[NAME], record)
+        if record[ATLAS] is not None:
+            atlas_dict = report["atlases"].setdefault(record[ATLAS], {})
+            _add_record(atlas_dict, record[NAME], record)
+        if record[TEMPLATE] is not None:
+            template_dict = report["templates"].setdefault(record[TEMPLATE], {})
+            _add_record(template_dict, record[NAME], record)
+    return report
+
+
+def _add_record(stage_dict, name, record):
+    """Add a Single Stage Record to its Rollup."""
+    totals = stage_dict.get(name)
+    if totals is None:
+        totals = {}
+        totals["calls"] = 0
+        totals["wall_seconds"] = 0.0
+        totals["cpu_seconds"] = 0.0
+        totals["peak_memory_bytes"] = 0
+        stage_dict[name] = totals
+    totals["calls"] += 1
+    totals["wall_seconds"] += record[WALL_SECONDS]
+    totals["cpu_seconds"] += record[CPU_SECONDS]
+    totals["peak_memory_bytes"] = max(
+        totals["peak_memory_bytes"], record[PEAK_MEMORY_BYTES]
+    )
+
+
+def _reset_peak():
+    """Reset the tracemalloc Peak, where Supported (Python 3.9+)."""
+    reset_peak = getattr(tracemalloc, "reset_peak", None)
+    if reset_peak is not None:
+        reset_peak()
+
+
+_profiler = NullProfiler()
+
+
+def get_profiler():
+    """Get the Active Profiler."""
+    return _profiler
+
+
+def activate(profiler):
+    """Activate the Specified Profiler, and Return the Previous One."""
+    global _profiler
+    previous = _profiler
+    _profiler = profiler
+    return previous
+
+
+def stage(name, atlas=None, template=None):
+    """Enter a Stage of the Active Profiler."""
+    return _profiler.stage(name, atlas, template)
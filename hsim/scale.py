@@ -0,0 +1,193 @@
+"""
+Scale Parameters for Simulated HTAN Atlases.
+
+Scale parameters can be read from a JSON config file of the form:
+
+    {
+        "num_participants": 1000,
+        "samples_per_participant": {"min": 2, "max": 8},
+        "max_lineage_depth": 3,
+        "template_multipliers": {"bts:ScRNA-seqLevel1": 4}
+    }
+
+The number of samples per participant is either a fixed number, a
+"min-max" range drawn uniformly, or a weighted choice of the form
+{"choices": [2, 6], "weights": [3, 1]}.
+"""
+import json
+
+DEFAULT_NUM_PARTICIPANTS = 10
+DEFAULT_NUM_SAMPLES_PER_PARTICIPANT = 6
+
+
+class SampleDistribution:
+    """
+    Distribution of the Number of Samples per Participant.
+    """
+
+    def __init__(self, choice_list, weight_list=None):
+        choice_list = list(choice_list)
+        for choice in choice_list:
+            check_int("Sample count", choice)
+        if weight_list is not None:
+            if not isinstance(weight_list, list):
+                raise ValueError("Sample count weights must be a list.")
+            for weight in weight_list:
+                if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                    raise ValueError(
+                        "Sample count weights must be numbers, not %r." % (weight,)
+                    )
+        if len(choice_list) == 0:
+            raise ValueError("At least one sample count is required.")
+        if min(choice_list) < 0:
+            raise ValueError("Sample counts must not be negative.")
+        if weight_list is not None and len(weight_list) != len(choice_list):
+            raise ValueError("Need exactly one weight per sample count.")
+        self.choice_list = list(choice_list)
+        self.weight_list = None if weight_list is None else list(weight_list)
+
+    def is_fixed(self):
+        """Check whether every Participant has the same Number of Samples."""
+        return len(self.choice_list) == 1
+
+    def draw(self, rng):
+        """
+        Draw the Number of Samples of a Single Participant.
+        Fixed distributions never touch rng.
+        """
+        if self.is_fixed():
+            return self.choice_list[0]
+        if self.weight_list is None:
+            return self.choice_list[rng.randint(0, len(self.choice_list) - 1)]
+        return rng.choices(self.choice_list, self.weight_list)[0]
+
+    def get_max(self):
+        """Get the Largest Possible Number of Samples."""
+        return max(self.choice_list)
+
+    def to_spec(self):
+        """Get the JSON-Compatible Spec of this Distribution."""
+        if self.is_fixed():
+            return self.choice_list[0]
+        if self.weight_list is None:
+            return {"choices": self.choice_list}
+        return {"choices": self.choice_list, "weights": self.weight_list}
+
+    @staticmethod
+    def parse(spec):
+        """
+        Parse a Distribution Spec:  a number, a "min-max" range,
+        or a dictionary with min / max or choices / weights.
+        """
+        if isinstance(spec, bool):
+            raise ValueError("Invalid samples per participant:  %s" % spec)
+        if isinstance(spec, int):
+            return SampleDistribution([spec])
+        if isinstance(spec, str):
+            part_list = spec.split("-")
+            try:
+                bound_list = [int(part) for part in part_list]
+            except ValueError:
+                raise ValueError("Invalid samples per participant:  %s" % spec)
+            if len(bound_list) == 1:
+                return SampleDistribution(bound_list)
+            if len(bound_list) == 2 and bound_list[0] <= bound_list[1]:
+                return SampleDistribution(range(bound_list[0], bound_list[1] + 1))
+            raise ValueError("Invalid samples per participant:  %s" % spec)
+        if isinstance(spec, dict):
+            if "choices" in spec:
+                if not isinstance(spec["choices"], list):
+                    raise ValueError("Sample count choices must be a list.")
+                return SampleDistribution(spec["choices"], spec.get("weights"))
+            if "min" in spec and "max" in spec:
+                check_int("Minimum sample count", spec["min"])
+                check_int("Maximum sample count", spec["max"])
+            if "min" in spec and "max" in spec and spec["min"] <= spec["max"]:
+                return SampleDistribution(range(spec["min"], spec["max"] + 1))
+        raise ValueError("Invalid samples per participant:  %s" % spec)
+
+
+class ScaleParams:
+    """
+    Scale Parameters of a Simulated Atlas.
+    """
+
+    def __init__(
+        self,
+        num_participants=DEFAULT_NUM_PARTICIPANTS,
+        samples_per_participant=DEFAULT_NUM_SAMPLES_PER_PARTICIPANT,
+        max_lineage_depth=None,
+        template_multipliers=None,
+    ):
+        check_int("Number of participants", num_participants)
+        if num_participants < 0:
+            raise ValueError("Number of participants must not be negative.")
+        if max_lineage_depth is not None:
+            check_int("Maximum lineage depth", max_lineage_depth)
+        if max_lineage_depth is not None and max_lineage_depth < 1:
+            raise ValueError("Maximum lineage depth must be at least 1.")
+        self.num_participants = num_participants
+        if isinstance(samples_per_participant, SampleDistribution):
+            self.sample_distribution = samples_per_participant
+        else:
+            self.sample_distribution = SampleDistribution.parse(
+                samples_per_participant
+            )
+        self.max_lineage_depth = max_lineage_depth
+        if template_multipliers is not None and not isinstance(
+            template_multipliers, dict
+        ):
+            raise ValueError("Template multipliers must be a dictionary.")
+        self.template_multipliers = dict(template_multipliers or {})
+        for template_id, multiplier in self.template_multipliers.items():
+            check_int("Multiplier for %s" % template_id, multiplier)
+            if multiplier < 0:
+                raise ValueError("Invalid multiplier for %s." % template_id)
+
+    def get_multiplier(self, template_id):
+        """Get the Record Multiplier of the Specified Template."""
+        return self.template_multipliers.get(template_id, 1)
+
+    def to_dict(self):
+        """Get the JSON-Compatible Dictionary of these Parameters."""
+        params = {}
+        params["num_participants"] = self.num_participants
+        params["samples_per_participant"] = self.sample_distribution.to_spec()
+        params["max_lineage_depth"] = self.max_lineage_depth
+        params["template_multipliers"] = dict(sorted(self.template_multipliers.items()))
+        return params
+
+    @staticmethod
+    def from_dict(params):
+        """Create Scale Parameters from a Dictionary."""
+        if not isinstance(params, dict):
+            raise ValueError("Scale parameters must be a dictionary.")
+        unknown_key_list = sorted(set(params) - set(_PARAM_KEY_LIST))
+        if len(unknown_key_list) > 0:
+            raise ValueError("Unknown scale parameters:  %s" % ", ".join(unknown_key_list))
+        return ScaleParams(
+            params.get("num_participants", DEFAULT_NUM_PARTICIPANTS),
+            params.get("samples_per_participant", DEFAULT_NUM_SAMPLES_PER_PARTICIPANT),
+            params.get("max_lineage_depth"),
+            params.get("template_multipliers"),
+        )
+
+
+_PARAM_KEY_LIST = [
+    "num_participants",
+    "samples_per_participant",
+    "max_lineage_depth",
+    "template_multipliers",
+]
+
+
+def check_int(name, value):
+    """Check that a Value is an Integer;  booleans are not."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError("%s must be an integer, not %r." % (name, value))
+
+
+def load_scale_config(config_file):
+    """Load Scale Parameters from a JSON Config File."""
+    with open(config_file, "r") as fd:
+        return ScaleParams.from_dict(json.load(fd))
@@ -1,6 +1,14 @@
+from collections import namedtuple
 from pathlib import Path
+import hashlib
 import json
 import random
+from hsim import constants
+from hsim import json_backend
+
+# NumPy is optional, and slow to import;  see import_numpy
+numpy = None
+_numpy_imported = False
 
 """
 Utility Functions for Processing the HTAN JSON-D Schema
@@ -20,17 +28,95 @@ class SchemaObject:
         self.option_list = option_list
 
 
-def load_htan_schema():
+class ColumnPlan(
+    namedtuple(
+        "ColumnPlan", ["id", "display_name", "description", "kind", "option_list"]
+    )
+):
+    """Compiled, Immutable Plan for Generating a Single Template Column."""
+
+    __slots__ = ()
+
+    NUMERIC = "numeric"
+    LIST = "list"
+    LOREM_IPSUM = "lorem_ipsum"
+    HTAN_ID = "htan_id"
+    PARENT_ID = "parent_id"
+    TEMPLATE_ID = "template_id"
+
+
+class TemplatePlan(
+    namedtuple("TemplatePlan", ["template_id", "label", "column_list"])
+):
+    """Compiled, Immutable Plan for Generating Records of a Single Template."""
+
+    __slots__ = ()
+
+
+class HtanSchema(dict):
+    """
+    HTAN JSON-D Schema, indexed by @id.
+    Remembers the hash of the content it was loaded from,
+    so that compiled template plans can be cached per schema.
+    """
+
+    def __init__(self, content_hash):
+        super().__init__()
+        self.content_hash = content_hash
+
+
+# String Fields that are Filled in from IDs, rather than Simulated
+SPECIAL_ROLE_DICT = {
+    "bts:HTANParticipantID": ColumnPlan.HTAN_ID,
+    "bts:HTANBiospecimenID": ColumnPlan.HTAN_ID,
+    "bts:HTANParentBiospecimenID": ColumnPlan.HTAN_ID,
+    "bts:HTANParentID": ColumnPlan.PARENT_ID,
+    "bts:Component": ColumnPlan.TEMPLATE_ID,
+}
+
+# Compiled Template Plans, keyed by (schema content hash, template id)
+_template_plan_cache = {}
+
+# Content hashes of plain dict schemas, keyed by id();  each entry also holds
+# the schema, so that its id cannot be reused while the entry exists
+_schema_hash_cache = {}
+_MAX_SCHEMA_HASHES = 8
+
+SCHEMA_PATH = constants.SCHEMA_PATH
+
+
+def load_htan_schema(schema_path=SCHEMA_PATH):
     """Load the HTAN JSON-D Schema into Dictionary."""
-    txt = Path("schema/HTAN.jsonld").read_text()
-    schema = json.loads(txt)
-    schema_dict = {}
+    raw = Path(schema_path).read_bytes()
+    schema = json_backend.loads(raw)
+    schema_dict = HtanSchema(hashlib.sha256(raw).hexdigest())
     for x in schema["@graph"]:
         id = x["@id"]
         schema_dict[id] = x
     return schema_dict
 
 
+def get_schema_hash(schema_dict):
+    """
+    Get the Content Hash of the Specified Schema Dictionary.
+    The hash of a plain dict is computed once, and remembered, so a plain
+    dict schema must not change after first use, just like an HtanSchema.
+    """
+    content_hash = getattr(schema_dict, "content_hash", None)
+    if content_hash is not None:
+        return content_hash
+    entry = _schema_hash_cache.get(id(schema_dict))
+    if entry is not None and entry[0] is schema_dict:
+        return entry[1]
+    txt = json.dumps(schema_dict, sort_keys=True)
+    content_hash = hashlib.sha256(txt.encode("utf-8")).hexdigest()
+    if len(_schema_hash_cache) >= _MAX_SCHEMA_HASHES:
+        # Forget the oldest schema
+        del _schema_hash_cache[next(iter(_schema_hash_cache))]
+    _schema_hash_cache[id(schema_dict)] = (schema_dict, content_hash)
+    return content_hash
+
+
 def extract_object_details(schema_dict, target_id):
     """Extract Schema Details Regarding the Specified Object."""
 
@@ -109,28 +195,174 @@ def generate_simulated_data(schema_object, template_id, htan_id, parent_id=None)
         return schema_object.option_list[random_index]
 
 
+def compile_column_plan(schema_object):
+    """Compile the Column Plan for the Specified Schema Object."""
+    inferred_data_type = schema_object.inferred_data_type
+    if inferred_data_type == SchemaObject.NUMERIC:
+        kind = ColumnPlan.NUMERIC
+    elif inferred_data_type == SchemaObject.STRING:
+        kind = SPECIAL_ROLE_DICT.get(schema_object.id, ColumnPlan.LOREM_IPSUM)
+    else:
+        kind = ColumnPlan.LIST
+    return ColumnPlan(
+        schema_object.id,
+        schema_object.display_name,
+        schema_object.comment,
+        kind,
+        tuple(schema_object.option_list),
+    )
+
+
+def compile_template_plan(schema_dict, template_id):
+    """Compile the Template Plan for the Specified Template."""
+    object_list = extract_template(schema_dict, template_id)
+    column_list = tuple(
+        compile_column_plan(schema_object) for schema_object in object_list
+    )
+    return TemplatePlan(template_id, get_label(schema_dict, template_id), column_list)
+
+
+def get_template_plan(schema_dict, template_id):
+    """Get the Compiled Template Plan, compiling it on First Use."""
+    key = (get_schema_hash(schema_dict), template_id)
+    template_plan = _template_plan_cache.get(key)
+    if template_plan is None:
+        template_plan = compile_template_plan(schema_dict, template_id)
+        _template_plan_cache[key] = template_plan
+    return template_plan
+
+
+def clear_template_plan_cache():
+    """Clear all Compiled Template Plans, and Hashes of Plain Dict Schemas."""
+    _template_plan_cache.clear()
+    _schema_hash_cache.clear()
+
+
+def generate_plan_record(template_plan, htan_id, parent_id=None, rng=random):
+    """
+    Generate a Simulated Record from the Compiled Template Plan.
+    Draws from rng in exactly the same order as generate_simulated_data,
+    so seeded output is unchanged.
+    """
+    template_id = template_plan.template_id
+    value_list = []
+    for column in template_plan.column_list:
+        kind = column.kind
+        if kind == ColumnPlan.NUMERIC:
+            value_list.append(rng.randint(0, 100))
+        elif kind == ColumnPlan.LIST:
+            option_list = column.option_list
+            value_list.append(option_list[rng.randint(0, len(option_list) - 1)])
+        elif kind == ColumnPlan.LOREM_IPSUM:
+            value_list.append("lorem_ipsum_%d" % rng.randint(0, 100000))
+        elif kind == ColumnPlan.HTAN_ID:
+            value_list.append(htan_id)
+        elif kind == ColumnPlan.PARENT_ID:
+            value_list.append(parent_id)
+        else:
+            value_list.append(template_id)
+    return value_list
+
+
+def import_numpy():
+    """Import NumPy on First Use;  returns None if it is not installed."""
+    global numpy, _numpy_imported
+    if not _numpy_imported:
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover
+            numpy = None
+        _numpy_imported = True
+    return numpy
+
+
+def get_numpy_rng(seed):
+    """Get a Seeded NumPy Random Number Generator, for Batch Generation."""
+    if import_numpy() is None:
+        raise RuntimeError(
+            "Batch generation requires NumPy, which is not installed;  "
+            "run pip install 'hsim[vectorize]'."
+        )
+    return numpy.random.default_rng(seed)
+
+
+def generate_plan_columns(template_plan, htan_id_list, parent_id_list, np_rng):
+    """
+    Generate Whole Columns of Simulated Data from the Compiled Template Plan.
+    Numeric and option columns are drawn as NumPy integer arrays, and
+    lorem ipsum strings are looked up in a preformatted table.
+    """
+    import_numpy()
+    num_records = len(htan_id_list)
+    column_list = []
+    for column in template_plan.column_list:
+        kind = column.kind
+        if kind == ColumnPlan.NUMERIC:
+            value_array = np_rng.integers(0, 101, num_records)
+            column_list.append(value_array.tolist())
+        elif kind == ColumnPlan.LIST:
+            option_array = numpy.empty(len(column.option_list), dtype=object)
+            option_array[:] = column.option_list
+            index_array = np_rng.integers(0, len(column.option_list), num_records)
+            column_list.append(option_array[index_array].tolist())
+        elif kind == ColumnPlan.LOREM_IPSUM:
+            index_array = np_rng.integers(0, 100001, num_records)
+            column_list.append(_get_lorem_ipsum_array()[index_array].tolist())
+        elif kind == ColumnPlan.HTAN_ID:
+            column_list.append(htan_id_list)
+        elif kind == ColumnPlan.PARENT_ID:
+            column_list.append(parent_id_list)
+        else:
+            column_list.append([template_plan.template_id] * num_records)
+    return column_list
+
+
+def generate_plan_records(template_plan, htan_id_list, parent_id_list, np_rng):
+    """
+    Generate Simulated Records from the Compiled Template Plan, a Column at a Time.
+    parent_id_list may be None, if the template has no parent ID column.
+    """
+    if parent_id_list is None:
+        parent_id_list = [None] * len(htan_id_list)
+    column_list = generate_plan_columns(
+        template_plan, htan_id_list, parent_id_list, np_rng
+    )
+    if len(column_list) == 0:
+        return [[] for htan_id in htan_id_list]
+    return list(map(list, zip(*column_list)))
+
+
+_lorem_ipsum_array = None
+
+
+def _get_lorem_ipsum_array():
+    """Get the Table of all Preformatted Lorem Ipsum Strings."""
+    global _lorem_ipsum_array
+    if _lorem_ipsum_array is None:
+        import_numpy()
+        lorem_ipsum_array = numpy.empty(100001, dtype=object)
+        lorem_ipsum_array[:] = ["lorem_ipsum_%d" % x for x in range(100001)]
+        _lorem_ipsum_array = lorem_ipsum_array
+    return _lorem_ipsum_array
+
+
 def get_front_end_schema(schema_dict, target_id):
     """Get Front-End Schema Object for the Specified Template."""
-    object_list = extract_template(schema_dict, target_id)
+    template_plan = get_template_plan(schema_dict, target_id)
     field_list = []
-    for schema_object in object_list:
+    for column in template_plan.column_list:
         field = {}
-        field["id"] = schema_object.id
-        field["display_name"] = schema_object.display_name
-        field["description"] = schema_object.comment
+        field["id"] = column.id
+        field["display_name"] = column.display_name
+        field["description"] = column.description
         field_list.append(field)
     return field_list
 
 
 def get_front_end_simulated_values(schema_dict, template_id, htan_id, parent_id=None):
     """Get Front-End Simulated Data for the Specified Template."""
-    object_list = extract_template(schema_dict, template_id)
-    value_list = []
-    for schema_object in object_list:
-        value_list.append(
-            generate_simulated_data(schema_object, template_id, htan_id, parent_id)
-        )
-    return value_list
+    template_plan = get_template_plan(schema_dict, template_id)
+    return generate_plan_record(template_plan, htan_id, parent_id)
 
 
 def get_label(schema_dict, target_id):
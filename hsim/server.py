@@ -0,0 +1,259 @@
+"""
+Long-Lived HTTP Server, Generating Simulated Atlases on Request.
+
+The schema is loaded, and all templates are compiled, once at start-up.
+Atlases are generated from (atlas ID, seed, scale parameters), and are
+identical to the atlases of 'hsim generate' with the same seed and scale.
+Recently generated atlases are kept in a bounded LRU cache.
+
+    GET /schemas                        the root schemas node
+    GET /atlases/HTA3?seed=42           a single atlas
+    GET /atlases/HTA3/Biospecimen       a single template of an atlas
+    GET /stats                          cache statistics
+
+Atlases accept the query parameters seed, participants,
+samples_per_participant, max_lineage_depth, template_multiplier (repeated,
+as template_id=multiplier), vectorize and indent.
+
+Requests are handled in threads, so cached atlases are served while other
+atlases are being generated.  Errors are sent as JSON, {"error": message},
+with status 400 for invalid requests, and 500 for unexpected errors, which are
+also logged with their traceback.
+"""
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+import json
+import threading
+import traceback
+import click
+from hsim import cli
+from hsim import constants
+from hsim import json_backend
+from hsim import schema_util
+
+DEFAULT_CACHE_SIZE = constants.DEFAULT_CACHE_SIZE
+
+
+class AtlasCache:
+    """
+    Thread-Safe LRU Cache of Generated Atlases.
+    Concurrent requests for the same atlas generate it only once.
+    """
+
+    def __init__(self, max_atlases=DEFAULT_CACHE_SIZE):
+        self.max_atlases = max_atlases
+        self.atlas_dict = OrderedDict()
+        self.in_flight_dict = {}
+        self.lock = threading.Lock()
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+
+    def get(self, key, generate):
+        """
+        Get the Cached Atlas, or Generate it by Calling generate().
+        """
+        while True:
+            with self.lock:
+                atlas = self.atlas_dict.get(key)
+                if atlas is not None:
+                    self.atlas_dict.move_to_end(key)
+                    self.num_hits += 1
+                    return atlas
+                event = self.in_flight_dict.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self.in_flight_dict[key] = event
+                    self.num_misses += 1
+                    break
+
+            # Another request is generating this atlas;  wait, and look again
+            event.wait()
+
+        try:
+            atlas = generate()
+            with self.lock:
+                self.atlas_dict[key] = atlas
+                while len(self.atlas_dict) > self.max_atlases:
+                    self.atlas_dict.popitem(last=False)
+                    self.num_evictions += 1
+        finally:
+            with self.lock:
+                del self.in_flight_dict[key]
+            event.set()
+        return atlas
+
+    def get_stats(self):
+        """Get the Cache Statistics."""
+        with self.lock:
+            stats = {}
+            stats["max_atlases"] = self.max_atlases
+            stats["num_atlases"] = len(self.atlas_dict)
+            stats["hits"] = self.num_hits
+            stats["misses"] = self.num_misses
+            stats["evictions"] = self.num_evictions
+            return stats
+
+
+class AtlasService:
+    """
+    Warm Generation State, Shared by all Requests.
+    """
+
+    def __init__(self, schema_dict, template_list, cache_size=DEFAULT_CACHE_SIZE):
+        self.schema_dict = schema_dict
+        self.template_list = template_list
+        self.cache = AtlasCache(cache_size)
+
+        # Compile all templates, and the schemas node, ahead of the first request
+        for template in template_list:
+            schema_util.get_template_plan(schema_dict, template[0])
+        data_set = {}
+        cli.generate_schemas_node(schema_dict, template_list, data_set)
+        self.schemas = data_set["schemas"]
+
+    def get_atlas(self, atlas_id, query_dict):
+        """
+        Get a Single Atlas, Generated from the Seed and Scale in the Query.
+        Raises ValueError if the query is invalid.
+        """
+        seed = get_int_param(query_dict, "seed", 0)
+        vectorize = get_int_param(query_dict, "vectorize", 0) != 0
+        if vectorize and schema_util.import_numpy() is None:
+            raise ValueError(
+                "vectorize requires NumPy, which is not installed;  "
+                "run pip install 'hsim[vectorize]'."
+            )
+        max_lineage_depth = get_int_param(query_dict, "max_lineage_depth", None)
+        participants = get_int_param(query_dict, "participants", None)
+        samples_per_participant = query_dict.get("samples_per_participant", [None])[-1]
+        try:
+            scale_params = cli.get_scale_params(
+                self.template_list,
+                None,
+                participants,
+                samples_per_participant,
+                max_lineage_depth,
+                query_dict.get("template_multiplier", []),
+            )
+        except click.BadParameter as e:
+            raise ValueError(e.message)
+
+        key = (
+            atlas_id,
+            seed,
+            json.dumps(scale_params.to_dict(), sort_keys=True),
+            vectorize,
+        )
+        target_atlas = [atlas_id, get_atlas_name(atlas_id)]
+        return self.cache.get(
+            key,
+            lambda: cli.generate_seeded_atlas(
+                target_atlas,
+                seed,
+                self.schema_dict,
+                self.template_list,
+                scale_params,
+                vectorize,
+            ),
+        )
+
+
+class AtlasRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles a Single HTTP Request.
+    """
+
+    # Set by make_server
+    service = None
+
+    def do_GET(self):
+        """Route a GET Request."""
+        url = urlsplit(self.path)
+        part_list = [unquote(part) for part in url.path.split("/") if part]
+        query_dict = parse_qs(url.query)
+        try:
+            indent = get_int_param(query_dict, "indent", None)
+            if part_list == ["schemas"]:
+                self.__send_json(self.service.schemas, indent)
+            elif part_list == ["stats"]:
+                self.__send_json(self.service.cache.get_stats(), indent)
+            elif len(part_list) == 2 and part_list[0] == "atlases":
+                atlas = self.service.get_atlas(part_list[1], query_dict)
+                self.__send_json(atlas, indent)
+            elif len(part_list) == 3 and part_list[0] == "atlases":
+                atlas = self.service.get_atlas(part_list[1], query_dict)
+                template_data = atlas.get(part_list[2])
+                if not isinstance(template_data, dict):
+                    self.__send_error(404, "No template %s." % part_list[2])
+                else:
+                    self.__send_json(template_data, indent)
+            else:
+                self.__send_error(404, "Not found:  %s" % url.path)
+        except ValueError as e:
+            self.__send_error(400, str(e))
+        except Exception as e:
+            self.log_error("Error handling %s:\n%s", self.path, traceback.format_exc())
+            self.__send_error(500, "Internal server error:  %s" % type(e).__name__)
+
+    def log_message(self, format, *args):
+        """Log Requests only if the Server is Verbose."""
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def log_error(self, format, *args):
+        """Log Errors, even if the Server is not Verbose."""
+        BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def __send_json(self, value, indent=None):
+        """Send a JSON Response."""
+        body = json_backend.dumps(value, indent)
+        self.__send(200, body.encode("utf-8"))
+
+    def __send_error(self, status, message):
+        """Send a JSON Error Response."""
+        self.__send(status, json.dumps({"error": message}).encode("utf-8"))
+
+    def __send(self, status, body):
+        """Send a Response."""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(service, host="127.0.0.1", port=8000, verbose=False):
+    """
+    Make the HTTP Server;  call serve_forever to handle requests.
+    With port 0, a free port is picked;  see server.server_address.
+    """
+    handler_class = type(
+        "BoundAtlasRequestHandler", (AtlasRequestHandler,), {"service": service}
+    )
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+
+def get_atlas_name(atlas_id):
+    """Get the Name of an Atlas, as Named by 'hsim generate'."""
+    if atlas_id.startswith("HTA"):
+        return "HTAN Atlas %s" % atlas_id[3:]
+    return "HTAN Atlas %s" % atlas_id
+
+
+def get_int_param(query_dict, name, default):
+    """Get an Integer Query Parameter;  the last one wins if repeated."""
+    value_list = query_dict.get(name)
+    if not value_list:
+        return default
+    try:
+        return int(value_list[-1])
+    except ValueError:
+        raise ValueError("Invalid %s:  %s" % (name, value_list[-1]))
@@ -0,0 +1,281 @@
+"""
+Sharded Output, Described by a Manifest.
+
+A sharded data set splits the atlases across several shard files, which can be
+written and read in parallel.  Next to the manifest, e.g. sim.json, it holds:
+
+    sim.schemas.json        the shared schemas node, written once
+    sim.shard-00000.json    {"atlases": [...]}
+    sim.shard-00001.json    ...
+
+The manifest lists each file with its SHA-256 checksum and size, and each shard
+with its atlas IDs and record count.  Shard and schema paths are relative to
+the directory of the manifest.  The manifest is written last, once every shard
+is complete.
+
+With compression, all files are compressed, and shard and schema file names
+keep the compression extension of the manifest, e.g. sim.shard-00000.json.gz.
+Checksums and sizes are those of the compressed files.
+"""
+import hashlib
+import io
+import json
+from pathlib import Path
+from hsim import compression
+from hsim import json_backend
+from hsim import json_stream
+from hsim import json_writer
+
+MANIFEST_FORMAT = 1
+
+
+class ManifestError(ValueError):
+    """
+    Raised when a Manifest cannot be Read.
+    """
+
+    pass
+
+
+class ChecksumFile:
+    """
+    Binary File Wrapper, Computing the SHA-256 Checksum and Size of All Data
+    Read from or Written to the File.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.sha256 = hashlib.sha256()
+        self.num_bytes = 0
+
+    def read(self, size=-1):
+        """Read from the File."""
+        data = self.fd.read(size)
+        self.sha256.update(data)
+        self.num_bytes += len(data)
+        return data
+
+    def write(self, data):
+        """Write to the File."""
+        self.sha256.update(data)
+        self.num_bytes += len(data)
+        return self.fd.write(data)
+
+    def get_checksum(self):
+        """Get the Hex Digest of all Data so far."""
+        return self.sha256.hexdigest()
+
+
+class ShardedJsonWriter:
+    """
+    Writer for Sharded Data Sets, with the Interface of HtanJsonWriter.
+
+    With atlases_per_shard, each shard holds at most that many atlases.
+    With max_shard_bytes, a new shard is started once the current shard has
+    reached that size before compression, so a shard exceeds it by at most
+    one atlas.
+    """
+
+    def __init__(
+        self,
+        manifest_path,
+        atlases_per_shard=None,
+        max_shard_bytes=None,
+        indent=4,
+        compression_type=None,
+    ):
+        self.manifest_path = Path(manifest_path)
+        self.atlases_per_shard = atlases_per_shard
+        self.max_shard_bytes = max_shard_bytes
+        self.indent = indent
+        self.compression_type = compression.get_compression(
+            manifest_path, compression_type
+        )
+        self.shard_list = []
+        self.fd = None
+        self.checksum_file = None
+        self.out = None
+        self.writer = None
+
+    def write_atlas(self, atlas):
+        """
+        Write a Single Atlas to the Current Shard.
+        """
+        if self.writer is not None and self.__is_shard_full():
+            self.__close_shard()
+        if self.writer is None:
+            self.__open_shard()
+        self.writer.write_atlas(atlas)
+        shard = self.shard_list[-1]
+        shard["atlases"].append(atlas["htan_id"])
+        shard["num_records"] += count_records(atlas)
+
+    def serialize_atlas(self, atlas):
+        """
+        Serialize a Single Atlas into a Fragment, without Writing it.
+        """
+        serializer = json_writer.HtanJsonWriter(io.BytesIO(), self.indent)
+        return serializer.serialize_atlas(atlas)
+
+    def write_fragment(self, fragment):
+        """
+        Write a Single Serialized Atlas to the Current Shard.
+        """
+        if self.writer is not None and self.__is_shard_full():
+            self.__close_shard()
+        if self.writer is None:
+            self.__open_shard()
+        self.writer.write_fragment(fragment)
+        shard = self.shard_list[-1]
+        shard["atlases"].append(fragment.htan_id)
+        shard["num_records"] += fragment.get_num_records()
+
+    def write_schemas(self, schema_list):
+        """
+        Write the Schemas Node, and Complete the Data Set with its Manifest.
+        """
+        if self.writer is not None:
+            self.__close_shard()
+        schemas_path = get_schemas_path(self.manifest_path)
+        self.__open_file(schemas_path)
+        self.writer.write_schemas(schema_list)
+        checksum_file = self.__close_file()
+        schemas = {}
+        schemas["path"] = schemas_path.name
+        schemas["bytes"] = checksum_file.num_bytes
+        schemas["sha256"] = checksum_file.get_checksum()
+
+        manifest = {}
+        manifest["manifest_format"] = MANIFEST_FORMAT
+        manifest["num_atlases"] = sum(len(shard["atlases"]) for shard in self.shard_list)
+        manifest["num_records"] = sum(shard["num_records"] for shard in self.shard_list)
+        manifest["schemas"] = schemas
+        manifest["shards"] = self.shard_list
+        with compression.open_output(self.manifest_path, self.compression_type) as out:
+            out.write(json.dumps(manifest, indent=4).encode("utf-8"))
+
+    def __is_shard_full(self):
+        """
+        Check whether the Current Shard is Full.
+        """
+        shard = self.shard_list[-1]
+        if self.atlases_per_shard is not None:
+            if len(shard["atlases"]) >= self.atlases_per_shard:
+                return True
+        if self.max_shard_bytes is not None:
+            if self.out.num_bytes >= self.max_shard_bytes:
+                return True
+        return False
+
+    def __open_shard(self):
+        """
+        Start the Next Shard.
+        """
+        shard_path = get_shard_path(self.manifest_path, len(self.shard_list))
+        self.__open_file(shard_path)
+        shard = {}
+        shard["path"] = shard_path.name
+        shard["atlases"] = []
+        shard["num_records"] = 0
+        self.shard_list.append(shard)
+
+    def __close_shard(self):
+        """
+        Complete the Current Shard, and Record its Size and Checksum.
+        """
+        self.writer.close()
+        checksum_file = self.__close_file()
+        shard = self.shard_list[-1]
+        shard["bytes"] = checksum_file.num_bytes
+        shard["sha256"] = checksum_file.get_checksum()
+
+    def __open_file(self, path):
+        """
+        Open a Shard or Schemas File, Compressed and with a Checksum.
+        """
+        self.fd = open(path, "wb")
+        self.checksum_file = ChecksumFile(self.fd)
+        if self.compression_type == compression.NONE:
+            self.out = self.checksum_file
+        else:
+            self.out = compression.CompressedOutput(
+                self.checksum_file, self.compression_type
+            )
+        self.writer = json_writer.HtanJsonWriter(self.out, self.indent)
+
+    def __close_file(self):
+        """
+        Close the Current File, and Return its Checksum File.
+        """
+        if self.out is not self.checksum_file:
+            self.out.close()
+        self.fd.close()
+        checksum_file = self.checksum_file
+        self.fd = None
+        self.checksum_file = None
+        self.out = None
+        self.writer = None
+        return checksum_file
+
+
+def get_shard_path(manifest_path, shard_number):
+    """Get the Path of a Shard, Next to the Manifest."""
+    return _get_sibling_path(manifest_path, "shard-%05d" % shard_number)
+
+
+def get_schemas_path(manifest_path):
+    """Get the Path of the Shared Schemas, Next to the Manifest."""
+    return _get_sibling_path(manifest_path, "schemas")
+
+
+def _get_sibling_path(manifest_path, part):
+    """Insert a Part into the Name of the Manifest, before its Extensions."""
+    manifest_path = Path(manifest_path)
+    base_name, extension = compression.split_extension(manifest_path.name)
+    base_path = Path(base_name)
+    return manifest_path.with_name(
+        "%s.%s%s%s" % (base_path.stem, part, base_path.suffix, extension)
+    )
+
+
+def get_atlases_per_shard(num_atlases, num_shards):
+    """Get the Number of Atlases per Shard, to Spread Atlases over num_shards."""
+    return max(1, -(-num_atlases // num_shards))
+
+
+def count_records(atlas):
+    """Count all Records of a Single Atlas."""
+    num_records = 0
+    for value in atlas.values():
+        if isinstance(value, dict):
+            num_records += len(value["record_list"])
+    return num_records
+
+
+def read_manifest(json_file):
+    """
+    Read the Manifest, if the File is a Manifest.
+    Only the first key is parsed to tell manifests from data sets,
+    so large data sets are not read into memory.  Returns None otherwise.
+    """
+    with compression.open_input(json_file) as fd:
+        stream_reader = json_stream.JsonStreamReader(fd, chunk_size=4096)
+        try:
+            first_key = next(stream_reader.iter_keys(), None)
+        except ValueError:
+            return None
+        if first_key != "manifest_format":
+            return None
+    with compression.open_input(json_file) as fd:
+        manifest = json_backend.load(fd)
+    if manifest["manifest_format"] != MANIFEST_FORMAT:
+        raise ManifestError(
+            "Unsupported manifest format %s in %s."
+            % (manifest["manifest_format"], json_file)
+        )
+    return manifest
+
+
+def resolve_path(manifest_path, relative_path):
+    """Resolve a Path Listed in the Manifest."""
+    return Path(manifest_path).parent / relative_path
@@ -0,0 +1,351 @@
+"""
+Bulk Export of Simulated Atlases to an Indexed SQLite Database.
+
+Each template of the schemas node becomes a single table, named after its
+label, with an atlas_id column followed by one column per attribute, named
+after the attribute ID without its "bts:" prefix.  Templates listed more than
+once get a single table, and attributes listed more than once get numbered
+columns, e.g. GermlineVariantsWorkflowType_2.  Columns are untyped, so values
+keep their JSON types;  lists and objects are stored as JSON text.  Two more
+tables describe the data set:
+
+    hsim_atlases        atlas_id, atlas_name, in file order
+    hsim_attributes     data_schema, position, column_name, id, display_name,
+                        description
+
+The database is written from scratch, to a temporary file that is renamed
+once complete, so the journal and syncs are turned off.  Rows are inserted
+with executemany, in batches, within large transactions.  Indexes on the
+atlas ID, and on the HTAN participant, biospecimen and parent ID columns,
+are built once all rows are loaded, which is much faster than maintaining
+them while loading.  Links can then be checked with indexed joins;  see
+get_link_errors.
+"""
+from pathlib import Path
+import json
+import os
+import sqlite3
+
+ATLAS_ID_COLUMN = "atlas_id"
+ATLAS_TABLE = "hsim_atlases"
+ATTRIBUTE_TABLE = "hsim_attributes"
+
+# Rows per executemany call, and per transaction
+BATCH_SIZE = 10000
+TRANSACTION_ROWS = 1000000
+
+# Columns indexed after loading, with the atlas ID
+INDEXED_COLUMN_LIST = [
+    "HTANParticipantID",
+    "HTANBiospecimenID",
+    "HTANParentID",
+    "HTANParentBiospecimenID",
+]
+
+# The database is written from scratch, and renamed once complete
+PRAGMA_LIST = [
+    "PRAGMA page_size = 65536",
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+]
+
+
+class SqliteTable:
+    """
+    A Single Template Table, with its Rows Waiting to be Inserted.
+    """
+
+    def __init__(self, label, column_name_list):
+        self.label = label
+        self.column_name_list = column_name_list
+        self.num_rows = 0
+        self.pending_row_list = []
+        self.insert_sql = "INSERT INTO %s VALUES (%s)" % (
+            quote(label),
+            ", ".join(["?"] * (len(column_name_list) + 1)),
+        )
+
+    def get_create_sql(self):
+        """Get the Statement Creating the Table."""
+        column_list = [quote(ATLAS_ID_COLUMN)]
+        column_list.extend(quote(name) for name in self.column_name_list)
+        return "CREATE TABLE %s (%s)" % (quote(self.label), ", ".join(column_list))
+
+    def get_index_sql_list(self):
+        """Get the Statements Creating the Indexes of the Table."""
+        sql_list = []
+        sql_list.append(
+            "CREATE INDEX %s ON %s (%s)"
+            % (
+                quote("%s_%s_idx" % (self.label, ATLAS_ID_COLUMN)),
+                quote(self.label),
+                quote(ATLAS_ID_COLUMN),
+            )
+        )
+        for name in INDEXED_COLUMN_LIST:
+            if name in self.column_name_list:
+                sql_list.append(
+                    "CREATE INDEX %s ON %s (%s, %s)"
+                    % (
+                        quote("%s_%s_idx" % (self.label, name)),
+                        quote(self.label),
+                        quote(name),
+                        quote(ATLAS_ID_COLUMN),
+                    )
+                )
+        return sql_list
+
+
+class SqliteExporter:
+    """
+    Exports Atlases to a SQLite Database, One Table per Template.
+
+    Has the interface of HtanJsonWriter, so that atlases can be exported
+    while they are generated.  Call close to build the indexes, and
+    complete the database, or abort to discard it.
+    """
+
+    def __init__(self, db_path, schema_list, batch_size=BATCH_SIZE):
+        self.db_path = Path(db_path)
+        self.tmp_path = self.db_path.with_name(self.db_path.name + ".tmp")
+        self.batch_size = batch_size
+        if self.tmp_path.exists():
+            self.tmp_path.unlink()
+        # Atlases may be inserted by a pipeline stage, in its own thread
+        self.connection = sqlite3.connect(
+            str(self.tmp_path), isolation_level=None, check_same_thread=False
+        )
+        for pragma in PRAGMA_LIST:
+            self.connection.execute(pragma)
+
+        self.table_list = []
+        for label, column_name_list in get_table_spec_list(schema_list):
+            self.table_list.append(SqliteTable(label, column_name_list))
+        self.connection.execute("BEGIN")
+        for table in self.table_list:
+            self.connection.execute(table.get_create_sql())
+        self.connection.execute(
+            "CREATE TABLE %s (%s, atlas_name)" % (ATLAS_TABLE, ATLAS_ID_COLUMN)
+        )
+        self.connection.execute(
+            "CREATE TABLE %s (data_schema, position, column_name, id, display_name, "
+            "description)" % ATTRIBUTE_TABLE
+        )
+        self.connection.executemany(
+            "INSERT INTO %s VALUES (?, ?, ?, ?, ?, ?)" % ATTRIBUTE_TABLE,
+            get_attribute_rows(schema_list),
+        )
+        self.num_uncommitted_rows = 0
+
+    def write_atlas(self, atlas):
+        """
+        Add the Records of a Single Atlas to Each Table.
+        """
+        atlas_id = atlas.get("htan_id")
+        self.connection.execute(
+            "INSERT INTO %s VALUES (?, ?)" % ATLAS_TABLE,
+            (atlas_id, atlas.get("htan_name")),
+        )
+        for table in self.table_list:
+            template_data = atlas.get(table.label)
+            if not isinstance(template_data, dict):
+                continue
+            record_list = template_data.get("record_list", [])
+            num_values = len(table.column_name_list)
+            for record in record_list:
+                if len(record) != num_values:
+                    raise ValueError(
+                        "Record of %s in %s has %d values, but the schema has %d."
+                        % (table.label, atlas_id, len(record), num_values)
+                    )
+            table.pending_row_list.extend([atlas_id] + record for record in record_list)
+            if len(table.pending_row_list) >= self.batch_size:
+                self.__flush(table)
+
+    def write_schemas(self, schema_list):
+        """
+        Complete the Database.
+        The tables are created from the schemas up front, so the schemas
+        node itself is only used through the attribute table.
+        """
+        self.close()
+
+    def close(self):
+        """
+        Insert all Remaining Rows, Build the Indexes, and Complete the Database.
+        """
+        for table in self.table_list:
+            self.__flush(table)
+        self.connection.execute("COMMIT")
+        self.connection.execute("BEGIN")
+        for table in self.table_list:
+            for sql in table.get_index_sql_list():
+                self.connection.execute(sql)
+        self.connection.execute("COMMIT")
+        self.connection.execute("ANALYZE")
+        self.connection.close()
+        os.replace(self.tmp_path, self.db_path)
+
+    def abort(self):
+        """
+        Discard the Database.
+        """
+        self.connection.close()
+        if self.tmp_path.exists():
+            self.tmp_path.unlink()
+
+    def get_table_list(self):
+        """
+        Get the Label and Number of Rows of Each Table.
+        """
+        return [(table.label, table.num_rows) for table in self.table_list]
+
+    def __flush(self, table):
+        """
+        Insert the Pending Rows of a Table, Committing Once the Transaction
+        is Large Enough.
+        """
+        if len(table.pending_row_list) == 0:
+            return
+        row_list = table.pending_row_list
+        table.pending_row_list = []
+        self.connection.execute("SAVEPOINT batch")
+        try:
+            self.connection.executemany(table.insert_sql, row_list)
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+            # Lists and objects cannot be bound;  store them as JSON text
+            self.connection.execute("ROLLBACK TO batch")
+            self.connection.executemany(
+                table.insert_sql, [encode_row(row) for row in row_list]
+            )
+        self.connection.execute("RELEASE batch")
+        table.num_rows += len(row_list)
+        self.num_uncommitted_rows += len(row_list)
+        if self.num_uncommitted_rows >= TRANSACTION_ROWS:
+            self.connection.execute("COMMIT")
+            self.connection.execute("BEGIN")
+            self.num_uncommitted_rows = 0
+
+
+def get_table_spec_list(schema_list):
+    """
+    Get the Label, and the Column Names, of Each Template of the Schemas
+    Node, in Order.  Templates listed more than once get a single table.
+    """
+    table_spec_list = []
+    label_set = set()
+    for schema in schema_list:
+        label = schema["data_schema"]
+        if label in label_set:
+            continue
+        label_set.add(label)
+        table_spec_list.append((label, get_column_names(schema["attributes"])))
+    return table_spec_list
+
+
+def get_column_names(attribute_list):
+    """
+    Get the Column Name of Each Attribute;  names listed more than once
+    are numbered.
+    """
+    column_name_list = []
+    name_set = set([ATLAS_ID_COLUMN])
+    for attribute in attribute_list:
+        base_name = attribute["id"].replace("bts:", "")
+        name = base_name
+        number = 1
+        while name.lower() in name_set:
+            number += 1
+            name = "%s_%d" % (base_name, number)
+        name_set.add(name.lower())
+        column_name_list.append(name)
+    return column_name_list
+
+
+def get_attribute_rows(schema_list):
+    """Get the Rows of the Attribute Table."""
+    row_list = []
+    label_set = set()
+    for schema in schema_list:
+        label = schema["data_schema"]
+        if label in label_set:
+            continue
+        label_set.add(label)
+        attribute_list = schema["attributes"]
+        column_name_list = get_column_names(attribute_list)
+        for position, attribute in enumerate(attribute_list):
+            row_list.append(
+                (
+                    label,
+                    position,
+                    column_name_list[position],
+                    attribute.get("id"),
+                    attribute.get("display_name"),
+                    attribute.get("description"),
+                )
+            )
+    return row_list
+
+
+def encode_row(row):
+    """Encode the Lists and Objects of a Row as JSON Text."""
+    return [
+        json.dumps(value) if isinstance(value, (list, dict)) else value for value in row
+    ]
+
+
+def quote(name):
+    """Quote an SQL Identifier."""
+    return '"%s"' % name.replace('"', '""')
+
+
+def get_link_errors(db_path):
+    """
+    Check the Links of all Atlases in the Database, with Indexed Joins.
+    Errors are those of HtanJsonReader, in the same order:  assay links
+    first, table by table, then biospecimen links.
+    """
+    error_list = []
+    connection = sqlite3.connect(str(db_path))
+    try:
+        column_dict = {}
+        for label, column_name in connection.execute(
+            "SELECT data_schema, column_name FROM %s ORDER BY rowid" % ATTRIBUTE_TABLE
+        ):
+            column_dict.setdefault(label, []).append(column_name)
+
+        target_id = "bts:HTANParentBiospecimenID"
+        for label, column_name_list in column_dict.items():
+            if "HTANParentBiospecimenID" not in column_name_list:
+                continue
+            sql = (
+                "SELECT t.HTANParentBiospecimenID FROM %s AS t WHERE NOT EXISTS "
+                "(SELECT 1 FROM Biospecimen AS b "
+                "WHERE b.HTANBiospecimenID IS t.HTANParentBiospecimenID "
+                "AND b.atlas_id IS t.atlas_id) ORDER BY t.rowid" % quote(label)
+            )
+            for (biospecimen_id,) in connection.execute(sql):
+                error_list.append(
+                    "Within %s, we have %s:%s, but this ID does not exist within the Biospecimen list."
+                    % (label, target_id, biospecimen_id)
+                )
+
+        target_id = "bts:HTANParentID"
+        sql = (
+            "SELECT t.HTANParentID FROM Biospecimen AS t WHERE NOT EXISTS "
+            "(SELECT 1 FROM Demographics AS d WHERE d.HTANParticipantID IS t.HTANParentID "
+            "AND d.atlas_id IS t.atlas_id) AND NOT EXISTS "
+            "(SELECT 1 FROM Biospecimen AS b WHERE b.HTANBiospecimenID IS t.HTANParentID "
+            "AND b.atlas_id IS t.atlas_id) ORDER BY t.rowid"
+        )
+        for (parent_id,) in connection.execute(sql):
+            error_list.append(
+                "Within %s, we have %s:%s, but this ID does not exist within "
+                "the Biospecimen or Demographics list." % ("Biospecimen", target_id, parent_id)
+            )
+    finally:
+        connection.close()
+    return error_list
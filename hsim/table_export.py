@@ -0,0 +1,297 @@
+"""
+Export Simulated Atlases as One Table per Template.
+
+Each template becomes a single table, named after its label, with an atlas ID
+column followed by one column per schema attribute.  Numeric attributes are
+typed as 64-bit integers, and all other attributes as strings.  Rows are
+written as atlases arrive, so the nested document is never held in memory.
+
+When generating, the columns and their types come from the template plans of
+the HTAN schema.  When exporting an existing file, they come from the file's
+own schemas node, which lists attributes without types;  Parquet columns are
+then typed from the values of the first row group.
+
+Supported formats are NDJSON and TSV, which are streamed row by row, and
+Parquet, which is written in row groups and requires pyarrow.  pyarrow is slow
+to import, so it is only imported once a Parquet table is written.
+"""
+from collections import namedtuple
+from pathlib import Path
+import csv
+import json
+from hsim import constants
+from hsim import schema_util
+
+# pyarrow is optional;  see import_pyarrow
+pyarrow = None
+_pyarrow_imported = False
+PYARROW_ERROR = (
+    "Parquet export requires pyarrow, which is not installed;  "
+    "run pip install 'hsim[parquet]'."
+)
+
+NDJSON = constants.NDJSON
+TSV = constants.TSV
+PARQUET = constants.PARQUET
+TABLE_FORMAT_LIST = constants.TABLE_FORMAT_LIST
+
+ATLAS_ID_COLUMN = "atlas_id"
+INT64 = "int64"
+STRING = "string"
+
+# Rows per Parquet row group
+ROW_GROUP_SIZE = 100000
+
+
+class TableSpec(
+    namedtuple("TableSpec", ["label", "column_name_list", "column_type_list"])
+):
+    """Names and Types of the Columns of a Single Template Table."""
+
+    __slots__ = ()
+
+
+class TableExporter:
+    """
+    Exports Atlases as One Table per Template, in Template List Order.
+
+    Has the interface of HtanJsonWriter, so that tables can be written
+    while atlases are generated.
+    """
+
+    def __init__(self, out_dir, table_spec_list, table_format=TSV):
+        if table_format not in TABLE_FORMAT_LIST:
+            raise ValueError("Unknown table format:  %s" % table_format)
+        if table_format == PARQUET and import_pyarrow() is None:
+            raise RuntimeError(PYARROW_ERROR)
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.table_list = []
+        for table_spec in table_spec_list:
+            path = out_dir / ("%s.%s" % (table_spec.label, table_format))
+            if table_format == TSV:
+                table_writer = TsvTableWriter(path, table_spec)
+            elif table_format == NDJSON:
+                table_writer = NdjsonTableWriter(path, table_spec)
+            else:
+                table_writer = ParquetTableWriter(path, table_spec)
+            self.table_list.append([table_spec, table_writer, path, 0])
+
+    def write_atlas(self, atlas):
+        """
+        Write the Records of a Single Atlas to Each Table.
+        """
+        atlas_id = atlas["htan_id"]
+        for table in self.table_list:
+            table_spec, table_writer = table[0], table[1]
+            template_data = atlas.get(table_spec.label)
+            if template_data is None:
+                continue
+            record_list = template_data["record_list"]
+            num_values = len(table_spec.column_name_list) - 1
+            for record in record_list:
+                if len(record) != num_values:
+                    raise ValueError(
+                        "Record of %s in %s has %d values, but the schema has %d."
+                        % (table_spec.label, atlas_id, len(record), num_values)
+                    )
+            table_writer.write_rows(atlas_id, record_list)
+            table[3] += len(record_list)
+
+    def write_schemas(self, schema_list):
+        """
+        Complete all Tables.
+        Tables carry their columns, so the schemas node itself is not exported.
+        """
+        self.close()
+
+    def close(self):
+        """
+        Complete all Tables.
+        """
+        for table in self.table_list:
+            table[1].close()
+
+    def get_table_list(self):
+        """
+        Get the Label, Path and Number of Rows of Each Table.
+        """
+        return [(table[0].label, table[2], table[3]) for table in self.table_list]
+
+
+class TsvTableWriter:
+    """
+    Writes a Single Table as Tab-Separated Values, with a Header Row.
+    Values with tabs, quotes or line breaks are quoted, as in CSV.
+    """
+
+    def __init__(self, path, table_spec):
+        self.out = open(path, "w", newline="", encoding="utf-8")
+        self.csv_writer = csv.writer(self.out, delimiter="\t", lineterminator="\n")
+        self.csv_writer.writerow(table_spec.column_name_list)
+
+    def write_rows(self, atlas_id, record_list):
+        """Write One Row per Record."""
+        self.csv_writer.writerows([atlas_id] + record for record in record_list)
+
+    def close(self):
+        """Complete the Table."""
+        self.out.close()
+
+
+class NdjsonTableWriter:
+    """
+    Writes a Single Table as Newline-Delimited JSON, One Object per Row.
+    """
+
+    def __init__(self, path, table_spec):
+        self.out = open(path, "w", encoding="utf-8")
+        self.column_name_list = table_spec.column_name_list
+
+    def write_rows(self, atlas_id, record_list):
+        """Write One Row per Record."""
+        column_name_list = self.column_name_list
+        for record in record_list:
+            row = dict(zip(column_name_list, [atlas_id] + record))
+            self.out.write(json.dumps(row) + "\n")
+
+    def close(self):
+        """Complete the Table."""
+        self.out.close()
+
+
+class ParquetTableWriter:
+    """
+    Writes a Single Table as Parquet, One Row Group per ROW_GROUP_SIZE Rows.
+    """
+
+    def __init__(self, path, table_spec, row_group_size=ROW_GROUP_SIZE):
+        if import_pyarrow() is None:
+            raise RuntimeError(PYARROW_ERROR)
+        self.path = path
+        self.table_spec = table_spec
+        self.row_group_size = row_group_size
+        self.schema = None
+        self.parquet_writer = None
+        if table_spec.column_type_list is not None:
+            self.__open(table_spec.column_type_list)
+        self.__reset_columns()
+
+    def write_rows(self, atlas_id, record_list):
+        """Buffer One Row per Record, Writing each Full Row Group."""
+        self.column_list[0].extend([atlas_id] * len(record_list))
+        for column, value_list in zip(self.column_list[1:], zip(*record_list)):
+            column.extend(value_list)
+        self.num_rows += len(record_list)
+        if self.num_rows >= self.row_group_size:
+            self.__write_row_group()
+
+    def close(self):
+        """Write the Last Row Group, and Complete the Table."""
+        if self.num_rows > 0:
+            self.__write_row_group()
+        if self.parquet_writer is None:
+            self.__open(get_column_types(self.column_list))
+        self.parquet_writer.close()
+
+    def __open(self, column_type_list):
+        """Open the Parquet File, with the Types of the Columns."""
+        type_dict = {INT64: pyarrow.int64(), STRING: pyarrow.string()}
+        field_list = []
+        for column_name, column_type in zip(
+            self.table_spec.column_name_list, column_type_list
+        ):
+            field_list.append(pyarrow.field(column_name, type_dict[column_type]))
+        self.schema = pyarrow.schema(field_list)
+        self.parquet_writer = pyarrow.parquet.ParquetWriter(str(self.path), self.schema)
+
+    def __write_row_group(self):
+        """Write all Buffered Rows."""
+        if self.parquet_writer is None:
+            self.__open(get_column_types(self.column_list))
+        array_list = []
+        for column, field in zip(self.column_list, self.schema):
+            array_list.append(pyarrow.array(column, type=field.type))
+        table = pyarrow.Table.from_arrays(array_list, schema=self.schema)
+        self.parquet_writer.write_table(table)
+        self.__reset_columns()
+
+    def __reset_columns(self):
+        """Clear the Buffered Rows."""
+        self.column_list = [[] for column_name in self.table_spec.column_name_list]
+        self.num_rows = 0
+
+
+def import_pyarrow():
+    """Import pyarrow on First Use;  returns None if it is not installed."""
+    global pyarrow, _pyarrow_imported
+    if not _pyarrow_imported:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:  # pragma: no cover
+            pyarrow = None
+        _pyarrow_imported = True
+    return pyarrow
+
+
+def get_table_spec_list(schema_dict, template_list):
+    """
+    Get the Table Spec of Each Template, in Template List Order.
+    Templates listed more than once get a single table.
+    """
+    table_spec_list = []
+    label_set = set()
+    for template in template_list:
+        template_plan = schema_util.get_template_plan(schema_dict, template[0])
+        if template_plan.label in label_set:
+            continue
+        label_set.add(template_plan.label)
+        column_name_list = [ATLAS_ID_COLUMN]
+        column_type_list = [STRING]
+        for column in template_plan.column_list:
+            column_name_list.append(column.id.replace("bts:", ""))
+            if column.kind == schema_util.ColumnPlan.NUMERIC:
+                column_type_list.append(INT64)
+            else:
+                column_type_list.append(STRING)
+        table_spec_list.append(
+            TableSpec(template_plan.label, column_name_list, column_type_list)
+        )
+    return table_spec_list
+
+
+def get_schemas_table_spec_list(schema_list):
+    """
+    Get the Table Spec of Each Template of a Schemas Node, in Order.
+    Templates listed more than once get a single table.  The schemas node
+    does not type its attributes, so the column types are None.
+    """
+    table_spec_list = []
+    label_set = set()
+    for schema in schema_list:
+        label = schema["data_schema"]
+        if label in label_set:
+            continue
+        label_set.add(label)
+        column_name_list = [ATLAS_ID_COLUMN]
+        for attribute in schema["attributes"]:
+            column_name_list.append(attribute["id"].replace("bts:", ""))
+        table_spec_list.append(TableSpec(label, column_name_list, None))
+    return table_spec_list
+
+
+def get_column_types(column_list):
+    """
+    Get the Type of Each Column from its Values:  INT64 if all values that
+    are not None are integers, and STRING otherwise.
+    """
+    column_type_list = []
+    for column in column_list:
+        type_set = set(map(type, column))
+        type_set.discard(type(None))
+        if type_set == {int}:
+            column_type_list.append(INT64)
+        else:
+            column_type_list.append(STRING)
+    return column_type_list
@@ -50,6 +50,12 @@ setup(
         # Include dependencies here
         'click>=7.0,<8'
     ],
+    extras_require={
+        # Optional dependencies, e.g. pip install 'hsim[vectorize,parquet]'
+        'vectorize': ['numpy>=1.17'],
+        'parquet': ['pyarrow>=1.0'],
+        'fast-json': ['orjson>=3.0'],
+    },
     entry_points="""
     [console_scripts]
     hsim=hsim.cli:cli
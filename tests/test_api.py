@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the Python API.
+"""
+import pytest
+from hsim import api
+from hsim import cli
+from hsim import scale
+
+SEED = 7
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return api.get_generator()
+
+
+@pytest.fixture(scope="module")
+def atlas_list(generator):
+    return list(
+        cli.generate_simulated_atlases(
+            cli.get_atlas_list(4),
+            generator.schema_dict,
+            generator.template_list,
+            SEED,
+            1,
+            scale.ScaleParams(num_participants=3),
+        )
+    )
+
+
+def test_generate_atlas(atlas_list):
+    params = {"num_participants": 3}
+    assert api.generate_atlas(3, SEED, params) == atlas_list[3]
+    assert api.generate_atlas(1, SEED, scale.ScaleParams(num_participants=3)) == atlas_list[1]
+    assert api.generate_atlas(1, SEED + 1, params) != atlas_list[1]
+    with pytest.raises(ValueError):
+        api.generate_atlas(-1, SEED)
+    with pytest.raises(ValueError):
+        api.generate_atlas(0, SEED, {"participants": 3})
+
+
+def test_iter_atlases(atlas_list):
+    params = {"num_participants": 3}
+    atlas_iter = api.iter_atlases(4, SEED, params)
+    assert next(atlas_iter) == atlas_list[0]
+    assert list(atlas_iter) == atlas_list[1:]
+    assert list(api.iter_atlases(4, SEED, params, start=2)) == atlas_list[2:]
+    assert list(api.iter_atlases(4, SEED, params, start=4)) == []
+
+
+def test_iter_tables(generator, atlas_list):
+    assert "Biospecimen" in generator.get_template_labels()
+    table_list = list(api.iter_tables(4, "Biospecimen", SEED, {"num_participants": 3}, 1))
+    assert [table.atlas_id for table in table_list] == ["HTA1", "HTA2", "HTA3"]
+    for table, atlas in zip(table_list, atlas_list[1:]):
+        assert table.record_list == atlas["Biospecimen"]["record_list"]
+        row_dict = table.get_row_dicts()[0]
+        assert list(row_dict) == table.column_name_list
+        assert row_dict["HTANBiospecimenID"].startswith(table.atlas_id + "_")
+    with pytest.raises(ValueError):
+        list(api.iter_tables(1, "Unknown", SEED))
+
+
+def test_get_schemas(generator):
+    data_set = {}
+    cli.generate_schemas_node(generator.schema_dict, generator.template_list, data_set)
+    assert generator.get_schemas() == data_set["schemas"]
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for cli.
+"""
+import click
+from click.testing import CliRunner
+import os
+import pytest
+import random
+import subprocess
+import sys
+from hsim import cli
+from hsim import scale
+from hsim import schema_util
+from hsim import table_export
+
+# Modules that only some commands need, and that must not slow down start-up;
+# start-up time itself is measured by benchmarks/run_benchmarks.py
+LAZY_MODULE_LIST = [
+    "numpy",
+    "pyarrow",
+    "emoji",
+    "cProfile",
+    "http.server",
+    "concurrent.futures",
+    "hsim.compression",
+    "hsim.facet_index",
+    "hsim.fragment_cache",
+    "hsim.id_util",
+    "hsim.json_index",
+    "hsim.json_reader",
+    "hsim.json_writer",
+    "hsim.pipeline",
+    "hsim.profiling",
+    "hsim.scale",
+    "hsim.schema_util",
+    "hsim.server",
+    "hsim.shard",
+    "hsim.sqlite_export",
+    "hsim.table_export",
+    "sqlite3",
+    "bz2",
+    "gzip",
+    "hashlib",
+    "json",
+    "lzma",
+    "mmap",
+    "pickle",
+    "queue",
+    "tracemalloc",
+    "zlib",
+]
+
+
+def test_get_atlas_seed():
+    assert cli.get_atlas_seed(0, "HTA0") == cli.get_atlas_seed(0, "HTA0")
+    assert cli.get_atlas_seed(0, "HTA0") != cli.get_atlas_seed(0, "HTA1")
+    assert cli.get_atlas_seed(0, "HTA0") != cli.get_atlas_seed(1, "HTA0")
+
+
+def test_generate_simulated_atlases_workers():
+    schema_dict = schema_util.load_htan_schema()
+    template_list = cli.get_template_list()
+    target_atlas_list = cli.get_atlas_list(3)
+    atlas_list1 = list(
+        cli.generate_simulated_atlases(
+            target_atlas_list, schema_dict, template_list, 7, 1
+        )
+    )
+    atlas_list2 = list(
+        cli.generate_simulated_atlases(
+            target_atlas_list, schema_dict, template_list, 7, 2
+        )
+    )
+    assert len(atlas_list1) == 3
+    assert atlas_list1[2]["htan_id"] == "HTA2"
+    assert atlas_list1 == atlas_list2
+
+
+def test_generate_simulated_atlas_scale():
+    schema_dict = schema_util.load_htan_schema()
+    template_list = cli.get_template_list()
+    scale_params = scale.ScaleParams(
+        num_participants=3,
+        samples_per_participant="1-4",
+        max_lineage_depth=2,
+        template_multipliers={"bts:ScRNA-seqLevel1": 2, "bts:Demographics": 0},
+    )
+    atlas = cli.generate_simulated_atlas(
+        "HTA0", "HTAN Atlas 0", schema_dict, template_list, random.Random(1), scale_params
+    )
+    num_samples = len(atlas["Biospecimen"]["record_list"])
+    assert 3 <= num_samples <= 12
+    assert len(atlas["ScRNA-seqLevel1"]["record_list"]) == 2 * num_samples
+    assert len(atlas["ScRNA-seqLevel2"]["record_list"]) == num_samples
+    assert len(atlas["Demographics"]["record_list"]) == 0
+    assert len(atlas["Diagnosis"]["record_list"]) == 3
+
+
+def test_get_scale_params():
+    template_list = cli.get_template_list()
+    scale_params = cli.get_scale_params(
+        template_list,
+        participants=5,
+        template_multiplier_list=["bts:ScRNA-seqLevel1=3"],
+    )
+    assert scale_params.num_participants == 5
+    assert scale_params.sample_distribution.get_max() == 6
+    assert scale_params.get_multiplier("bts:ScRNA-seqLevel1") == 3
+    for template_multiplier in ["bts:Biospecimen=2", "bts:Unknown=2", "x"]:
+        with pytest.raises(click.BadParameter):
+            cli.get_scale_params(
+                template_list, template_multiplier_list=[template_multiplier]
+            )
+
+
+def test_get_scale_params_config_types(tmp_path):
+    config_file = tmp_path / "scale.json"
+    config_file.write_text('{"num_participants": "5"}')
+    with pytest.raises(click.BadParameter):
+        cli.get_scale_params(cli.get_template_list(), config=str(config_file))
+
+
+def test_generate_simulated_atlases_vectorize():
+    pytest.importorskip("numpy")
+    schema_dict = schema_util.load_htan_schema()
+    template_list = cli.get_template_list()
+    target_atlas_list = cli.get_atlas_list(2)
+    atlas_list1 = list(
+        cli.generate_simulated_atlases(
+            target_atlas_list, schema_dict, template_list, 7, 1, None, True
+        )
+    )
+    atlas_list2 = list(
+        cli.generate_simulated_atlases(
+            target_atlas_list, schema_dict, template_list, 7, 2, None, True
+        )
+    )
+    assert atlas_list1 == atlas_list2
+    assert len(atlas_list1[0]["Biospecimen"]["record_list"]) == 60
+
+
+def test_generate_default_path(tmp_path, monkeypatch):
+    # The example JSON file is never overwritten by a database
+    schema_dir = os.path.dirname(schema_util.SCHEMA_PATH)
+    os.symlink(os.path.abspath(schema_dir), tmp_path / schema_dir)
+    (tmp_path / "example_output").mkdir()
+    monkeypatch.chdir(tmp_path)
+    args = ["generate", "--format", "sqlite", "--num_atlases", "1", "--seed", "1"]
+    result = CliRunner().invoke(cli.cli, args)
+    assert result.exit_code == 0, result.output
+    assert os.listdir("example_output") == ["sim.db"]
+
+
+def test_missing_extras(monkeypatch):
+    # Errors for missing optional dependencies name the extra to install
+    monkeypatch.setattr(schema_util, "import_numpy", lambda: None)
+    monkeypatch.setattr(table_export, "import_pyarrow", lambda: None)
+    result = CliRunner().invoke(cli.cli, ["generate", "--vectorize"])
+    assert result.exit_code != 0
+    assert "hsim[vectorize]" in result.output
+    with pytest.raises(click.UsageError, match=r"hsim\[parquet\]"):
+        cli.check_table_format(table_export.PARQUET)
+
+
+def test_import_lazy():
+    code = "import sys, hsim.cli;  print(' '.join(sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    module_set = set(output.split())
+    for module_name in LAZY_MODULE_LIST:
+        assert module_name not in module_set
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the Compact Column Store.
+"""
+import io
+import pytest
+from hsim import api
+from hsim import column_store
+from hsim import json_writer
+
+
+def test_column_kinds():
+    pool = column_store.StringPool()
+    record_list = [
+        [1, "Stage I", "lorem_ipsum_7", None, 1.5, True, -200, "HTA0_1"],
+        [100, "Stage II", "lorem_ipsum_100000", None, 2, False, 1 << 40, "HTA0_1_0"],
+        [3, "Stage I", None, None, "x", None, 0, "HTA0_2"],
+    ]
+    table = column_store.ColumnTable(record_list, pool)
+    assert len(table) == 3
+    assert table.get_num_columns() == 8
+    kind_list = [table.get_kind(position) for position in range(8)]
+    assert kind_list == [
+        column_store.INT,
+        column_store.CODE,
+        column_store.PREFIXED,
+        column_store.CODE,
+        column_store.OBJECT,
+        column_store.OBJECT,
+        column_store.INT,
+        column_store.CODE,
+    ]
+    assert table.column_list[0].typecode == "b"
+    assert table.column_list[6].typecode == "q"
+    assert table.get_codes(1).typecode == "B"
+    assert table.column_list[2].prefix == "lorem_ipsum_"
+    assert table.to_record_list() == record_list
+    assert table.get_record(2) == record_list[2]
+    assert table.get_value(1, 2) == "lorem_ipsum_100000"
+    assert table.get_column(1) == ["Stage I", "Stage II", "Stage I"]
+    with pytest.raises(ValueError):
+        table.get_codes(0)
+
+    # Strings are interned in the shared pool
+    other_table = column_store.ColumnTable([[0, "Stage II", "a", None, 0, 0, 0, ""]], pool)
+    assert other_table.get_value(0, 1) is table.get_value(1, 1)
+
+
+@pytest.mark.parametrize(
+    "value_list",
+    [
+        ["id_01", "id_2"],
+        ["id_1", "id_+2"],
+        ["id_1", "id_ 2"],
+        ["id_1", "id_1_000"],
+        ["id_1", "id_٢"],
+        ["id_1", "other_2"],
+        ["id_1", "id_"],
+    ],
+)
+def test_prefixed_column_exact(value_list):
+    pool = column_store.StringPool()
+    table = column_store.ColumnTable([[value] for value in value_list], pool)
+    assert table.get_kind(0) == column_store.CODE
+    assert table.get_column(0) == value_list
+
+
+def test_irregular_tables():
+    pool = column_store.StringPool()
+    table = column_store.ColumnTable([], pool)
+    assert table.to_record_list() == []
+    table = column_store.ColumnTable([[], []], pool)
+    assert table.to_record_list() == [[], []]
+    record_list = [[1, "a"], [2]]
+    table = column_store.ColumnTable(record_list, pool)
+    assert table.get_num_columns() is None
+    assert table.to_record_list() == record_list
+    assert table.get_value(1, 0) == 2
+
+
+def test_data_set():
+    reference_data_set = api.generate_data_set(3, 5, {"num_participants": 4})
+    atlas_list = list(api.iter_atlases(3, 5, {"num_participants": 4}))
+    assert reference_data_set.get_atlas_ids() == ["HTA0", "HTA1", "HTA2"]
+    assert list(reference_data_set.iter_atlases()) == atlas_list
+    assert reference_data_set.get_atlas("HTA1") == atlas_list[1]
+    table = reference_data_set.get_table(2, "Demographics")
+    assert table.to_record_list() == atlas_list[2]["Demographics"]["record_list"]
+    with pytest.raises(KeyError):
+        reference_data_set.get_table("HTA9", "Demographics")
+    with pytest.raises(KeyError):
+        reference_data_set.get_table("HTA0", "Unknown")
+
+    # Written through the compact data set, the output is unchanged
+    out = io.BytesIO()
+    writer = json_writer.HtanJsonWriter(out, 4)
+    for atlas in atlas_list:
+        writer.write_atlas(atlas)
+    writer.write_schemas(reference_data_set.get_schemas())
+    compact_out = io.BytesIO()
+    reference_data_set.write(json_writer.HtanJsonWriter(compact_out, 4))
+    assert compact_out.getvalue() == out.getvalue()
+
+    # Compact data sets are several times smaller than the atlases
+    num_bytes = sum(
+        column_store.get_record_list_bytes(atlas[label]["record_list"])
+        for atlas in atlas_list
+        for label in reference_data_set.get_compact_atlas(0).get_template_labels()
+    )
+    assert reference_data_set.get_num_bytes() * 3 < num_bytes
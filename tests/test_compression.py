@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for Compressed Output and Input.
+"""
+import gzip
+import io
+import os
+import pytest
+from hsim import cli
+from hsim import compression
+from hsim import json_reader
+
+
+class BrokenOutput:
+    def write(self, data):
+        raise OSError("Disk full.")
+
+
+def test_get_compression():
+    assert compression.get_compression("sim.json") == compression.NONE
+    assert compression.get_compression("sim.json.gz") == compression.GZIP
+    assert compression.get_compression("sim.json.xz") == compression.XZ
+    assert compression.get_compression("sim.json", "bz2") == compression.BZ2
+    assert compression.get_compression("sim.json.gz", "none") == compression.NONE
+    with pytest.raises(ValueError):
+        compression.get_compression("sim.json", "zip")
+    assert compression.split_extension("sim.json.gz") == ("sim.json", ".gz")
+    assert compression.split_extension("sim.json") == ("sim.json", "")
+
+
+@pytest.mark.parametrize("compression_type", ["gzip", "xz", "bz2"])
+def test_round_trip(tmp_path, compression_type):
+    data = b"".join(b"lorem_ipsum_%d\n" % x for x in range(20000))
+    path = tmp_path / "sim.json"
+    with compression.open_output(path, compression_type) as out:
+        for x in range(0, len(data), 1000):
+            out.write(data[x : x + 1000])
+    assert compression.detect_compression(path) == compression_type
+    with compression.open_input(path) as fd:
+        assert fd.read() == data
+    with open(path, "rb") as fd:
+        assert compression.decompress_input(fd, compression_type).read() == data
+
+
+def test_multiple_blocks():
+    out = io.BytesIO()
+    compressed_output = compression.CompressedOutput(
+        out, compression.GZIP, block_size=100, num_threads=2
+    )
+    data = b"".join(b"record %d\n" % x for x in range(1000))
+    compressed_output.write(data[:5000])
+    compressed_output.write(data[5000:])
+    compressed_output.close()
+    assert compressed_output.num_blocks == 2
+    assert compressed_output.num_bytes == len(data)
+    assert gzip.decompress(out.getvalue()) == data
+
+
+def test_empty_output():
+    out = io.BytesIO()
+    compression.CompressedOutput(out, compression.GZIP).close()
+    assert gzip.decompress(out.getvalue()) == b""
+
+
+def test_write_error():
+    compressed_output = compression.CompressedOutput(
+        BrokenOutput(), compression.GZIP, block_size=10
+    )
+    with pytest.raises(OSError):
+        for x in range(100):
+            compressed_output.write(b"0123456789")
+        compressed_output.close()
+
+
+def test_read_compressed(tmp_path):
+    template_list = cli.get_template_list()
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim_broken_links.json")
+    with open(fname, "rb") as fd:
+        data = fd.read()
+    gzip_fname = str(tmp_path / "sim.json.gz")
+    with compression.open_output(gzip_fname) as out:
+        out.write(data)
+
+    expected_error_list = json_reader.HtanJsonReader(fname, template_list).get_error_list()
+    for streaming in [False, True]:
+        reader = json_reader.HtanJsonReader(gzip_fname, template_list, streaming)
+        assert reader.get_num_atlases() == 1
+        assert reader.get_error_list() == expected_error_list
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the Facet Index.
+"""
+import os
+import pytest
+from hsim import api
+from hsim import facet_index
+
+SCHEMA_LIST = [
+    {
+        "data_schema": "Demographics",
+        "attributes": [
+            {"id": "bts:HTANParticipantID"},
+            {"id": "bts:Gender"},
+            {"id": "bts:Race"},
+            {"id": "bts:Flag"},
+        ],
+    },
+    {"data_schema": "Demographics", "attributes": []},
+]
+
+
+def get_atlas(atlas_id, record_list):
+    return {
+        "htan_id": atlas_id,
+        "htan_name": atlas_id,
+        "Demographics": {"data_schema": "", "record_list": record_list},
+    }
+
+
+def build_index(max_values=facet_index.DEFAULT_MAX_VALUES):
+    index = facet_index.FacetIndex(max_values)
+    index.set_schemas(SCHEMA_LIST)
+    index.add_atlas(
+        get_atlas(
+            "HTA0",
+            [
+                ["HTA0_1", "female", "white", True],
+                ["HTA0_2", "male", "asian", 1],
+                ["HTA0_3", "female", "asian", None],
+            ],
+        )
+    )
+    index.add_atlas({"htan_id": "HTA1", "htan_name": "HTA1"})
+    index.add_atlas(
+        get_atlas(
+            "HTA2",
+            [["HTA2_1", "male", None, None], ["HTA2_2", "female", "asian", None]],
+        )
+    )
+    return index
+
+
+def test_facet_counts():
+    index = build_index()
+    assert index.get_template_labels() == ["Demographics"]
+    assert index.get_attribute_ids("Demographics") == [
+        "bts:HTANParticipantID",
+        "bts:Gender",
+        "bts:Race",
+    ]
+    assert not index.is_facet("Demographics", "bts:Flag")
+    assert index.get_num_records("Demographics") == 5
+    assert index.get_num_records("Demographics", "HTA1") == 0
+    assert index.get_facet_counts("Demographics", "bts:Gender") == {
+        "female": 3,
+        "male": 2,
+    }
+    assert index.get_facet_counts("Demographics", "bts:Race", atlas="HTA2") == {
+        None: 1,
+        "asian": 1,
+    }
+    assert index.get_facet_counts("Demographics", "bts:Race", atlas=1) == {}
+    assert index.get_facet_counts(
+        "Demographics", "bts:Race", {"bts:Gender": "female"}
+    ) == {"white": 1, "asian": 2}
+    assert index.get_atlas_facet_counts("Demographics", "bts:Gender") == {
+        "HTA0": {"female": 2, "male": 1},
+        "HTA1": {},
+        "HTA2": {"male": 1, "female": 1},
+    }
+    with pytest.raises(ValueError):
+        index.get_facet_counts("Demographics", "bts:Flag")
+    with pytest.raises(KeyError):
+        index.get_facet_counts("Demographics", "bts:Unknown")
+    with pytest.raises(KeyError):
+        index.get_facet_counts("Unknown", "bts:Gender")
+    with pytest.raises(KeyError):
+        index.get_facet_counts("Demographics", "bts:Gender", atlas="HTA9")
+
+
+def test_query():
+    index = build_index()
+    filter_dict = {"bts:Gender": "female", "bts:Race": "asian"}
+    assert index.query("Demographics", filter_dict) == [("HTA0", 2), ("HTA2", 1)]
+    assert index.query("Demographics", filter_dict, atlas="HTA2") == [("HTA2", 1)]
+    assert index.count("Demographics", filter_dict) == 2
+    filter_dict = {"bts:Race": ["white", None]}
+    assert index.query("Demographics", filter_dict) == [("HTA0", 0), ("HTA2", 0)]
+    assert index.query("Demographics", {"bts:Gender": "other"}) == []
+    assert index.count("Demographics", {}) == 5
+    assert index.query("Demographics", {}, atlas=2)[0].atlas_id == "HTA2"
+
+
+def test_max_values():
+    index = build_index(max_values=2)
+    assert index.get_attribute_ids("Demographics") == ["bts:Gender"]
+    with pytest.raises(ValueError):
+        index.query("Demographics", {"bts:Race": "asian"})
+
+
+def test_intersect_postings():
+    large = list(range(0, 1000, 2))
+    assert facet_index.intersect_postings([large, [3, 4, 998, 1001]]) == [4, 998]
+    assert facet_index.intersect_postings([[1, 2, 3], [2, 3], [3, 4]]) == [3]
+    assert facet_index.intersect_postings([[], large]) == []
+
+
+def test_write(tmp_path):
+    json_path = tmp_path / "sim.json"
+    json_path.write_text("{}")
+    index = build_index()
+    index.write(json_path)
+    loaded_index = facet_index.read_facet_index(json_path)
+    assert loaded_index.get_atlas_ids() == ["HTA0", "HTA1", "HTA2"]
+    assert loaded_index.get_attribute_ids("Demographics") == index.get_attribute_ids(
+        "Demographics"
+    )
+    for attribute_id in index.get_attribute_ids("Demographics"):
+        assert loaded_index.get_atlas_facet_counts(
+            "Demographics", attribute_id
+        ) == index.get_atlas_facet_counts("Demographics", attribute_id)
+    filter_dict = {"bts:Gender": "female", "bts:Race": "asian"}
+    assert loaded_index.query("Demographics", filter_dict) == index.query(
+        "Demographics", filter_dict
+    )
+
+    # The index is stale once the JSON file changes, even at the same size
+    stat = json_path.stat()
+    json_path.write_text("[]")
+    os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    with pytest.raises(facet_index.FacetIndexError):
+        facet_index.read_facet_index(json_path)
+    json_path.write_text("{}")
+    os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    with pytest.raises(facet_index.FacetIndexError):
+        facet_index.read_facet_index(json_path)
+    json_path.write_text("{} ")
+    with pytest.raises(facet_index.FacetIndexError):
+        facet_index.read_facet_index(json_path)
+
+
+def test_generated_atlases():
+    atlas_list = list(api.iter_atlases(3, 5, {"num_participants": 4}))
+    index = facet_index.FacetIndex()
+    index.set_schemas(api.get_generator().get_schemas())
+    for atlas in atlas_list:
+        index.add_atlas(atlas)
+    schema_dict = {
+        schema["data_schema"]: schema for schema in api.get_generator().get_schemas()
+    }
+    attribute_list = schema_dict["Biospecimen"]["attributes"]
+    position = [attribute["id"] for attribute in attribute_list].index(
+        "bts:BiospecimenType"
+    )
+    count_dict = {}
+    for atlas in atlas_list:
+        for record in atlas["Biospecimen"]["record_list"]:
+            count_dict[record[position]] = count_dict.get(record[position], 0) + 1
+    assert index.get_facet_counts("Biospecimen", "bts:BiospecimenType") == count_dict
+    value = atlas_list[1]["Biospecimen"]["record_list"][0][position]
+    ref_list = index.query("Biospecimen", {"bts:BiospecimenType": value}, "HTA1")
+    assert ref_list == [
+        ("HTA1", record_position)
+        for record_position, record in enumerate(
+            atlas_list[1]["Biospecimen"]["record_list"]
+        )
+        if record[position] == value
+    ]
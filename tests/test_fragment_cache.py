@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the Fragment Cache.
+"""
+import json
+from hsim import cli
+from hsim import fragment_cache
+from hsim import json_index
+from hsim import schema_util
+
+
+class RemovedFragmentCache(fragment_cache.FragmentCache):
+    """A Cache whose Entries are all Removed after they are Found."""
+
+    def get(self, key):
+        return None
+
+
+def write_data_set(json_file, num_atlases, seed, cache=None, indent=4, stats_list=None):
+    schema_dict = schema_util.load_htan_schema()
+    index_writer = json_index.JsonIndexWriter(
+        json_index.get_index_path(json_file), json_file
+    )
+    with open(json_file, "wb") as out:
+        run_stats_list = cli.write_simulated_data(
+            out,
+            cli.get_atlas_list(num_atlases),
+            schema_dict,
+            cli.get_template_list(),
+            seed,
+            indent=indent,
+            index_writer=index_writer,
+            cache=cache,
+        )
+    if stats_list is not None:
+        stats_list.extend(run_stats_list)
+    with open(json_file, "rb") as fd:
+        data = fd.read()
+    with open(json_index.get_index_path(json_file), "rb") as fd:
+        index = json.load(fd)
+    # Each run writes the JSON file anew
+    del index["data_mtime_ns"]
+    return data, index
+
+
+def test_cached_output(tmp_path):
+    json_file = str(tmp_path / "sim.json")
+    for indent in [4, None]:
+        expected = write_data_set(json_file, 3, 5, indent=indent)
+        cache = fragment_cache.FragmentCache(tmp_path / "cache")
+        assert write_data_set(json_file, 3, 5, cache, indent) == expected
+        assert cache.get_stats()["misses"] == 3
+        assert cache.get_stats()["hits"] == 0
+
+        cache = fragment_cache.FragmentCache(tmp_path / "cache")
+        assert write_data_set(json_file, 3, 5, cache, indent) == expected
+        assert cache.get_stats()["misses"] == 0
+        assert cache.get_stats()["hits"] == 3
+
+    # A different seed misses, and only the new atlas of a larger run misses
+    cache = fragment_cache.FragmentCache(tmp_path / "cache")
+    write_data_set(json_file, 3, 6, cache)
+    assert cache.get_stats()["misses"] == 3
+    cache = fragment_cache.FragmentCache(tmp_path / "cache")
+    write_data_set(json_file, 4, 6, cache)
+    assert cache.get_stats()["misses"] == 1
+
+
+def get_stage_items(stats_list):
+    return {stats["name"]: stats["items"] for stats in stats_list}
+
+
+def test_cached_stats(tmp_path):
+    json_file = str(tmp_path / "sim.json")
+    expected = write_data_set(json_file, 3, 5)
+    stats_list = []
+    cache = fragment_cache.FragmentCache(tmp_path / "cache")
+    write_data_set(json_file, 2, 5, cache, stats_list=stats_list)
+    assert get_stage_items(stats_list) == {
+        "generate": 2,
+        "read_cache": 0,
+        "serialize": 2,
+        "write": 2,
+    }
+
+    # Cached atlases are read, and neither generated nor serialized
+    stats_list = []
+    cache = fragment_cache.FragmentCache(tmp_path / "cache")
+    assert write_data_set(json_file, 3, 5, cache, stats_list=stats_list) == expected
+    assert get_stage_items(stats_list) == {
+        "generate": 1,
+        "read_cache": 2,
+        "serialize": 1,
+        "write": 3,
+    }
+    assert stats_list[1]["bytes"] > 0
+    assert stats_list[1]["bytes"] + stats_list[2]["bytes"] == stats_list[3]["bytes"]
+
+    # Atlases removed from the cache during a run are generated after all
+    cache = RemovedFragmentCache(tmp_path / "cache")
+    assert write_data_set(json_file, 3, 5, cache) == expected
+    assert cache.get_stats()["misses"] == 3
+
+
+def test_key():
+    schema_dict = schema_util.load_htan_schema()
+    template_list = cli.get_template_list()
+    key_prefix = fragment_cache.get_key_prefix(schema_dict, template_list, 1)
+    assert key_prefix == fragment_cache.get_key_prefix(schema_dict, template_list, 1)
+    assert key_prefix != fragment_cache.get_key_prefix(schema_dict, template_list, 2)
+    assert key_prefix != fragment_cache.get_key_prefix(
+        schema_dict, template_list, 1, indent=None
+    )
+    assert key_prefix != fragment_cache.get_key_prefix(
+        schema_dict, template_list[1:], 1
+    )
+    # A plain dict schema is hashed by its content
+    plain_dict = dict(schema_dict)
+    plain_key_prefix = fragment_cache.get_key_prefix(plain_dict, template_list, 1)
+    assert plain_key_prefix == fragment_cache.get_key_prefix(
+        dict(schema_dict), template_list, 1
+    )
+    key = fragment_cache.get_atlas_key(key_prefix, ["HTA0", "HTAN Atlas 0"])
+    assert key != fragment_cache.get_atlas_key(key_prefix, ["HTA1", "HTAN Atlas 1"])
+
+
+def test_eviction(tmp_path):
+    json_file = str(tmp_path / "sim.json")
+    cache = fragment_cache.FragmentCache(tmp_path / "cache", max_bytes=1)
+    write_data_set(json_file, 2, 5, cache)
+    assert cache.get_stats()["misses"] == 2
+    cache.close()
+    assert cache.get_stats()["evictions"] == 2
+    assert list((tmp_path / "cache").glob("*/*.atlas")) == []
+
+
+def test_corrupt_entry(tmp_path):
+    json_file = str(tmp_path / "sim.json")
+    expected = write_data_set(json_file, 1, 5)
+    cache = fragment_cache.FragmentCache(tmp_path / "cache")
+    write_data_set(json_file, 1, 5, cache)
+    (path,) = (tmp_path / "cache").glob("*/*.atlas")
+    with open(path, "rb") as fd:
+        header, data = fd.read().split(b"\n", 1)
+
+    # Each corrupt entry is a miss, and is replaced by a good one
+    corrupt_list = [
+        b"{not json\n" + data,
+        b'{"cache_format":1}\n' + data,
+        b'{"cache_format":1,"htan_id":"HTA0","index_entry":7}\n' + data,
+        b"[]\n" + data,
+        b"\xff\n" + data,
+        header + b"\n" + data[:-1],
+        b"",
+    ]
+    for corrupt in corrupt_list:
+        with open(path, "wb") as out:
+            out.write(corrupt)
+        cache = fragment_cache.FragmentCache(tmp_path / "cache")
+        assert write_data_set(json_file, 1, 5, cache) == expected
+        assert cache.get_stats()["hits"] == 0
+        assert cache.get_stats()["misses"] == 1
+        with open(path, "rb") as fd:
+            assert fd.read() == header + b"\n" + data
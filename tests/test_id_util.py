@@ -42,3 +42,53 @@ def test_generate_id_set():
 
     parent_id = id_util.extract_parent_id(id_table, "HTA1_0_1")
     assert parent_id == "HTA1_0_0"
+
+
+def test_id_table():
+    id_table = id_util.IdTable("HTA1")
+    id_table.add_participant([-1, 0, -1])
+    id_table.add_participant([])
+    id_table.add_participant([-1])
+    assert len(id_table) == 7
+    assert id_table.get_num_participants() == 3
+    assert id_table.get_num_samples() == 4
+    assert list(id_table.get_participant_ids()) == ["HTA1_0", "HTA1_1", "HTA1_2"]
+    assert list(id_table.get_sample_ids()) == [
+        "HTA1_0_0",
+        "HTA1_0_1",
+        "HTA1_0_2",
+        "HTA1_2_0",
+    ]
+    assert id_table.get_sample_ids()[3] == "HTA1_2_0"
+    assert id_table[2] == ["SAMPLE", "HTA1_0_1", "HTA1_0_0"]
+    assert id_table.get_parent_id("HTA1_0_2") == "HTA1_0"
+    assert id_table.get_parent_id("HTA1_2_0") == "HTA1_2"
+    assert id_table.get_parent_id("HTA1_1") == "-"
+    assert id_table.get_parent_id("HTA1_1_0") is None
+    assert id_table.get_parent_id("HTA1_7") is None
+    assert id_table.get_parent_id("HTA2_0") is None
+
+    # Only IDs as they are written are found
+    non_canonical_list = ["HTA1_00", "HTA1_0_01", "HTA1_\u00b2", "HTA1_0_\u0661", "HTA1_"]
+    for target_id in non_canonical_list:
+        assert id_table.find_row(target_id) is None
+        assert id_table.get_parent_id(target_id) is None
+    assert id_util.extract_parent_id(id_table, "HTA1_0_01") is None
+    assert id_util.parse_id_number("10") == 10
+    assert id_util.parse_id_number("-1") is None
+    assert list(id_table.iter_samples())[1] == ("HTA1_0_1", "HTA1_0_0")
+
+
+def test_get_sample_lineage():
+    assert id_util.get_sample_lineage(0) == []
+    assert id_util.get_sample_lineage(4) == [-1, 0, 1, 2]
+    assert id_util.get_sample_lineage(5, 2) == [-1, 0, -1, 2, -1]
+    assert id_util.get_sample_lineage(3, 1) == [-1, -1, -1]
+
+
+def test_generate_scaled_id_set():
+    id_table = id_util.generate_scaled_id_set("HTA1", [2, 0, 3], 2)
+    assert id_table.get_num_participants() == 3
+    assert id_table.get_num_samples() == 5
+    assert id_util.extract_parent_id(id_table, "HTA1_0_1") == "HTA1_0_0"
+    assert id_util.extract_parent_id(id_table, "HTA1_2_2") == "HTA1_2"
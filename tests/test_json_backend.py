@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the JSON Backends.
+"""
+import io
+import json
+import os
+import pytest
+from hsim import json_backend
+from hsim import json_writer
+
+VALUE_LIST = [
+    [],
+    {},
+    [[1, "a", None], [True, False, -5]],
+    {"a": {"b": [1, 2, {"c": []}]}, "d": "x  y"},
+    ["".join(chr(i) for i in range(128))],
+    ["café", "☃"],
+    [1.5, 1e16, 1e-05, 2**70],
+    [1e-05],
+    [-9.9e-05, 0.0001],
+    [float("nan")],
+    [float("inf")],
+    {"a": [None, {"b": float("-inf")}]},
+    [None, 0.5],
+    {1: "integer key"},
+    ["T4e", "4e5", "0e-1"],
+]
+
+
+@pytest.fixture
+def restore_backend():
+    """Restore the Backend Picked Automatically after Each Test."""
+    yield
+    json_backend._backend = None
+
+
+def get_backend_list():
+    backend_list = [json_backend.StdlibBackend()]
+    try:
+        backend_list.append(json_backend.OrjsonBackend())
+    except ImportError:
+        pass
+    return backend_list
+
+
+@pytest.mark.parametrize("indent", [None, 0, 2, 4, 3])
+def test_dumps(indent):
+    for backend in get_backend_list():
+        for value in VALUE_LIST:
+            if indent is None:
+                expected = json.dumps(value, separators=(",", ":"))
+            else:
+                expected = json.dumps(value, indent=indent)
+            assert backend.dumps(value, indent) == expected
+
+
+def test_loads():
+    for backend in get_backend_list():
+        assert backend.loads(b'{"a": [1, "b", null]}') == {"a": [1, "b", None]}
+        assert backend.loads('[NaN]')[0] != backend.loads('[NaN]')[0]
+        assert backend.loads(str(2**70)) == 2**70
+        with pytest.raises(json.JSONDecodeError):
+            backend.loads("[1,")
+        assert backend.load(io.BytesIO(b"[1]")) == [1]
+
+
+def test_writer(restore_backend):
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim.json")
+    with open(fname) as fd:
+        doc = json.load(fd)
+    for indent in [4, None]:
+        output_list = []
+        for backend in get_backend_list():
+            json_backend.set_backend(backend.name)
+            out = io.BytesIO()
+            writer = json_writer.HtanJsonWriter(out, indent)
+            for atlas in doc["atlases"]:
+                writer.write_atlas(atlas)
+            writer.write_schemas(doc["schemas"])
+            output_list.append(out.getvalue())
+        for output in output_list:
+            assert output == output_list[0]
+
+
+def test_set_backend(restore_backend, monkeypatch):
+    assert json_backend.set_backend(json_backend.STDLIB).name == json_backend.STDLIB
+    assert json_backend.get_backend_name() == json_backend.STDLIB
+    with pytest.raises(ValueError):
+        json_backend.set_backend("yaml")
+
+    json_backend._backend = None
+    monkeypatch.setenv(json_backend.BACKEND_ENV, json_backend.STDLIB)
+    assert json_backend.get_backend_name() == json_backend.STDLIB
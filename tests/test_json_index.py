@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the Sidecar Index.
+"""
+import json
+import os
+import pytest
+from hsim import json_index
+from hsim import json_writer
+
+
+def write_indexed_data_set(json_file, indent):
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim.json")
+    with open(fname) as fd:
+        doc = json.load(fd)
+    atlas_list = []
+    for i in range(3):
+        atlas = dict(doc["atlases"][0])
+        atlas["htan_id"] = "HTA%d" % i
+        atlas_list.append(atlas)
+    index_writer = json_index.JsonIndexWriter(
+        json_index.get_index_path(json_file), json_file
+    )
+    with open(json_file, "wb") as out:
+        writer = json_writer.HtanJsonWriter(out, indent, index_writer)
+        for atlas in atlas_list:
+            writer.write_atlas(atlas)
+        writer.write_schemas(doc["schemas"])
+    index_writer.close(writer.num_bytes)
+    return atlas_list, doc["schemas"]
+
+
+@pytest.mark.parametrize("indent", [4, None])
+def test_random_access(tmp_path, indent):
+    json_file = str(tmp_path / "sim.json")
+    atlas_list, schema_list = write_indexed_data_set(json_file, indent)
+    with open(json_file) as fd:
+        assert json.load(fd) == {"atlases": atlas_list, "schemas": schema_list}
+
+    with json_index.IndexedJsonReader(json_file) as reader:
+        assert reader.get_num_atlases() == 3
+        assert reader.get_atlas_ids() == ["HTA0", "HTA1", "HTA2"]
+        assert reader.get_atlas("HTA1") == atlas_list[1]
+        assert reader.get_atlas(2) == atlas_list[2]
+        assert "Biospecimen" in reader.get_template_labels("HTA0")
+        record_list = atlas_list[2]["Biospecimen"]["record_list"]
+        assert reader.get_record_list("HTA2", "Biospecimen") == record_list
+        assert reader.get_num_records("HTA2", "Biospecimen") == len(record_list)
+        with pytest.raises(KeyError):
+            reader.get_atlas("HTA3")
+        with pytest.raises(KeyError):
+            reader.get_record_list("HTA0", "Unknown")
+
+
+def test_stale_index(tmp_path):
+    json_file = str(tmp_path / "sim.json")
+    write_indexed_data_set(json_file, 4)
+    with open(json_file, "ab") as out:
+        out.write(b"\n")
+    with pytest.raises(json_index.JsonIndexError):
+        json_index.IndexedJsonReader(json_file)
+
+
+def test_stale_index_same_size(tmp_path):
+    json_file = str(tmp_path / "sim.json")
+    write_indexed_data_set(json_file, 4)
+    stat = os.stat(json_file)
+    with open(json_file, "rb") as fd:
+        data = fd.read()
+
+    # A rewrite of the same size is stale, even at the same modification time
+    with open(json_file, "wb") as out:
+        out.write(data.replace(b"HTA0", b"HTA9"))
+    os.utime(json_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    with pytest.raises(json_index.JsonIndexError):
+        json_index.IndexedJsonReader(json_file)
+
+    # As is the same content, modified later
+    with open(json_file, "wb") as out:
+        out.write(data)
+    os.utime(json_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    with pytest.raises(json_index.JsonIndexError):
+        json_index.IndexedJsonReader(json_file)
+    os.utime(json_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    with json_index.IndexedJsonReader(json_file) as reader:
+        assert reader.get_num_atlases() == 3
+
+
+def test_unflushed_index(tmp_path):
+    json_file = str(tmp_path / "sim.json")
+    index_writer = json_index.JsonIndexWriter(
+        json_index.get_index_path(json_file), json_file
+    )
+    with open(json_file, "wb") as out:
+        out.write(b"{}")
+        with pytest.raises(json_index.JsonIndexError):
+            index_writer.close(2)
+
+
+def test_get_schemas(tmp_path):
+    json_file = str(tmp_path / "sim.json")
+    atlas_list, schema_list = write_indexed_data_set(json_file, 4)
+    with json_index.IndexedJsonReader(json_file) as reader:
+        assert reader.get_schemas() == schema_list
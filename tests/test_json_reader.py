@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import json
 import os
 
 """
@@ -8,6 +9,9 @@ Unit Test for HTAN JSON Reader.
 """
 from hsim import json_reader
 from hsim import cli
+from hsim import json_index
+from hsim import json_writer
+from hsim import shard
 
 
 def test_load():
@@ -44,3 +48,134 @@ def test_broken_links():
         == "Within Biospecimen, we have bts:HTANParentID:HTA0_10000, but this ID does not "
         "exist within the Biospecimen or Demographics list."
     )
+
+
+def test_id_index():
+    template_list = []
+    template_list.append(["bts:ScRNA-seqLevel1", cli.ASSAY_TYPE])
+
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim.json")
+    reader = json_reader.HtanJsonReader(fname, template_list)
+    id_index = reader.get_id_index(0)
+    assert "HTA0_0" in id_index.participant_id_set
+    assert "HTA0_0_0" in id_index.sample_id_set
+    assert "HTA0_0" not in id_index.sample_id_set
+    assert id_index.get_participant_position("HTA0_1") == 1
+    assert id_index.get_sample_position("HTA0_0_1") == 1
+    assert id_index.get_sample_position("HTA0_0_10000") is None
+
+
+def test_streaming():
+    template_list = cli.get_template_list()
+
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim_broken_links.json")
+    reader = json_reader.HtanJsonReader(fname, template_list)
+    stream_reader = json_reader.HtanJsonReader(fname, template_list, streaming=True)
+    assert stream_reader.get_doc() is None
+    assert stream_reader.get_num_atlases() == 1
+    assert stream_reader.get_error_list() == reader.get_error_list()
+    assert len(stream_reader.get_error_list()) == 2
+
+
+def test_compact():
+    template_list = cli.get_template_list()
+
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim_broken_links.json")
+    reader = json_reader.HtanJsonReader(fname, template_list)
+    compact_reader = json_reader.HtanJsonReader(fname, template_list, compact=True)
+    assert compact_reader.get_doc() is None
+    assert compact_reader.get_error_list() == reader.get_error_list()
+    data_set = compact_reader.get_data_set()
+    assert data_set.get_num_atlases() == 1
+    assert list(data_set.iter_atlases()) == reader.get_doc()["atlases"]
+    assert data_set.get_schemas() == reader.get_doc()["schemas"]
+    assert reader.get_data_set() is None
+
+
+def test_facets(tmp_path):
+    template_list = cli.get_template_list()
+
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim_broken_links.json")
+    reader = json_reader.HtanJsonReader(fname, template_list, facets=True)
+    assert reader.get_doc() is not None
+    facet_index = reader.get_facet_index()
+    gender_counts = facet_index.get_facet_counts("Demographics", "bts:Gender")
+    assert sum(gender_counts.values()) == len(
+        reader.get_doc()["atlases"][0]["Demographics"]["record_list"]
+    )
+    assert json_reader.HtanJsonReader(fname, template_list).get_facet_index() is None
+
+    # Sharded data sets are indexed in a single process, in atlas order
+    with open(fname) as fd:
+        doc = json.load(fd)
+    manifest_path = tmp_path / "sim.json"
+    writer = shard.ShardedJsonWriter(manifest_path, 1, None, 4)
+    for i in range(3):
+        atlas = dict(doc["atlases"][0])
+        atlas["htan_id"] = "HTA%d" % i
+        writer.write_atlas(atlas)
+    writer.write_schemas(doc["schemas"])
+    for streaming in [False, True]:
+        shard_reader = json_reader.HtanJsonReader(
+            str(manifest_path),
+            template_list,
+            streaming=streaming,
+            num_workers=2,
+            facets=True,
+        )
+        shard_index = shard_reader.get_facet_index()
+        assert shard_index.get_atlas_ids() == ["HTA0", "HTA1", "HTA2"]
+        assert shard_index.get_facet_counts(
+            "Demographics", "bts:Gender", atlas="HTA2"
+        ) == gender_counts
+
+
+def test_streaming_schemas_first(tmp_path):
+    template_list = cli.get_template_list()
+
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim_broken_links.json")
+    with open(fname) as fd:
+        doc = json.load(fd)
+    doc["atlases"] = doc["atlases"] * 3
+    doc = {"schemas": doc["schemas"], "atlases": doc["atlases"]}
+    fname = str(tmp_path / "sim.json")
+    with open(fname, "w") as out:
+        json.dump(doc, out)
+
+    reader = json_reader.HtanJsonReader(fname, template_list)
+    stream_reader = json_reader.HtanJsonReader(fname, template_list, streaming=True)
+    assert stream_reader.get_num_atlases() == 3
+    assert len(stream_reader.get_error_list()) == 6
+    assert stream_reader.get_error_list() == reader.get_error_list()
+
+
+def test_workers_indexed(tmp_path):
+    template_list = cli.get_template_list()
+
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim_broken_links.json")
+    with open(fname) as fd:
+        doc = json.load(fd)
+    fname = str(tmp_path / "sim.json")
+    index_writer = json_index.JsonIndexWriter(json_index.get_index_path(fname), fname)
+    with open(fname, "wb") as out:
+        writer = json_writer.HtanJsonWriter(out, 4, index_writer)
+        for i in range(5):
+            atlas = dict(doc["atlases"][0])
+            atlas["htan_id"] = "HTA%d" % i
+            writer.write_atlas(atlas)
+        writer.write_schemas(doc["schemas"])
+    index_writer.close(writer.num_bytes)
+
+    reader = json_reader.HtanJsonReader(fname, template_list)
+    worker_reader = json_reader.HtanJsonReader(fname, template_list, num_workers=2)
+    assert worker_reader.get_doc() is None
+    assert worker_reader.get_num_atlases() == 5
+    assert len(worker_reader.get_error_list()) == 10
+    assert worker_reader.get_error_list() == reader.get_error_list()
+
+    # A stale index is ignored
+    with open(fname, "ab") as out:
+        out.write(b"\n")
+    worker_reader = json_reader.HtanJsonReader(fname, template_list, num_workers=2)
+    assert worker_reader.get_doc() is not None
+    assert worker_reader.get_error_list() == reader.get_error_list()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the Incremental JSON Parser.
+"""
+import io
+import json
+import pytest
+from hsim import json_stream
+
+
+def get_doc():
+    doc = {}
+    doc["atlases"] = [{"a": 'x\\"y\n', "b": [1, 2.5e3, -3, True, None, {}]}, [], "z"]
+    doc["schemas"] = [{"data_schema": "Demographics", "attributes": []}]
+    doc["count"] = 12345
+    doc["name"] = "caf\u00e9 \u2265"
+    return doc
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 4])
+def test_read(chunk_size, indent):
+    doc = get_doc()
+    fd = io.BytesIO(json.dumps(doc, indent=indent).encode("utf-8"))
+    stream_reader = json_stream.JsonStreamReader(fd, chunk_size)
+    stream_doc = {}
+    for key in stream_reader.iter_keys():
+        if key == "atlases":
+            stream_doc[key] = list(stream_reader.iter_array())
+        else:
+            stream_doc[key] = stream_reader.read_value()
+    assert stream_doc == doc
+
+
+def test_read_raw():
+    doc = get_doc()
+    fd = io.BytesIO(json.dumps(doc).encode("utf-8"))
+    stream_reader = json_stream.JsonStreamReader(fd, 5)
+    for key in stream_reader.iter_keys():
+        if key == "atlases":
+            raw_list = list(stream_reader.iter_array(raw=True))
+        else:
+            stream_reader.skip_value()
+    assert [json.loads(raw) for raw in raw_list] == doc["atlases"]
+    assert raw_list[2] == '"z"'
+
+
+def test_skip():
+    fd = io.BytesIO(json.dumps(get_doc()).encode("utf-8"))
+    stream_reader = json_stream.JsonStreamReader(fd, 2)
+    key_list = []
+    for key in stream_reader.iter_keys():
+        key_list.append(key)
+        stream_reader.skip_value()
+    assert key_list == ["atlases", "schemas", "count", "name"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1 << 20])
+@pytest.mark.parametrize(
+    "skipped",
+    [
+        [{"a]": "}{[", "b": ['\\"]', "\\", "x\\\"]"]}, [[], {}], "\u2265]"],
+        [{"a]": "}{[", "b": ["]]", "{x}", [1, "]"]]}, [[], {}], "]"],
+    ],
+)
+def test_skip_scan(chunk_size, skipped):
+    # Brackets, quotes and escapes within strings do not end the skipped value
+    doc = {"atlases": skipped, "schemas": ["[", "}"], "count": -1.5e-3}
+    fd = io.BytesIO(json.dumps(doc).encode("utf-8"))
+    stream_reader = json_stream.JsonStreamReader(fd, chunk_size)
+    value_dict = {}
+    for key in stream_reader.iter_keys():
+        if key == "atlases":
+            stream_reader.skip_value()
+        else:
+            value_dict[key] = stream_reader.read_value()
+    assert value_dict == {"schemas": ["[", "}"], "count": -1.5e-3}
+
+
+@pytest.mark.parametrize("data", ['{"atlases": [{"a": 1]]}', '{"atlases": [1, "]'])
+def test_skip_invalid(data):
+    stream_reader = json_stream.JsonStreamReader(io.BytesIO(data.encode("utf-8")), 3)
+    with pytest.raises(json_stream.JsonStreamError):
+        for key in stream_reader.iter_keys():
+            stream_reader.skip_value()
+
+
+def test_truncated():
+    fd = io.BytesIO(json.dumps(get_doc()).encode("utf-8")[:20])
+    stream_reader = json_stream.JsonStreamReader(fd, 4)
+    with pytest.raises(json_stream.JsonStreamError):
+        for key in stream_reader.iter_keys():
+            stream_reader.skip_value()
+
+
+def test_invalid_early():
+    # A syntax error is raised at once, without reading the rest of the stream
+    element = json.dumps({"a": ["x" * 100, 1.5, None]})
+    data = '{"atlases": [%s, {"a": [1 2]}, %s]}' % (
+        element,
+        ", ".join([element] * 10000),
+    )
+    fd = io.BytesIO(data.encode("utf-8"))
+    stream_reader = json_stream.JsonStreamReader(fd, 1024)
+    with pytest.raises(json_stream.JsonStreamError):
+        for key in stream_reader.iter_keys():
+            for element in stream_reader.iter_array():
+                pass
+    assert fd.tell() < 10000
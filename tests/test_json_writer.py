@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for HTAN JSON Writer.
+"""
+import io
+import json
+from hsim import json_writer
+
+
+def get_data_set():
+    data_set = {}
+    atlas = {}
+    atlas["htan_id"] = "HTA0"
+    atlas["htan_name"] = "HTAN Atlas 0"
+    atlas["Demographics"] = {
+        "data_schema": "bts:Demographics",
+        "data_link": "https://www.synapse.org/#!Synapse:synXXXX/tables/YYYYY",
+        "record_list": [["bts:Demographics", "HTA0_0", 12], ["x", "y\n", 3]],
+    }
+    atlas["Biospecimen"] = {"data_schema": "bts:Biospecimen", "record_list": []}
+    data_set["atlases"] = [atlas, {}, atlas]
+    data_set["schemas"] = [{"data_schema": "Demographics", "attributes": []}]
+    return data_set
+
+
+def write_data_set(data_set, indent):
+    out = io.BytesIO()
+    writer = json_writer.HtanJsonWriter(out, indent)
+    for atlas in data_set["atlases"]:
+        writer.write_atlas(atlas)
+    writer.write_schemas(data_set["schemas"])
+    return out.getvalue().decode("utf-8")
+
+
+def test_write_indented():
+    data_set = get_data_set()
+    assert write_data_set(data_set, 4) == json.dumps(data_set, indent=4)
+    assert write_data_set(data_set, 2) == json.dumps(data_set, indent=2)
+
+
+def test_write_compact():
+    data_set = get_data_set()
+    assert write_data_set(data_set, None) == json.dumps(
+        data_set, separators=(",", ":")
+    )
+
+
+def test_write_no_atlases():
+    data_set = get_data_set()
+    data_set["atlases"] = []
+    assert write_data_set(data_set, 4) == json.dumps(data_set, indent=4)
+    assert write_data_set(data_set, None) == json.dumps(
+        data_set, separators=(",", ":")
+    )
+
+
+def test_close():
+    data_set = get_data_set()
+    out = io.BytesIO()
+    writer = json_writer.HtanJsonWriter(out, 4)
+    for atlas in data_set["atlases"]:
+        writer.write_atlas(atlas)
+    writer.close()
+    assert out.getvalue().decode("utf-8") == json.dumps(
+        {"atlases": data_set["atlases"]}, indent=4
+    )
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the Bounded Producer / Consumer Pipeline.
+"""
+import threading
+import pytest
+from hsim import pipeline
+
+
+def get_stage_list(output_list):
+    stage_list = []
+    stage_list.append(pipeline.Stage("square", lambda x: x * x))
+    stage_list.append(pipeline.Stage("format", lambda x: "%d" % x, len))
+    stage_list.append(pipeline.Stage("collect", output_list.append))
+    return stage_list
+
+
+@pytest.mark.parametrize("threaded", [True, False])
+def test_run(threaded):
+    output_list = []
+    atlas_pipeline = pipeline.Pipeline(
+        "count", get_stage_list(output_list), queue_size=2, threaded=threaded
+    )
+    atlas_pipeline.run(range(100))
+    assert output_list == ["%d" % (x * x) for x in range(100)]
+
+    stats_list = atlas_pipeline.get_stats()
+    assert [stats["name"] for stats in stats_list] == [
+        "count",
+        "square",
+        "format",
+        "collect",
+    ]
+    assert [stats["items"] for stats in stats_list] == [100] * 4
+    assert stats_list[2]["bytes"] == sum(len("%d" % (x * x)) for x in range(100))
+    assert stats_list[1]["bytes"] == 0
+
+
+@pytest.mark.parametrize("threaded", [True, False])
+def test_applies_to(threaded):
+    output_list = []
+    stage_list = []
+    stage_list.append(
+        pipeline.Stage("odd", lambda x: "%d" % x, len, lambda x: x % 2 == 1)
+    )
+    stage_list.append(pipeline.Stage("collect", output_list.append))
+    atlas_pipeline = pipeline.Pipeline(
+        "count",
+        stage_list,
+        queue_size=2,
+        threaded=threaded,
+        source_counts=lambda x: x < 10,
+    )
+    atlas_pipeline.run(range(100))
+    assert output_list == [x if x % 2 == 0 else "%d" % x for x in range(100)]
+
+    stats_list = atlas_pipeline.get_stats()
+    assert [stats["items"] for stats in stats_list] == [10, 50, 100]
+    assert stats_list[1]["bytes"] == sum(len("%d" % x) for x in range(1, 100, 2))
+
+
+def fail_at(value):
+    def fail(x):
+        if x == value:
+            raise ValueError("Failed at %d" % x)
+        return x
+
+    return fail
+
+
+@pytest.mark.parametrize("threaded", [True, False])
+@pytest.mark.parametrize("position", [0, 1, 2])
+def test_error(threaded, position):
+    def source():
+        for x in range(1000):
+            if position == 0 and x == 10:
+                raise ValueError("Failed at %d" % x)
+            yield x
+
+    output_list = []
+    stage_list = []
+    stage_list.append(pipeline.Stage("first", fail_at(10 if position == 1 else -1)))
+    stage_list.append(pipeline.Stage("last", fail_at(10 if position == 2 else -1)))
+    stage_list.append(pipeline.Stage("collect", output_list.append))
+    atlas_pipeline = pipeline.Pipeline("source", stage_list, queue_size=2, threaded=threaded)
+    num_threads = threading.active_count()
+    with pytest.raises(ValueError, match="Failed at 10"):
+        atlas_pipeline.run(source())
+    assert output_list == list(range(len(output_list)))
+    assert len(output_list) <= 10
+    assert threading.active_count() == num_threads
+
+
+def test_close_source():
+    closed_list = []
+
+    def source():
+        try:
+            for x in range(1000):
+                yield x
+        finally:
+            closed_list.append(threading.current_thread())
+
+    stage_list = [pipeline.Stage("fail", fail_at(3))]
+    atlas_pipeline = pipeline.Pipeline("source", stage_list + stage_list)
+    with pytest.raises(ValueError):
+        atlas_pipeline.run(source())
+    assert len(closed_list) == 1
+    assert closed_list[0] is not threading.main_thread()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for Per-Stage Profiling.
+"""
+from hsim import profiling
+
+
+def test_null_profiler():
+    assert not profiling.get_profiler().is_enabled()
+    with profiling.stage("generate_values", "HTA1", "bts:Demographics"):
+        pass
+    assert profiling.get_profiler().pop_records() == []
+
+
+def test_stage_profiler():
+    profiler = profiling.StageProfiler()
+    previous = profiling.activate(profiler)
+    try:
+        with profiling.stage("total"):
+            for atlas_id in ["HTA1", "HTA2"]:
+                with profiling.stage("generate_values", atlas_id, "bts:Diagnosis"):
+                    value_list = [str(x) for x in range(10000)]
+                del value_list
+    finally:
+        profiling.activate(previous)
+        profiler.close()
+
+    report = profiler.get_report()
+    assert report["stages"]["total"]["calls"] == 1
+    values = report["stages"]["generate_values"]
+    assert values["calls"] == 2
+    assert values["peak_memory_bytes"] > 0
+    assert report["stages"]["total"]["peak_memory_bytes"] >= values["peak_memory_bytes"]
+    assert report["stages"]["total"]["wall_seconds"] >= values["wall_seconds"]
+    assert list(report["atlases"]) == ["HTA1", "HTA2"]
+    assert report["atlases"]["HTA1"]["generate_values"]["calls"] == 1
+    assert report["templates"]["bts:Diagnosis"]["generate_values"]["calls"] == 2
+
+
+def test_add_records():
+    profiler = profiling.StageProfiler(trace_memory=False)
+    with profiler.stage("serialize", "HTA1"):
+        pass
+    record_list = profiler.pop_records()
+    assert len(record_list) == 1
+    assert profiler.pop_records() == []
+    profiler.add_records(record_list)
+    profiler.add_records(record_list)
+    report = profiler.get_report()
+    assert report["stages"]["serialize"]["calls"] == 2
+    assert report["stages"]["serialize"]["peak_memory_bytes"] == 0
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for Scale Parameters.
+"""
+import json
+import random
+import pytest
+from hsim import scale
+
+
+def test_sample_distribution_parse():
+    assert scale.SampleDistribution.parse(4).choice_list == [4]
+    assert scale.SampleDistribution.parse("4").is_fixed()
+    assert scale.SampleDistribution.parse("2-4").choice_list == [2, 3, 4]
+    assert scale.SampleDistribution.parse({"min": 1, "max": 2}).choice_list == [1, 2]
+    distribution = scale.SampleDistribution.parse(
+        {"choices": [2, 6], "weights": [3, 1]}
+    )
+    assert distribution.get_max() == 6
+    for spec in ["x", "4-2", {"min": 3}, True, -1]:
+        with pytest.raises(ValueError):
+            scale.SampleDistribution.parse(spec)
+
+
+def test_sample_distribution_draw():
+    rng = random.Random(0)
+    distribution = scale.SampleDistribution.parse("2-4")
+    draw_list = [distribution.draw(rng) for x in range(100)]
+    assert set(draw_list) == {2, 3, 4}
+
+    # Fixed distributions leave the random state alone
+    state = rng.getstate()
+    assert scale.SampleDistribution.parse(6).draw(rng) == 6
+    assert rng.getstate() == state
+
+
+def test_load_scale_config(tmp_path):
+    config = {
+        "num_participants": 100,
+        "samples_per_participant": "1-3",
+        "max_lineage_depth": 2,
+        "template_multipliers": {"bts:ScRNA-seqLevel1": 4},
+    }
+    config_file = tmp_path / "scale.json"
+    config_file.write_text(json.dumps(config))
+    scale_params = scale.load_scale_config(str(config_file))
+    assert scale_params.num_participants == 100
+    assert scale_params.sample_distribution.choice_list == [1, 2, 3]
+    assert scale_params.get_multiplier("bts:ScRNA-seqLevel1") == 4
+    assert scale_params.get_multiplier("bts:Demographics") == 1
+    assert scale.ScaleParams.from_dict(scale_params.to_dict()).to_dict() == (
+        scale_params.to_dict()
+    )
+
+    with pytest.raises(ValueError):
+        scale.ScaleParams.from_dict({"num_participant": 100})
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"num_participants": "5"},
+        {"num_participants": True},
+        {"num_participants": 2.5},
+        {"max_lineage_depth": "2"},
+        {"template_multipliers": {"bts:ScRNA-seqLevel1": "4"}},
+        {"template_multipliers": ["bts:ScRNA-seqLevel1"]},
+        {"samples_per_participant": {"min": "1", "max": 3}},
+        {"samples_per_participant": {"choices": [1, "2"]}},
+        {"samples_per_participant": {"choices": [1, 2], "weights": [1, "2"]}},
+        {"samples_per_participant": {"choices": 2}},
+        [],
+    ],
+)
+def test_from_dict_types(params):
+    with pytest.raises(ValueError):
+        scale.ScaleParams.from_dict(params)
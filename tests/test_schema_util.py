@@ -5,7 +5,9 @@
 Unit Test for schema_util.
 """
 from hsim import schema_util
+import pytest
 import random
+import shutil
 
 
 def test_load_schema():
@@ -95,3 +97,109 @@ def test_get_front_end_schema():
     assert values[1] == "HTA1_0"
     assert values[2] == "not reported"
     assert values[3] == "unspecified"
+
+
+def test_compile_template_plan():
+    schema_dict = schema_util.load_htan_schema()
+    template_plan = schema_util.compile_template_plan(schema_dict, "bts:Demographics")
+    assert template_plan.label == "Demographics"
+    assert len(template_plan.column_list) == 12
+    assert template_plan.column_list[0].kind == schema_util.ColumnPlan.TEMPLATE_ID
+    assert template_plan.column_list[1].kind == schema_util.ColumnPlan.HTAN_ID
+    assert template_plan.column_list[2].kind == schema_util.ColumnPlan.LIST
+    assert len(template_plan.column_list[3].option_list) == 5
+    assert template_plan.column_list[6].kind == schema_util.ColumnPlan.NUMERIC
+
+
+def test_get_template_plan_cache():
+    schema_util.clear_template_plan_cache()
+    schema_dict = schema_util.load_htan_schema()
+    plan1 = schema_util.get_template_plan(schema_dict, "bts:Biospecimen")
+    plan2 = schema_util.get_template_plan(
+        schema_util.load_htan_schema(), "bts:Biospecimen"
+    )
+    assert plan1 is plan2
+
+
+def test_get_schema_hash_plain_dict(monkeypatch):
+    schema_util.clear_template_plan_cache()
+    schema_dict = dict(schema_util.load_htan_schema())
+    content_hash = schema_util.get_schema_hash(schema_dict)
+    plan1 = schema_util.get_template_plan(schema_dict, "bts:Biospecimen")
+
+    # The hash of a plain dict is only computed once
+    def dumps(*args, **kwargs):
+        raise AssertionError("Schema hashed again")
+
+    monkeypatch.setattr(schema_util.json, "dumps", dumps)
+    assert schema_util.get_schema_hash(schema_dict) == content_hash
+    assert schema_util.get_template_plan(schema_dict, "bts:Biospecimen") is plan1
+    monkeypatch.undo()
+
+    # Equal dicts share plans, and distinct schemas are told apart
+    assert schema_util.get_schema_hash(dict(schema_dict)) == content_hash
+    assert schema_util.get_schema_hash({"bts:A": {}}) != content_hash
+
+
+def test_generate_plan_record():
+    schema_dict = schema_util.load_htan_schema()
+    template_plan = schema_util.get_template_plan(schema_dict, "bts:Biospecimen")
+    random.seed(0)
+    values1 = schema_util.generate_plan_record(template_plan, "HTA1_0_1", "HTA1_0")
+    random.seed(0)
+    object_list = schema_util.extract_template(schema_dict, "bts:Biospecimen")
+    values2 = [
+        schema_util.generate_simulated_data(
+            schema_object, "bts:Biospecimen", "HTA1_0_1", "HTA1_0"
+        )
+        for schema_object in object_list
+    ]
+    assert values1 == values2
+    assert values1[0] == "bts:Biospecimen"
+
+
+def test_load_htan_schema(tmp_path):
+    schema_path = tmp_path / "HTAN.jsonld"
+    shutil.copy(schema_util.SCHEMA_PATH, schema_path)
+    schema_dict = schema_util.load_htan_schema(str(schema_path))
+    assert len(schema_dict) == 4423
+    assert schema_dict.content_hash == schema_util.load_htan_schema().content_hash
+    template_plan = schema_util.get_template_plan(schema_dict, "bts:Demographics")
+    assert len(template_plan.column_list) == 12
+
+    # Any change to the schema content changes its hash
+    schema_path.write_text(schema_path.read_text() + "\n")
+    schema_dict = schema_util.load_htan_schema(str(schema_path))
+    assert len(schema_dict) == 4423
+    assert schema_dict.content_hash != schema_util.load_htan_schema().content_hash
+
+
+def test_generate_plan_records():
+    pytest.importorskip("numpy")
+    schema_dict = schema_util.load_htan_schema()
+    template_plan = schema_util.get_template_plan(schema_dict, "bts:Biospecimen")
+    htan_id_list = ["HTA1_0_0", "HTA1_0_1"]
+    parent_id_list = ["HTA1_0", "HTA1_0_0"]
+    record_list1 = schema_util.generate_plan_records(
+        template_plan, htan_id_list, parent_id_list, schema_util.get_numpy_rng(5)
+    )
+    record_list2 = schema_util.generate_plan_records(
+        template_plan, htan_id_list, parent_id_list, schema_util.get_numpy_rng(5)
+    )
+    assert record_list1 == record_list2
+    assert len(record_list1) == 2
+    for record, htan_id, parent_id in zip(record_list1, htan_id_list, parent_id_list):
+        assert len(record) == len(template_plan.column_list)
+        for value, column in zip(record, template_plan.column_list):
+            if column.kind == schema_util.ColumnPlan.HTAN_ID:
+                assert value == htan_id
+            elif column.kind == schema_util.ColumnPlan.PARENT_ID:
+                assert value == parent_id
+            elif column.kind == schema_util.ColumnPlan.TEMPLATE_ID:
+                assert value == "bts:Biospecimen"
+            elif column.kind == schema_util.ColumnPlan.NUMERIC:
+                assert type(value) == int and 0 <= value <= 100
+            elif column.kind == schema_util.ColumnPlan.LIST:
+                assert value in column.option_list
+            else:
+                assert value.startswith("lorem_ipsum_")
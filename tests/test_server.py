@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for the Generation Server.
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from hsim import cli
+from hsim import schema_util
+from hsim import server
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    schema_dict = schema_util.load_htan_schema()
+    service = server.AtlasService(schema_dict, cli.get_template_list(), 2)
+    http_server = server.make_server(service, port=0)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % http_server.server_address[1]
+    http_server.shutdown()
+    http_server.server_close()
+
+
+def get_json(url):
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def test_atlas_cache():
+    cache = server.AtlasCache(2)
+    call_list = []
+
+    def generate(key):
+        call_list.append(key)
+        return {"htan_id": key}
+
+    assert cache.get("a", lambda: generate("a")) == {"htan_id": "a"}
+    cache.get("a", lambda: generate("a"))
+    cache.get("b", lambda: generate("b"))
+    cache.get("c", lambda: generate("c"))
+    cache.get("a", lambda: generate("a"))
+    assert call_list == ["a", "b", "c", "a"]
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+    assert stats["evictions"] == 2
+    assert stats["num_atlases"] == 2
+
+
+def test_get_atlas(base_url):
+    schema_dict = schema_util.load_htan_schema()
+    template_list = cli.get_template_list()
+    expected_atlas = cli.generate_seeded_atlas(
+        ["HTA1", "HTAN Atlas 1"], 7, schema_dict, template_list
+    )
+    assert get_json(base_url + "/atlases/HTA1?seed=7") == expected_atlas
+    assert (
+        get_json(base_url + "/atlases/HTA1/Biospecimen?seed=7")
+        == expected_atlas["Biospecimen"]
+    )
+    stats = get_json(base_url + "/stats")
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_get_scaled_atlas(base_url):
+    atlas = get_json(
+        base_url + "/atlases/HTA0?seed=1&participants=2&samples_per_participant=1"
+        "&template_multiplier=bts:ScRNA-seqLevel1%3D3"
+    )
+    assert len(atlas["Demographics"]["record_list"]) == 2
+    assert len(atlas["Biospecimen"]["record_list"]) == 2
+    assert len(atlas["ScRNA-seqLevel1"]["record_list"]) == 6
+
+
+def test_get_schemas(base_url):
+    schema_list = get_json(base_url + "/schemas")
+    assert schema_list[0]["data_schema"] == "Demographics"
+
+
+def test_errors(base_url):
+    for path, status in [
+        ("/atlases/HTA0?seed=x", 400),
+        ("/atlases/HTA0?template_multiplier=bts:Biospecimen%3D2", 400),
+        ("/atlases/HTA0/Unknown", 404),
+        ("/unknown", 404),
+    ]:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(base_url + path)
+        assert e.value.code == status
+        assert "error" in json.loads(e.value.read())
+
+
+def test_internal_error(base_url, monkeypatch, capsys):
+    def get_atlas(self, atlas_id, query_dict):
+        raise RuntimeError("Broken generator")
+
+    monkeypatch.setattr(server.AtlasService, "get_atlas", get_atlas)
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(base_url + "/atlases/HTA0")
+    assert e.value.code == 500
+    assert json.loads(e.value.read()) == {
+        "error": "Internal server error:  RuntimeError"
+    }
+    assert "RuntimeError: Broken generator" in capsys.readouterr().err
+
+    # The server still handles requests after the error
+    monkeypatch.undo()
+    assert get_json(base_url + "/schemas")[0]["data_schema"] == "Demographics"
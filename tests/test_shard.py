@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for Sharded Output.
+"""
+import hashlib
+import json
+import os
+from hsim import cli
+from hsim import json_reader
+from hsim import shard
+
+
+def write_sharded_data(manifest_path, num_atlases, atlases_per_shard=None, max_shard_bytes=None):
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim_broken_links.json")
+    with open(fname) as fd:
+        doc = json.load(fd)
+    writer = shard.ShardedJsonWriter(manifest_path, atlases_per_shard, max_shard_bytes)
+    for i in range(num_atlases):
+        atlas = dict(doc["atlases"][0])
+        atlas["htan_id"] = "HTA%d" % i
+        writer.write_atlas(atlas)
+    writer.write_schemas(doc["schemas"])
+    return doc
+
+
+def test_get_atlases_per_shard():
+    assert shard.get_atlases_per_shard(5, 2) == 3
+    assert shard.get_atlases_per_shard(4, 2) == 2
+    assert shard.get_atlases_per_shard(2, 4) == 1
+    assert shard.get_atlases_per_shard(0, 4) == 1
+
+
+def test_write_shards(tmp_path):
+    manifest_path = tmp_path / "sim.json"
+    doc = write_sharded_data(manifest_path, 5, atlases_per_shard=2)
+    manifest = shard.read_manifest(manifest_path)
+    assert manifest["num_atlases"] == 5
+    assert [entry["atlases"] for entry in manifest["shards"]] == [
+        ["HTA0", "HTA1"],
+        ["HTA2", "HTA3"],
+        ["HTA4"],
+    ]
+    num_records = shard.count_records(doc["atlases"][0])
+    assert manifest["num_records"] == 5 * num_records
+    assert manifest["shards"][2]["num_records"] == num_records
+
+    for entry in manifest["shards"] + [manifest["schemas"]]:
+        data = (tmp_path / entry["path"]).read_bytes()
+        assert len(data) == entry["bytes"]
+        assert hashlib.sha256(data).hexdigest() == entry["sha256"]
+    assert manifest["shards"][1]["path"] == "sim.shard-00001.json"
+    schemas_doc = json.loads((tmp_path / "sim.schemas.json").read_text())
+    assert schemas_doc == {"atlases": [], "schemas": doc["schemas"]}
+    shard_doc = json.loads((tmp_path / "sim.shard-00002.json").read_text())
+    assert list(shard_doc) == ["atlases"]
+
+
+def test_write_max_shard_bytes(tmp_path):
+    manifest_path = tmp_path / "sim.json"
+    write_sharded_data(manifest_path, 4, max_shard_bytes=1)
+    manifest = shard.read_manifest(manifest_path)
+    assert len(manifest["shards"]) == 4
+
+
+def test_read_manifest_data_set():
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim.json")
+    assert shard.read_manifest(fname) is None
+
+
+def test_check_links_sharded(tmp_path):
+    template_list = cli.get_template_list()
+    manifest_path = tmp_path / "sim.json"
+    doc = write_sharded_data(manifest_path, 3, atlases_per_shard=2)
+    doc["atlases"] = [doc["atlases"][0]] * 3
+    fname = str(tmp_path / "whole.json")
+    with open(fname, "w") as out:
+        json.dump(doc, out)
+    expected_error_list = json_reader.HtanJsonReader(fname, template_list).get_error_list()
+    assert len(expected_error_list) == 6
+
+    for streaming, num_workers in [(False, 1), (True, 1), (False, 2), (True, 2)]:
+        reader = json_reader.HtanJsonReader(
+            str(manifest_path), template_list, streaming, num_workers
+        )
+        assert reader.get_manifest()["num_atlases"] == 3
+        assert reader.get_num_atlases() == 3
+        assert reader.get_error_list() == expected_error_list
+
+
+def test_check_links_corrupt_shard(tmp_path):
+    template_list = cli.get_template_list()
+    manifest_path = tmp_path / "sim.json"
+    write_sharded_data(manifest_path, 3, atlases_per_shard=2)
+    shard_path = tmp_path / "sim.shard-00000.json"
+    shard_path.write_bytes(shard_path.read_bytes().replace(b"HTA1", b"HTA9"))
+    os.remove(tmp_path / "sim.shard-00001.json")
+
+    for streaming, num_workers in [(False, 1), (True, 1), (False, 2)]:
+        reader = json_reader.HtanJsonReader(
+            str(manifest_path), template_list, streaming, num_workers
+        )
+        error_list = reader.get_error_list()
+        assert error_list[:4] == [
+            "File sim.shard-00000.json does not match its checksum in the manifest.",
+            "Shard sim.shard-00000.json holds atlases ['HTA0', 'HTA9'], "
+            "but the manifest lists ['HTA0', 'HTA1'].",
+            "File sim.shard-00001.json is missing.",
+            "Found 2 atlases, but the manifest lists 3.",
+        ]
+
+
+def test_check_links_sharded_compressed(tmp_path):
+    template_list = cli.get_template_list()
+    manifest_path = tmp_path / "sim.json.gz"
+    write_sharded_data(manifest_path, 3, atlases_per_shard=2)
+    assert (tmp_path / "sim.shard-00001.json.gz").exists()
+    assert (tmp_path / "sim.schemas.json.gz").exists()
+    manifest = shard.read_manifest(manifest_path)
+    data = (tmp_path / "sim.shard-00000.json.gz").read_bytes()
+    assert hashlib.sha256(data).hexdigest() == manifest["shards"][0]["sha256"]
+
+    for streaming in [False, True]:
+        reader = json_reader.HtanJsonReader(
+            str(manifest_path), template_list, streaming=streaming
+        )
+        assert reader.get_num_atlases() == 3
+        assert len(reader.get_error_list()) == 6
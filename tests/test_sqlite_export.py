@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for SQLite Export.
+"""
+import json
+import os
+import sqlite3
+import pytest
+from hsim import cli
+from hsim import json_reader
+from hsim import schema_util
+from hsim import sqlite_export
+
+
+def get_fname(name):
+    return os.path.join(os.path.dirname(__file__), "test_data", name)
+
+
+def export_database(json_file, db_path, batch_size=sqlite_export.BATCH_SIZE):
+    exporter = sqlite_export.SqliteExporter(
+        db_path, json_reader.read_schemas(json_file), batch_size
+    )
+    for atlas in json_reader.iter_atlases(json_file):
+        exporter.write_atlas(atlas)
+    exporter.close()
+    return exporter
+
+
+def test_get_column_names():
+    attribute_list = [
+        {"id": "bts:Component"},
+        {"id": "bts:WorkflowType"},
+        {"id": "bts:workflowtype"},
+        {"id": "bts:atlas_id"},
+    ]
+    assert sqlite_export.get_column_names(attribute_list) == [
+        "Component",
+        "WorkflowType",
+        "workflowtype_2",
+        "atlas_id_2",
+    ]
+
+
+def test_get_table_spec_list():
+    schema_list = cli.compile_templates(
+        schema_util.load_htan_schema(), cli.get_template_list()
+    )
+    table_spec_list = sqlite_export.get_table_spec_list(schema_list)
+    label_list = [label for label, column_name_list in table_spec_list]
+    assert label_list.count("FollowUp") == 1
+    assert len(label_list) < len(schema_list)
+    column_name_dict = dict(table_spec_list)
+    column_name_list = column_name_dict["BulkWESLevel3"]
+    assert "GermlineVariantsWorkflowType_2" in column_name_list
+    assert len(column_name_list) == len(set(column_name_list))
+
+
+def test_export(tmp_path):
+    fname = get_fname("sim.json")
+    db_path = tmp_path / "sim.db"
+    exporter = export_database(fname, db_path, batch_size=7)
+    assert not (tmp_path / "sim.db.tmp").exists()
+    atlas_list = list(json_reader.iter_atlases(fname))
+
+    connection = sqlite3.connect(str(db_path))
+    for label, num_rows in exporter.get_table_list():
+        record_list = [
+            record for atlas in atlas_list for record in atlas[label]["record_list"]
+        ]
+        row_list = connection.execute(
+            "SELECT * FROM %s ORDER BY rowid" % sqlite_export.quote(label)
+        ).fetchall()
+        assert num_rows == len(record_list)
+        assert [list(row[1:]) for row in row_list] == record_list
+        assert row_list[0][0] == atlas_list[0]["htan_id"]
+    assert connection.execute("SELECT * FROM hsim_atlases").fetchall() == [
+        (atlas["htan_id"], atlas["htan_name"]) for atlas in atlas_list
+    ]
+    row = connection.execute(
+        "SELECT column_name, id FROM hsim_attributes "
+        "WHERE data_schema = 'Biospecimen' AND position = 1"
+    ).fetchone()
+    assert row == ("HTANBiospecimenID", "bts:HTANBiospecimenID")
+
+    # Lookups by ID are served by the indexes built after loading
+    plan = connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM Biospecimen "
+        "WHERE HTANBiospecimenID = ? AND atlas_id = ?",
+        ("HTA0_0_1", "HTA0"),
+    ).fetchall()
+    assert "Biospecimen_HTANBiospecimenID_idx" in plan[0][-1]
+    connection.close()
+
+
+def test_export_json_values(tmp_path):
+    fname = get_fname("sim.json")
+    schema_list = json_reader.read_schemas(fname)
+    atlas = next(json_reader.iter_atlases(fname))
+    atlas["Demographics"]["record_list"][0][3] = ["a", 1]
+    exporter = sqlite_export.SqliteExporter(tmp_path / "sim.db", schema_list)
+    exporter.write_atlas(atlas)
+    exporter.close()
+    connection = sqlite3.connect(str(tmp_path / "sim.db"))
+    row_list = connection.execute("SELECT * FROM Demographics").fetchall()
+    assert json.loads(row_list[0][4]) == ["a", 1]
+    assert list(row_list[1][1:]) == atlas["Demographics"]["record_list"][1]
+    connection.close()
+
+
+def test_export_bad_record(tmp_path):
+    fname = get_fname("sim.json")
+    exporter = sqlite_export.SqliteExporter(
+        tmp_path / "sim.db", json_reader.read_schemas(fname)
+    )
+    atlas = next(json_reader.iter_atlases(fname))
+    atlas["Demographics"]["record_list"][0].append("extra")
+    with pytest.raises(ValueError):
+        exporter.write_atlas(atlas)
+    exporter.abort()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_get_link_errors(tmp_path):
+    fname = get_fname("sim_broken_links.json")
+    export_database(fname, tmp_path / "sim.db")
+    reader = json_reader.HtanJsonReader(fname, cli.get_template_list())
+    error_list = sqlite_export.get_link_errors(tmp_path / "sim.db")
+    assert len(error_list) == 2
+    assert error_list == reader.get_error_list()
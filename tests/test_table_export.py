@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Unit Test for Table Export.
+"""
+from click.testing import CliRunner
+import csv
+import json
+import os
+import pytest
+from hsim import cli
+from hsim import json_reader
+from hsim import schema_util
+from hsim import table_export
+
+
+def get_doc():
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim.json")
+    with open(fname) as fd:
+        return json.load(fd)
+
+
+def export_tables(out_dir, table_format):
+    schema_dict = schema_util.load_htan_schema()
+    table_exporter = table_export.TableExporter(
+        out_dir,
+        table_export.get_table_spec_list(schema_dict, cli.get_template_list()),
+        table_format,
+    )
+    doc = get_doc()
+    for atlas in doc["atlases"]:
+        table_exporter.write_atlas(atlas)
+    table_exporter.close()
+    return doc, table_exporter
+
+
+def test_get_table_spec_list():
+    schema_dict = schema_util.load_htan_schema()
+    table_spec_list = table_export.get_table_spec_list(
+        schema_dict, cli.get_template_list()
+    )
+    label_list = [table_spec.label for table_spec in table_spec_list]
+    assert label_list[:5] == [
+        "Demographics",
+        "Diagnosis",
+        "FollowUp",
+        "Exposure",
+        "Therapy",
+    ]
+    assert len(label_list) == len(set(label_list))
+    demographics = table_spec_list[0]
+    assert demographics.column_name_list[:3] == [
+        "atlas_id",
+        "Component",
+        "HTANParticipantID",
+    ]
+    column_type_dict = dict(
+        zip(demographics.column_name_list, demographics.column_type_list)
+    )
+    assert column_type_dict["YearOfBirth"] == table_export.INT64
+    assert column_type_dict["Gender"] == table_export.STRING
+
+
+def test_export_tsv(tmp_path):
+    doc, table_exporter = export_tables(tmp_path, table_export.TSV)
+    atlas = doc["atlases"][0]
+    with open(tmp_path / "Biospecimen.tsv", newline="") as fd:
+        row_list = list(csv.reader(fd, delimiter="\t"))
+    assert row_list[0][:3] == ["atlas_id", "Component", "HTANBiospecimenID"]
+    record_list = atlas["Biospecimen"]["record_list"]
+    assert len(row_list) == len(record_list) + 1
+    assert row_list[1] == ["HTA0"] + [str(value) for value in record_list[0]]
+    table_list = table_exporter.get_table_list()
+    assert table_list[0][0] == "Demographics"
+    assert table_list[0][2] == len(atlas["Demographics"]["record_list"])
+
+
+def test_export_ndjson(tmp_path):
+    doc, table_exporter = export_tables(tmp_path, table_export.NDJSON)
+    record_list = doc["atlases"][0]["Demographics"]["record_list"]
+    with open(tmp_path / "Demographics.ndjson") as fd:
+        row_list = [json.loads(line) for line in fd]
+    assert len(row_list) == len(record_list)
+    assert row_list[0]["atlas_id"] == "HTA0"
+    assert list(row_list[0].values())[1:] == record_list[0]
+
+
+def test_export_parquet(tmp_path):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    doc, table_exporter = export_tables(tmp_path, table_export.PARQUET)
+    record_list = doc["atlases"][0]["Demographics"]["record_list"]
+    table = pyarrow_parquet.read_table(str(tmp_path / "Demographics.parquet"))
+    assert table.num_rows == len(record_list)
+    assert str(table.schema.field("YearOfBirth").type) == "int64"
+    assert table.to_pylist()[0]["HTANParticipantID"] == record_list[0][1]
+
+
+def test_export_bad_record(tmp_path):
+    schema_dict = schema_util.load_htan_schema()
+    table_exporter = table_export.TableExporter(
+        tmp_path, table_export.get_table_spec_list(schema_dict, cli.get_template_list())
+    )
+    atlas = get_doc()["atlases"][0]
+    atlas["Demographics"]["record_list"][0].append("extra")
+    with pytest.raises(ValueError):
+        table_exporter.write_atlas(atlas)
+    table_exporter.close()
+
+
+def test_iter_atlases():
+    fname = os.path.join(os.path.dirname(__file__), "test_data/sim.json")
+    atlas_list = list(json_reader.iter_atlases(fname))
+    assert atlas_list == get_doc()["atlases"]
+
+
+def test_get_schemas_table_spec_list():
+    schema_dict = schema_util.load_htan_schema()
+    table_spec_list = table_export.get_table_spec_list(
+        schema_dict, cli.get_template_list()
+    )
+    schemas_table_spec_list = table_export.get_schemas_table_spec_list(
+        get_doc()["schemas"]
+    )
+    assert [table_spec[:2] for table_spec in schemas_table_spec_list] == [
+        table_spec[:2] for table_spec in table_spec_list
+    ]
+
+
+def test_export_tables_command(tmp_path, monkeypatch):
+    # Columns come from the file's own schemas node, from any directory
+    doc = {
+        "atlases": [
+            {
+                "htan_id": "HTA0",
+                "htan_name": "HTAN Atlas 0",
+                "Custom": {"record_list": [[None, "a"], [2, "b"]]},
+            }
+        ],
+        "schemas": [
+            {
+                "data_schema": "Custom",
+                "attributes": [{"id": "bts:Count"}, {"id": "bts:Name"}],
+            }
+        ],
+    }
+    (tmp_path / "sim.json").write_text(json.dumps(doc))
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(
+        cli.cli, ["export-tables", "sim.json", "tables", "--format", "ndjson"]
+    )
+    assert result.exit_code == 0, result.output
+    with open(tmp_path / "tables" / "Custom.ndjson") as fd:
+        row_list = [json.loads(line) for line in fd]
+    assert row_list[1] == {"atlas_id": "HTA0", "Count": 2, "Name": "b"}
+
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    result = CliRunner().invoke(
+        cli.cli, ["export-tables", "sim.json", "tables", "--format", "parquet"]
+    )
+    assert result.exit_code == 0, result.output
+    table = pyarrow_parquet.read_table(str(tmp_path / "tables" / "Custom.parquet"))
+    assert str(table.schema.field("Count").type) == "int64"
+    assert table.to_pylist()[0]["Count"] is None